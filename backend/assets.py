@@ -0,0 +1,248 @@
+import json
+from datetime import datetime
+from typing import Collection, Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.config import PERSIST_CHUNK_SIZE
+from backend.database import Asset, AssetEvent, Scan, Subdomain, SubdomainPort, SubdomainTechnology
+
+EVENT_KINDS = ("discovered", "disappeared", "reappeared", "port_opened", "port_closed", "tech_added",
+               "tech_removed", "status_changed", "title_changed", "alive_changed")
+
+# Probe fields whose changes are logged, with their event kind
+_FIELD_EVENTS = (("status_code", "status_changed"), ("title", "title_changed"), ("is_alive", "alive_changed"))
+_SET_EVENTS = (("ports", "port_opened", "port_closed"), ("technologies", "tech_added", "tech_removed"))
+
+# Asset columns holding its latest state, in the order _scan_hosts builds them
+STATE_COLUMNS = ("ip_address", "status_code", "title", "is_alive", "ports", "technologies")
+
+_assets = Asset.__table__
+_events = AssetEvent.__table__
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _sorted_array(model, column):
+    """A host's distinct child values as a sorted JSON array, e.g. [80,443], built in SQL."""
+    values = (
+        select(column.label("value")).distinct()
+        .where(model.subdomain_id == Subdomain.id)
+        .order_by(column)
+        .correlate(Subdomain)
+        .subquery()
+    )
+    return select(func.json_group_array(values.c.value)).scalar_subquery()
+
+
+def _scan_hosts(db: Session, scan_id: int, after: str, limit: int) -> Dict[str, dict]:
+    """The next limit hosts of a scan by name, in the shape of Asset's state columns."""
+    rows = db.connection().execute(
+        select(Subdomain.subdomain, Subdomain.ip_address, Subdomain.status_code, Subdomain.title,
+               Subdomain.is_alive,
+               _sorted_array(SubdomainPort, SubdomainPort.port).label("ports"),
+               _sorted_array(SubdomainTechnology, SubdomainTechnology.tech).label("technologies"))
+        .where(Subdomain.scan_id == scan_id, Subdomain.subdomain > after)
+        .order_by(Subdomain.subdomain)
+        .limit(limit)
+    )
+    return {
+        name: dict(zip(STATE_COLUMNS, (ip_address, status_code, title, bool(is_alive), ports, technologies)))
+        for name, ip_address, status_code, title, is_alive, ports, technologies in rows
+    }
+
+
+def _changes(asset, state: dict) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """(kind, old_value, new_value) for each difference between an asset and its state in a scan."""
+    changes = []
+    if not asset.present:
+        changes.append(("reappeared", None, None))
+    for field, kind in _FIELD_EVENTS:
+        if getattr(asset, field) != state[field]:
+            changes.append((kind, _text(getattr(asset, field)), _text(state[field])))
+    for field, added, removed in _SET_EVENTS:
+        if getattr(asset, field) == state[field]:
+            continue
+        before, after = set(json.loads(getattr(asset, field))), set(json.loads(state[field]))
+        changes.extend((added, None, str(value)) for value in sorted(after - before))
+        changes.extend((removed, str(value), None) for value in sorted(before - after))
+    return changes
+
+
+def subfinder_complete(tool_report: dict) -> bool:
+    """Whether a scan's subfinder run finished with output, so hosts it didn't find can be marked disappeared."""
+    counts = tool_report.get("subfinder") or {}
+    return bool(counts.get("ok")) and not (counts.get("timeout") or counts.get("crashed"))
+
+
+def record_scan(db: Session, scan_id: int, seen_at: Optional[datetime] = None, lost: Collection[str] = (),
+                probes_complete: bool = True, subdomains_complete: bool = True,
+                batch_size: int = PERSIST_CHUNK_SIZE) -> int:
+    """Fold a completed scan's results into the assets and log what changed (commits per batch).
+
+    Hosts are compared batch_size at a time against their asset's latest
+    state; assets of the scan's domain it didn't find are marked
+    disappeared. Re-recording the same scan logs nothing new. Returns the
+    number of events logged.
+
+    Hosts in lost, or every host if probes_complete is false, had their
+    naabu/httpx results lost to a failed shard: they only count as seen and
+    keep their last known state. Unless subdomains_complete, subfinder may
+    have missed hosts, so none are marked disappeared.
+    """
+    scan = db.get(Scan, scan_id)
+    seen_at = seen_at or datetime.utcnow()
+    seen = {"last_seen": seen_at, "last_scan_id": scan_id, "present": True}
+    logged = 0
+    after = ""
+
+    def event(asset_id, kind, old_value=None, new_value=None):
+        return {"asset_id": asset_id, "scan_id": scan_id, "at": seen_at, "kind": kind,
+                "old_value": old_value, "new_value": new_value}
+
+    while True:
+        hosts = _scan_hosts(db, scan_id, after, batch_size)
+        if not hosts:
+            break
+        after = max(hosts)
+        known = {row.host: row for row in db.connection().execute(
+            select(_assets.c.id, _assets.c.host, _assets.c.present, _assets.c.probed,
+                   *(_assets.c[name] for name in STATE_COLUMNS))
+            .where(_assets.c.host.in_(list(hosts)))
+        )}
+        added, updates, unchanged, events = [], [], [], []
+        for host, state in hosts.items():
+            asset = known.get(host)
+            probed = probes_complete and host not in lost
+            if asset is None:
+                added.append({"host": host, "domain": scan.domain, "first_seen": seen_at,
+                              "first_scan_id": scan_id, "probed": probed, **seen, **state})
+                continue
+            if not probed:
+                # Its results are missing, not empty: keep the last known state
+                unchanged.append(asset.id)
+                if not asset.present:
+                    events.append(event(asset.id, "reappeared"))
+                continue
+            if asset.present and asset.probed and tuple(asset[4:]) == tuple(state.values()):
+                unchanged.append(asset.id)
+                continue
+            if asset.probed:
+                changes = _changes(asset, state)
+            else:
+                # First state probed for it, so there is nothing to diff against
+                changes = [] if asset.present else [("reappeared", None, None)]
+            updates.append({"asset_id": asset.id, "probed": True, **seen, **state})
+            events.extend(event(asset.id, kind, old, new) for kind, old, new in changes)
+        if added:
+            # A plain executemany: RETURNING would make SQLAlchemy insert the rows one statement at a time.
+            # A scan running alongside may have added some of the hosts since they were looked up
+            db.execute(sqlite_insert(_assets).on_conflict_do_nothing(index_elements=["host"]), added)
+            rows = {row["host"]: row for row in added}
+            for asset_id, host, first_scan_id in db.connection().execute(
+                select(_assets.c.id, _assets.c.host, _assets.c.first_scan_id).where(_assets.c.host.in_(list(rows)))
+            ):
+                if first_scan_id == scan_id:
+                    events.append(event(asset_id, "discovered"))
+                elif rows[host]["probed"]:
+                    updates.append({"asset_id": asset_id, "probed": True, **seen, **hosts[host]})
+                else:
+                    unchanged.append(asset_id)
+        if updates:
+            db.execute(update(_assets).where(_assets.c.id == bindparam("asset_id")), updates)
+        if unchanged:
+            db.execute(update(_assets).where(_assets.c.id.in_(unchanged)).values(**seen))
+        if events:
+            db.execute(insert(_events), events)
+        db.commit()
+        logged += len(events)
+
+    while subdomains_complete:
+        gone = db.execute(
+            select(_assets.c.id).where(_assets.c.domain == scan.domain, _assets.c.present == True,
+                                       _assets.c.last_scan_id != scan_id).limit(batch_size)
+        ).scalars().all()
+        if not gone:
+            break
+        db.execute(update(_assets).where(_assets.c.id.in_(gone)).values(present=False))
+        db.execute(insert(_events), [event(asset_id, "disappeared") for asset_id in gone])
+        db.commit()
+        logged += len(gone)
+    return logged
+
+
+def rebuild(db: Session) -> int:
+    """Replay every completed scan that still has its results, oldest first, into fresh asset history.
+
+    Which hosts a scan lost isn't stored, so a scan that lost any naabu/httpx
+    shard only counts its hosts as seen. Scans resumed from a checkpoint
+    have no subfinder outcome and mark nothing disappeared; scans from
+    before tool reports were kept are taken as complete.
+    """
+    db.execute(delete(AssetEvent))
+    db.execute(delete(Asset))
+    db.commit()
+    scans = db.execute(
+        select(Scan.id, Scan.completed_at, Scan.created_at, Scan.tool_report)
+        .where(Scan.status == "completed")
+        .order_by(Scan.completed_at, Scan.id)
+    ).all()
+    logged = 0
+    for scan in scans:
+        tools = json.loads(scan.tool_report) if scan.tool_report else {}
+        logged += record_scan(
+            db, scan.id, seen_at=scan.completed_at or scan.created_at,
+            probes_complete=not any(tools.get(tool, {}).get("hosts_lost") for tool in ("naabu", "httpx")),
+            subdomains_complete=subfinder_complete(tools) if scan.tool_report else True
+        )
+    print(f"[*] Replayed {len(scans)} scans into asset history ({logged} events)")
+    return logged
+
+
+def rebuild_if_missing(db: Session):
+    """Build asset history for databases that have results but predate the assets table."""
+    has_assets = db.query(Asset.id).first() is not None
+    has_results = db.query(Subdomain.id).join(Scan).filter(Scan.status == "completed").first() is not None
+    if has_results and not has_assets:
+        print("[*] Building asset history")
+        rebuild(db)
+
+
+def asset_dict(asset) -> dict:
+    return {
+        "id": asset.id,
+        "host": asset.host,
+        "domain": asset.domain,
+        "ip_address": asset.ip_address,
+        "status_code": asset.status_code,
+        "title": asset.title,
+        "is_alive": asset.is_alive,
+        "ports": json.loads(asset.ports),
+        "technologies": json.loads(asset.technologies),
+        "probed": asset.probed,
+        "present": asset.present,
+        "first_seen": asset.first_seen.isoformat(),
+        "last_seen": asset.last_seen.isoformat(),
+        "first_scan_id": asset.first_scan_id,
+        "last_scan_id": asset.last_scan_id
+    }
+
+
+def event_dict(event, host: Optional[str] = None) -> dict:
+    item = {
+        "id": event.id,
+        "at": event.at.isoformat(),
+        "kind": event.kind,
+        "old_value": event.old_value,
+        "new_value": event.new_value,
+        "scan_id": event.scan_id
+    }
+    if host is not None:
+        item["host"] = host
+    return item
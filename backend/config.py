@@ -17,4 +17,136 @@ GAU_PATH = os.getenv("GAU_PATH", "gau")
 
 # Scan settings
 DEFAULT_PORTS = "21,22,25,53,80,110,143,443,445,993,995,1433,1521,3306,3389,5432,5900,6379,8000,8080,8443,8888,9200,27017"
-SCAN_TIMEOUT = 3600  # 1 hour max per scan
+# Tool execution policy. Timeouts scale with the work a run is given: a base
+# plus TOOL_TIMEOUT_SLACK times the expected duration, which is derived from
+# the rates below. SCAN_TIMEOUT caps any single tool run.
+SCAN_TIMEOUT = int(os.getenv("SCAN_TIMEOUT", "3600"))
+TOOL_BASE_TIMEOUT = {
+    "subfinder": int(os.getenv("SUBFINDER_TIMEOUT", "600")),
+    "naabu": int(os.getenv("NAABU_BASE_TIMEOUT", "60")),
+    "httpx": int(os.getenv("HTTPX_BASE_TIMEOUT", "60")),
+    "gau": int(os.getenv("GAU_TIMEOUT", "600")),
+}
+TOOL_TIMEOUT_SLACK = float(os.getenv("TOOL_TIMEOUT_SLACK", "3"))
+# Budgets shared by all naabu/httpx processes; naabu's packet rate follows the
+# bandwidth budget, httpx's threads the CPU budget and its request rate both
+SCAN_BANDWIDTH_MBPS = float(os.getenv("SCAN_BANDWIDTH_MBPS", "20"))
+SCAN_CPU_CORES = int(os.getenv("SCAN_CPU_CORES", str(os.cpu_count() or 1)))
+NAABU_MAX_RATE = int(os.getenv("NAABU_MAX_RATE", "3000"))  # packets/s per process
+HTTPX_THREADS_PER_CORE = int(os.getenv("HTTPX_THREADS_PER_CORE", "25"))
+HTTPX_AVG_RESPONSE_KB = float(os.getenv("HTTPX_AVG_RESPONSE_KB", "8"))
+HTTPX_PROBE_SECONDS = float(os.getenv("HTTPX_PROBE_SECONDS", "5"))  # Typical time one thread spends on a host
+
+# Pipeline settings (subfinder output is fed to naabu/httpx in batches)
+PIPELINE_BATCH_SIZE = int(os.getenv("PIPELINE_BATCH_SIZE", "500"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "5000"))
+PIPELINE_FLUSH_SECONDS = float(os.getenv("PIPELINE_FLUSH_SECONDS", "5"))
+PIPELINE_STAGE_WORKERS = int(os.getenv("PIPELINE_STAGE_WORKERS", "2"))
+
+# Pre-probe DNS: names are resolved against these IPv4 resolvers (ip or
+# ip:port) before probing. naabu scans each unique IP once; names without an
+# A record or matching a wildcard zone are not probed. DNS_RESOLVE=false
+# probes every name as-is
+DNS_RESOLVE = os.getenv("DNS_RESOLVE", "true").lower() in ("1", "true", "yes")
+DNS_RESOLVERS = [r.strip() for r in os.getenv("DNS_RESOLVERS", "1.1.1.1,8.8.8.8,9.9.9.9").split(",") if r.strip()]
+DNS_CONCURRENCY = int(os.getenv("DNS_CONCURRENCY", "500"))
+DNS_TIMEOUT = float(os.getenv("DNS_TIMEOUT", "2"))
+DNS_RETRIES = int(os.getenv("DNS_RETRIES", "2"))
+
+# Rows written per transaction when persisting scan results
+PERSIST_CHUNK_SIZE = int(os.getenv("PERSIST_CHUNK_SIZE", "5000"))
+
+# Scan queue: how many scans run at once, and how many processes of each tool
+MAX_CONCURRENT_SCANS = int(os.getenv("MAX_CONCURRENT_SCANS", "2"))
+TOOL_CONCURRENCY = {
+    "subfinder": int(os.getenv("SUBFINDER_CONCURRENCY", "4")),
+    "naabu": int(os.getenv("NAABU_CONCURRENCY", "1")),
+    "httpx": int(os.getenv("HTTPX_CONCURRENCY", "2")),
+    "gau": int(os.getenv("GAU_CONCURRENCY", "2")),
+}
+
+# naabu/httpx host lists are split into shards of this many hosts, run as
+# separate processes (up to the tool's concurrency) and retried on their own
+TOOL_SHARD_SIZE = {
+    "naabu": int(os.getenv("NAABU_SHARD_SIZE", "250")),
+    "httpx": int(os.getenv("HTTPX_SHARD_SIZE", "250")),
+}
+TOOL_SHARD_RETRIES = int(os.getenv("TOOL_SHARD_RETRIES", "1"))
+
+# Scheduled scans: how often schedules are checked, and the window over which
+# scans that fall due together are spread out
+SCHEDULE_CHECK_SECONDS = int(os.getenv("SCHEDULE_CHECK_SECONDS", "60"))
+SCHEDULE_SPREAD_SECONDS = int(os.getenv("SCHEDULE_SPREAD_SECONDS", "600"))
+
+# Scans left pending/running by a restart are re-queued on startup and resume
+# from their checkpoints; when disabled they are marked failed instead
+RESUME_INTERRUPTED_SCANS = os.getenv("RESUME_INTERRUPTED_SCANS", "true").lower() in ("1", "true", "yes")
+
+# Deleting a running scan cancels it and waits this long for it to stop
+# writing results before deleting them; a scan still running after that is
+# not deleted (409)
+SCAN_STOP_TIMEOUT = float(os.getenv("SCAN_STOP_TIMEOUT", "30"))
+
+# Where scans run: "local" runs them in the API process; "database" queues them
+# as scan_jobs rows that worker processes (python -m backend.worker) lease.
+# A worker heartbeats its jobs (renewing the lease, reporting progress, picking
+# up cancels) every WORKER_HEARTBEAT_SECONDS and looks for new jobs every
+# WORKER_POLL_SECONDS. A job whose lease lapses is reclaimed by another worker
+# and resumes from its checkpoints, at most WORKER_MAX_ATTEMPTS times
+SCAN_QUEUE = os.getenv("SCAN_QUEUE", "local").lower()
+WORKER_ID = os.getenv("WORKER_ID", "")  # Default: hostname-pid
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", str(MAX_CONCURRENT_SCANS)))
+WORKER_LEASE_SECONDS = float(os.getenv("WORKER_LEASE_SECONDS", "30"))
+WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "2"))
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+
+# Retention: finished scans beyond the newest RETENTION_KEEP_LAST of their
+# domain and older than RETENTION_KEEP_DAYS are archived (0 disables a rule;
+# per-domain policies override both). Archives are gzipped JSON lines in
+# ARCHIVE_DIR. Each retention pass ends with maintenance: ANALYZE, and VACUUM
+# once at least VACUUM_FREE_RATIO of the database file is free pages
+RETENTION_KEEP_LAST = int(os.getenv("RETENTION_KEEP_LAST", "0"))
+RETENTION_KEEP_DAYS = int(os.getenv("RETENTION_KEEP_DAYS", "0"))
+RETENTION_CHECK_SECONDS = int(os.getenv("RETENTION_CHECK_SECONDS", "3600"))
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", str(DATA_DIR / "archive")))
+VACUUM_FREE_RATIO = float(os.getenv("VACUUM_FREE_RATIO", "0.25"))
+
+# Incremental scans re-probe hosts already known from the previous scan only
+# when their last probe is older than this
+INCREMENTAL_RECHECK_HOURS = float(os.getenv("INCREMENTAL_RECHECK_HOURS", "72"))
+
+# Cross-scan cache of per-host naabu/httpx results
+TOOL_CACHE_PATH = Path(os.getenv("TOOL_CACHE_PATH", str(DATA_DIR / "tool_cache.db")))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "500000"))
+TOOL_CACHE_TTL = {
+    "naabu": int(os.getenv("NAABU_CACHE_TTL", "21600")),  # seconds
+    "httpx": int(os.getenv("HTTPX_CACHE_TTL", "3600")),
+}
+
+# Every URL gau finds goes to a deduplicated, compressed store in its own
+# SQLite file; scan results keep a preview of up to URL_PREVIEW_LIMIT per host
+URL_STORE_PATH = Path(os.getenv("URL_STORE_PATH", str(DATA_DIR / "urls.db")))
+URL_STORE_BATCH = int(os.getenv("URL_STORE_BATCH", "5000"))
+URL_PREVIEW_LIMIT = int(os.getenv("URL_PREVIEW_LIMIT", "100"))
+
+# Async database engine used by the API and scan engine
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+# Results API: largest page for keyset pagination, rows fetched per round-trip
+# when streaming an export
+RESULTS_MAX_PAGE_SIZE = int(os.getenv("RESULTS_MAX_PAGE_SIZE", "1000"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Search: facet counts are computed over at most SEARCH_FACET_LIMIT matching
+# rows, and list the SEARCH_FACET_SIZE most common values of each facet
+SEARCH_FACET_LIMIT = int(os.getenv("SEARCH_FACET_LIMIT", "10000"))
+SEARCH_FACET_SIZE = int(os.getenv("SEARCH_FACET_SIZE", "10"))
+
+# Live scan events (server-sent events): per-subscriber buffer, keepalive
+# interval, and how long stats changes are coalesced before being pushed
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+STATS_PUSH_SECONDS = float(os.getenv("STATS_PUSH_SECONDS", "2"))
@@ -1,11 +1,39 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, ForeignKey, Boolean, JSON
+from sqlalchemy import create_engine, event, inspect, insert, select, text, update, DDL, Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import json
 from datetime import datetime
-from backend.config import DATABASE_URL
+from backend.config import DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW
 
+# Synchronous engine: schema setup, migrations and offline tooling
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+# Async engine: everything that runs on the event loop (API and scan engine)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL so readers don't block on scan writes, fsync less often, and enforce foreign keys."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _set_sqlite_pragmas)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -14,32 +42,221 @@ class Scan(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     domain = Column(String(255), index=True)
-    status = Column(String(50), default="pending")  # pending, running, completed, failed
+    status = Column(String(50), default="pending")  # pending, running, completed, failed, cancelled, archived
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     is_scheduled = Column(Boolean, default=False)
     schedule_cron = Column(String(100), nullable=True)
+    mode = Column(String(20), default="full")  # full, incremental
+    baseline_scan_id = Column(Integer, nullable=True)  # Scan an incremental scan was diffed against
+    bypass_cache = Column(Boolean, default=False)  # Ignore cached naabu/httpx results
+    tool_report = Column(Text, nullable=True)  # JSON: per-tool run outcomes (ok/empty/timeout/crashed)
+    metrics = Column(Text, nullable=True)  # JSON: per-stage timings, throughput and database write time
     
-    subdomains = relationship("Subdomain", back_populates="scan", cascade="all, delete-orphan")
-    
+    # Child rows go with the scan by ON DELETE CASCADE (or backend.retention's
+    # set-based deletes on databases created before it), never loaded to be deleted
+    subdomains = relationship("Subdomain", back_populates="scan", cascade="all, delete-orphan", passive_deletes=True)
+    checkpoints = relationship("ScanCheckpoint", cascade="all, delete-orphan", passive_deletes=True)
+    jobs = relationship("ScanJob", cascade="all, delete-orphan", passive_deletes=True)
+
 
 class Subdomain(Base):
     __tablename__ = "subdomains"
+    __table_args__ = (
+        Index("ix_subdomains_scan_subdomain", "scan_id", "subdomain"),
+        Index("ix_subdomains_scan_id_id", "scan_id", "id"),  # Keyset pagination within a scan
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    scan_id = Column(Integer, ForeignKey("scans.id"))
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"))
     subdomain = Column(String(500), index=True)
     ip_address = Column(String(50), nullable=True)
-    ports = Column(Text, nullable=True)  # JSON array of open ports
+    ports = Column(Text, nullable=True)  # Legacy JSON array, migrated to subdomain_ports
     status_code = Column(Integer, nullable=True)
     content_length = Column(Integer, nullable=True)
     title = Column(String(500), nullable=True)
-    technologies = Column(Text, nullable=True)  # JSON array
-    urls = Column(Text, nullable=True)  # JSON array of discovered URLs
+    technologies = Column(Text, nullable=True)  # Legacy JSON array, migrated to subdomain_technologies
+    urls = Column(Text, nullable=True)  # Legacy JSON array, migrated to subdomain_urls
     is_alive = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    probed_at = Column(DateTime, nullable=True)  # When naabu/httpx last probed this host
 
     scan = relationship("Scan", back_populates="subdomains")
+    port_entries = relationship("SubdomainPort", order_by="SubdomainPort.id", cascade="all, delete-orphan", passive_deletes=True)
+    technology_entries = relationship("SubdomainTechnology", order_by="SubdomainTechnology.id", cascade="all, delete-orphan", passive_deletes=True)
+    url_entries = relationship("SubdomainUrl", order_by="SubdomainUrl.id", cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def port_list(self):
+        return [p.port for p in self.port_entries]
+
+    @property
+    def technology_list(self):
+        return [t.tech for t in self.technology_entries]
+
+    @property
+    def url_list(self):
+        return [u.url for u in self.url_entries]
+
+
+class SubdomainPort(Base):
+    __tablename__ = "subdomain_ports"
+    __table_args__ = (Index("ix_subdomain_ports_port_subdomain", "port", "subdomain_id"),)
+
+    id = Column(Integer, primary_key=True)
+    subdomain_id = Column(Integer, ForeignKey("subdomains.id", ondelete="CASCADE"), index=True)
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), index=True)
+    port = Column(Integer, nullable=False)
+
+
+class SubdomainTechnology(Base):
+    __tablename__ = "subdomain_technologies"
+    __table_args__ = (Index("ix_subdomain_technologies_tech_subdomain", "tech", "subdomain_id"),)
+
+    id = Column(Integer, primary_key=True)
+    subdomain_id = Column(Integer, ForeignKey("subdomains.id", ondelete="CASCADE"), index=True)
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), index=True)
+    tech = Column(String(255), nullable=False)
+
+
+class SubdomainUrl(Base):
+    __tablename__ = "subdomain_urls"
+
+    id = Column(Integer, primary_key=True)
+    subdomain_id = Column(Integer, ForeignKey("subdomains.id", ondelete="CASCADE"), index=True)
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), index=True)
+    host = Column(String(500), index=True)
+    url = Column(Text, nullable=False)
+
+
+# Full-text index over subdomain names, titles and technologies (backend.search);
+# its rowid is the subdomain id. create_all can't declare virtual tables, so
+# the DDL runs after it
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS subdomain_search USING fts5("
+    "subdomain, title, technologies, prefix='2 3')"
+).execute_if(dialect="sqlite"))
+
+
+class ScanCheckpoint(Base):
+    """Output of a finished scan stage or tool batch, kept until the scan completes.
+
+    stage and JSON payload are subfinder ({"subdomains": [...], "complete":
+    whether subfinder finished with output}), gau ({"urls": count}; the URLs
+    themselves are in the URL store), or naabu/httpx ({"hosts": [...],
+    "results": ...} for one batch). Older checkpoints stored bare lists for
+    subfinder and gau: subfinder's are still resumed from, gau's make gau
+    run again.
+    """
+    __tablename__ = "scan_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), index=True)
+    stage = Column(String(20), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ScanJob(Base):
+    """A scan waiting for or leased by a worker process (SCAN_QUEUE=database).
+
+    state is queued, leased, or cancelling (cancel requested; the worker
+    holding the lease stops the scan). A leased job whose lease_expires_at has
+    passed is free to be claimed again. progress is the worker's latest
+    per-stage progress (JSON), relayed to the API's event stream.
+    """
+    __tablename__ = "scan_jobs"
+    __table_args__ = (Index("ix_scan_jobs_claim", "state", "priority", "id"),)
+
+    id = Column(Integer, primary_key=True)
+    scan_id = Column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), unique=True, nullable=False)
+    priority = Column(Integer, default=0, nullable=False)
+    state = Column(String(20), default="queued", nullable=False)
+    worker_id = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    progress = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class StatCounter(Base):
+    """Materialized result counters, per scan and globally (scan_id 0).
+
+    metric is one of subdomains, alive, with_ports (key ""), or port/tech with
+    the port number or technology name as key.
+    """
+    __tablename__ = "stat_counters"
+    __table_args__ = (Index("ix_stat_counters_top", "scan_id", "metric", "value"),)
+
+    scan_id = Column(Integer, primary_key=True)
+    metric = Column(String(20), primary_key=True)
+    key = Column(String(255), primary_key=True, default="")
+    value = Column(Integer, default=0, nullable=False)
+
+
+class RetentionPolicy(Base):
+    """How many finished scans of a domain to keep (backend.retention); unset rules don't apply."""
+    __tablename__ = "retention_policies"
+
+    domain = Column(String(255), primary_key=True)
+    keep_last = Column(Integer, nullable=True)  # Newest finished scans kept
+    keep_days = Column(Integer, nullable=True)  # Scans younger than this are kept
+    archive = Column(Boolean, default=True)  # Archive expired scans (else delete them)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Asset(Base):
+    """A host as last seen by any completed scan (backend.assets), one row per host name.
+
+    The probe columns, ports and technologies hold its latest state; changes
+    to all but ip_address are logged as AssetEvents. probed is false while
+    every scan that found it lost its naabu/httpx results, so it has no state
+    yet to compare against. present is false once a completed scan of its
+    domain no longer finds it. Scan ids aren't foreign keys, so the history
+    outlives scans removed by retention.
+    """
+    __tablename__ = "assets"
+    __table_args__ = (Index("ix_assets_domain_present", "domain", "present"),)
+
+    id = Column(Integer, primary_key=True)
+    host = Column(String(255), unique=True, nullable=False)
+    domain = Column(String(255), nullable=False)  # Root domain of the scan that first found it
+    ip_address = Column(String(50), nullable=True)
+    status_code = Column(Integer, nullable=True)
+    title = Column(String(500), nullable=True)
+    is_alive = Column(Boolean, default=False)
+    ports = Column(Text, nullable=False, default="[]")  # Sorted JSON array, as built by SQLite's json_group_array
+    technologies = Column(Text, nullable=False, default="[]")
+    probed = Column(Boolean, default=True, nullable=False)
+    present = Column(Boolean, default=True, nullable=False)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+    first_scan_id = Column(Integer, nullable=True)
+    last_scan_id = Column(Integer, nullable=True)
+
+
+class AssetEvent(Base):
+    """One change to an asset, appended when a scan's results are recorded.
+
+    kind is discovered, disappeared, reappeared, port_opened, port_closed,
+    tech_added, tech_removed, status_changed, title_changed or alive_changed.
+    Opened/added values are in new_value, closed/removed ones in old_value.
+    """
+    __tablename__ = "asset_events"
+    __table_args__ = (
+        Index("ix_asset_events_asset_at", "asset_id", "at"),  # Timeline of one host
+        Index("ix_asset_events_at", "at"),  # Changes since a time
+    )
+
+    id = Column(Integer, primary_key=True)
+    asset_id = Column(Integer, ForeignKey("assets.id", ondelete="CASCADE"), nullable=False)
+    scan_id = Column(Integer, nullable=True)
+    at = Column(DateTime, nullable=False)
+    kind = Column(String(20), nullable=False)
+    old_value = Column(Text, nullable=True)
+    new_value = Column(Text, nullable=True)
 
 
 class ScheduledScan(Base):
@@ -49,13 +266,94 @@ class ScheduledScan(Base):
     domain = Column(String(255), index=True)
     cron_expression = Column(String(100))  # e.g., "0 0 * * *" for daily at midnight
     is_active = Column(Boolean, default=True)
+    incremental = Column(Boolean, default=True)
     last_run = Column(DateTime, nullable=True)
     next_run = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
-def init_db():
+def _json_list(value):
+    if not value:
+        return []
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def migrate_json_columns(batch_size: int = 5000):
+    """Move legacy JSON ports/technologies/urls into the normalized child tables.
+
+    Rows are migrated in id order and their JSON columns cleared, so the
+    migration is resumable and a no-op once complete.
+    """
+    subdomains = Subdomain.__table__
+    pending = (subdomains.c.ports.isnot(None)) | (subdomains.c.technologies.isnot(None)) | (subdomains.c.urls.isnot(None))
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(subdomains.c.id, subdomains.c.scan_id, subdomains.c.subdomain,
+                       subdomains.c.ports, subdomains.c.technologies, subdomains.c.urls)
+                .where(pending, subdomains.c.id > last_id)
+                .order_by(subdomains.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            ports, techs, urls = [], [], []
+            for row in rows:
+                ports.extend({'subdomain_id': row.id, 'scan_id': row.scan_id, 'port': int(p)}
+                             for p in _json_list(row.ports))
+                techs.extend({'subdomain_id': row.id, 'scan_id': row.scan_id, 'tech': str(t)}
+                             for t in _json_list(row.technologies))
+                urls.extend({'subdomain_id': row.id, 'scan_id': row.scan_id, 'host': row.subdomain, 'url': str(u)}
+                            for u in _json_list(row.urls))
+            if ports:
+                conn.execute(insert(SubdomainPort.__table__), ports)
+            if techs:
+                conn.execute(insert(SubdomainTechnology.__table__), techs)
+            if urls:
+                conn.execute(insert(SubdomainUrl.__table__), urls)
+            conn.execute(
+                update(subdomains)
+                .where(subdomains.c.id.in_([row.id for row in rows]))
+                .values(ports=None, technologies=None, urls=None)
+            )
+            last_id = rows[-1].id
+            migrated += len(rows)
+    if migrated:
+        print(f"[*] Migrated {migrated} subdomains to normalized tables")
+    return migrated
+
+
+def upgrade_schema():
+    """Add columns and indexes that create_all() won't add to existing tables."""
+    existing = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not existing.has_table(table.name):
+                continue
+            present = {col["name"] for col in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def init_db() -> int:
+    """Create tables and migrate legacy data. Returns the number of rows migrated."""
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    return migrate_json_columns()
 
 
 def get_db():
@@ -64,3 +362,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Dict, Optional, Set
+from backend.config import EVENTS_QUEUE_SIZE, STATS_PUSH_SECONDS
+from backend.database import AsyncSessionLocal, Scan
+from backend import stats
+
+# Put on a subscriber's queue when it fell too far behind; the stream ends and
+# the client reconnects to a fresh snapshot
+RESYNC = object()
+
+# Events after which the global stats are re-read and pushed
+_STATS_EVENTS = {"scan", "scan_deleted"}
+_FINISHED = {"completed", "failed", "cancelled"}
+
+
+def scan_summary(scan: Scan) -> dict:
+    """Scan fields pushed to the dashboard, matching the /scans/ list."""
+    return {
+        "id": scan.id,
+        "domain": scan.domain,
+        "status": scan.status,
+        "mode": scan.mode,
+        "created_at": scan.created_at.isoformat() if scan.created_at else None,
+        "completed_at": scan.completed_at.isoformat() if scan.completed_at else None
+    }
+
+
+class EventBus:
+    """In-process pub/sub for scan lifecycle, progress and stats events.
+
+    Each subscriber gets a bounded queue of (event, data) pairs. The bus also
+    keeps the latest progress per running scan and the latest stats, so new
+    subscribers get current state without reading the database. Stats are
+    re-read at most once per STATS_PUSH_SECONDS, and only while someone listens.
+    """
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, stats_delay: float = STATS_PUSH_SECONDS):
+        self.queue_size = queue_size
+        self.stats_delay = stats_delay
+        self.progress: Dict[int, Dict[str, dict]] = {}
+        self.stats: Optional[dict] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._stats_task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data: dict):
+        """Send an event to every subscriber without blocking the publisher."""
+        if event == "progress":
+            self.progress.setdefault(data["scan_id"], {})[data["stage"]] = data
+        elif event == "scan_deleted" or (event == "scan" and data.get("status") in _FINISHED):
+            self.progress.pop(data["id"], None)
+        if event == "stats":
+            self.stats = data
+
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((RESYNC, None))
+                self._subscribers.discard(queue)
+
+        if event in _STATS_EVENTS:
+            self.stats = None
+            if self._subscribers:
+                self._schedule_stats()
+
+    def _schedule_stats(self):
+        if self._stats_task is None or self._stats_task.done():
+            self._stats_task = asyncio.create_task(self._push_stats())
+
+    async def _push_stats(self):
+        await asyncio.sleep(self.stats_delay)
+        try:
+            self.publish("stats", await self.read_stats())
+        except Exception as e:
+            print(f"[!] Failed to publish stats: {e}")
+
+    async def read_stats(self) -> dict:
+        """Latest global stats, read from the database only if nothing newer was pushed."""
+        if self.stats is None:
+            async with AsyncSessionLocal() as db:
+                self.stats = await db.run_sync(stats.global_summary)
+        return self.stats
+
+    async def close(self):
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+            await asyncio.gather(self._stats_task, return_exceptions=True)
+
+
+event_bus = EventBus()
@@ -1,55 +1,74 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
-
-from backend.database import init_db, SessionLocal, ScheduledScan, Scan
-from backend.routers import scans, results
-from backend.recon.engine import start_scan_task
+from datetime import datetime, timezone
+from typing import List, Set
+import asyncio
+import random
+
+from backend.config import SCHEDULE_CHECK_SECONDS, SCHEDULE_SPREAD_SECONDS, RESUME_INTERRUPTED_SCANS, RETENTION_CHECK_SECONDS
+from sqlalchemy import select
+from backend.database import init_db, SessionLocal, AsyncSessionLocal, async_engine, ScheduledScan, Scan
+from backend.routers import scans, results, events
+from backend.routers import assets as asset_routes
+from backend import assets, search, stats, metrics, retention
+from backend.events import event_bus, scan_summary
+from backend.recon.jobs import scan_queue, recover_interrupted_scans, PRIORITY_SCHEDULED
 
 # Scheduler instance
 scheduler = AsyncIOScheduler()
 
-
-async def run_scheduled_scans():
-    """Check and run any due scheduled scans."""
-    db = SessionLocal()
-    try:
-        active_schedules = db.query(ScheduledScan).filter(ScheduledScan.is_active == True).all()
-        
-        for scheduled in active_schedules:
-            # Create a new scan
-            scan = Scan(domain=scheduled.domain, is_scheduled=True)
-            db.add(scan)
-            db.commit()
-            db.refresh(scan)
-            
-            # Update last run
-            scheduled.last_run = datetime.utcnow()
-            db.commit()
-            
-            # Run scan in background
-            await start_scan_task(scan.id, db)
-            
-    finally:
-        db.close()
+# Domains with a scheduled scan waiting to be dispatched, and the delayed tasks
+_dispatching: Set[str] = set()
+_dispatch_tasks: Set[asyncio.Task] = set()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
-    init_db()
+    migrated = init_db()
+    db = SessionLocal()
+    try:
+        if migrated:
+            stats.rebuild(db)
+            search.rebuild(db)
+            assets.rebuild(db)
+        else:
+            stats.rebuild_if_missing(db)
+            search.rebuild_if_missing(db)
+            assets.rebuild_if_missing(db)
+    finally:
+        db.close()
     print("[*] Database initialized")
+
+    scan_queue.start()
+    print(f"[*] Scan queue started ({scan_queue.describe()})")
+    recovered = await recover_interrupted_scans()
+    if recovered:
+        action = "Resuming" if RESUME_INTERRUPTED_SCANS else "Marked failed:"
+        print(f"[*] {action} {recovered} scans interrupted by the last shutdown")
     
-    # Start scheduler for periodic scans (runs every hour to check schedules)
+    # Start scheduler for periodic scans (checks schedules at cron granularity)
     scheduler.add_job(
         check_and_run_scheduled,
         trigger='interval',
-        minutes=60,
-        id='scheduled_scan_checker'
+        seconds=SCHEDULE_CHECK_SECONDS,
+        id='scheduled_scan_checker',
+        coalesce=True,
+        max_instances=1
+    )
+    # Retention policies and database maintenance
+    scheduler.add_job(
+        apply_retention,
+        trigger='interval',
+        seconds=RETENTION_CHECK_SECONDS,
+        id='retention',
+        coalesce=True,
+        max_instances=1
     )
     scheduler.start()
     print("[*] Scheduler started")
@@ -58,48 +77,104 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     scheduler.shutdown()
+    for task in _dispatch_tasks:
+        task.cancel()
     print("[*] Scheduler stopped")
+    await scan_queue.stop()
+    print("[*] Scan queue stopped")
+    await event_bus.close()
+    await async_engine.dispose()
 
 
-async def check_and_run_scheduled():
-    """Check scheduled scans and run if needed based on cron expression."""
-    db = SessionLocal()
+def spread_offsets(count: int, window: float = SCHEDULE_SPREAD_SECONDS) -> List[float]:
+    """Stratified jitter: one random offset inside each of count equal slices of window.
+
+    Scans that fall due together start evenly spread over the window instead of
+    all at once, without two of them landing in the same slice.
+    """
+    if count == 0:
+        return []
+    slot = window / count
+    return [i * slot + random.uniform(0, slot) for i in range(count)]
+
+
+async def _domain_has_active_scan(db, domain: str) -> bool:
+    active = await db.scalars(
+        select(Scan.id).where(Scan.domain == domain, Scan.status.in_(("pending", "running")))
+    )
+    return any(scan_queue.is_active(scan_id) for scan_id in active)
+
+
+async def dispatch_scheduled(domain: str, cron_expression: str, incremental: bool, delay: float):
+    """After delay, queue a scheduled scan unless one for the domain is already active."""
+    await asyncio.sleep(delay)
     try:
-        active_schedules = db.query(ScheduledScan).filter(ScheduledScan.is_active == True).all()
-        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            if await _domain_has_active_scan(db, domain):
+                print(f"[*] Skipping scheduled scan for {domain}: a scan is already active")
+                return
+            scan = Scan(
+                domain=domain,
+                is_scheduled=True,
+                schedule_cron=cron_expression,
+                mode="incremental" if incremental else "full"
+            )
+            db.add(scan)
+            await db.commit()
+            event_bus.publish("scan", scan_summary(scan))
+        print(f"[+] Queueing scheduled scan for {domain}")
+        await scan_queue.submit(scan.id, PRIORITY_SCHEDULED)
+    finally:
+        _dispatching.discard(domain)
+
+
+async def check_and_run_scheduled():
+    """Find due schedules and dispatch their scans spread over SCHEDULE_SPREAD_SECONDS.
+
+    Dispatch is fire-and-forget: each scan is created with its own session and
+    run by the scan queue, which bounds how many run concurrently.
+    """
+    due = []
+    async with AsyncSessionLocal() as db:
+        active_schedules = (await db.scalars(select(ScheduledScan).where(ScheduledScan.is_active == True))).all()
+        now = datetime.now(timezone.utc)
         
         for scheduled in active_schedules:
             try:
-                trigger = CronTrigger.from_crontab(scheduled.cron_expression)
-                next_run = trigger.get_next_fire_time(None, now)
+                trigger = CronTrigger.from_crontab(scheduled.cron_expression, timezone=timezone.utc)
                 
-                # If last_run is None or next_run is in the past, run now
-                should_run = False
+                # Due if it never ran, or a fire time has passed since the last run
                 if scheduled.last_run is None:
                     should_run = True
-                elif scheduled.last_run < now and (next_run is None or next_run <= now):
-                    should_run = True
+                else:
+                    last_run = scheduled.last_run.replace(tzinfo=timezone.utc)
+                    next_fire = trigger.get_next_fire_time(None, last_run)
+                    should_run = next_fire is not None and next_fire <= now
                 
-                if should_run:
-                    # Create a new scan
-                    scan = Scan(domain=scheduled.domain, is_scheduled=True)
-                    db.add(scan)
-                    db.commit()
-                    db.refresh(scan)
-                    
-                    # Update last run
-                    scheduled.last_run = now
-                    scheduled.next_run = trigger.get_next_fire_time(None, now)
-                    db.commit()
-                    
-                    print(f"[+] Running scheduled scan for {scheduled.domain}")
-                    await start_scan_task(scan.id, db)
+                next_run = trigger.get_next_fire_time(None, now)
+                scheduled.next_run = next_run.replace(tzinfo=None) if next_run else None
+                if should_run and scheduled.domain not in _dispatching:
+                    scheduled.last_run = now.replace(tzinfo=None)
+                    _dispatching.add(scheduled.domain)
+                    due.append((scheduled.domain, scheduled.cron_expression, scheduled.incremental is not False))
                     
             except Exception as e:
                 print(f"[!] Error processing schedule {scheduled.id}: {e}")
-                
-    finally:
-        db.close()
+        await db.commit()
+
+    random.shuffle(due)
+    for (domain, cron_expression, incremental), delay in zip(due, spread_offsets(len(due))):
+        task = asyncio.create_task(dispatch_scheduled(domain, cron_expression, incremental, delay))
+        _dispatch_tasks.add(task)
+        task.add_done_callback(_dispatch_tasks.discard)
+
+
+async def apply_retention():
+    """Archive or delete expired scans and maintain the database; VACUUM only while no scan is running."""
+    try:
+        await retention.run_retention(vacuum=not scan_queue.snapshot()["running"])
+    except Exception as e:
+        print(f"[!] Retention pass failed: {e}")
 
 
 # Create FastAPI app
@@ -118,10 +193,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.RequestLatencyMiddleware)
 
 # Include routers
 app.include_router(scans.router)
 app.include_router(results.router)
+app.include_router(asset_routes.router)
+app.include_router(events.router)
 
 
 @app.get("/")
@@ -136,3 +214,13 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus metrics: queue depth, live event clients, API latency, and per-stage scan aggregates."""
+    queue = scan_queue.snapshot()
+    metrics.scan_queue_depth.set(len(queue["queued"]))
+    metrics.scans_running.set(len(queue["running"]))
+    metrics.event_subscribers.set(event_bus.subscriber_count)
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,177 @@
+import bisect
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format, rendered by hand to avoid a client
+# library dependency. Values live in process memory and reset on restart.
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+
+def _key(labels: Dict[str, str]) -> LabelSet:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelSet, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format(labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[_key(labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # Per label set: count per bucket (the last one is +Inf), sum, count
+        self.values: Dict[LabelSet, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield f"{self.name}_bucket{_format(labels + (('le', le),))} {cumulative}"
+            yield f"{self.name}_sum{_format(labels)} {_number(total)}"
+            yield f"{self.name}_count{_format(labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+scans_finished = registry.add(Counter("recon_scans_finished_total", "Scans finished, by final status"))
+scan_queue_depth = registry.add(Gauge("recon_scan_queue_depth", "Scans waiting in the queue"))
+scans_running = registry.add(Gauge("recon_scans_running", "Scans currently running"))
+event_subscribers = registry.add(Gauge("recon_event_subscribers", "Clients connected to the live event stream"))
+stage_duration = registry.add(Histogram(
+    "recon_stage_duration_seconds", "Wall time of each scan stage", STAGE_BUCKETS
+))
+stage_items = registry.add(Counter("recon_stage_items_total", "Items into and out of each scan stage"))
+stage_lines = registry.add(Counter("recon_stage_lines_total", "Tool output lines parsed per stage"))
+stage_db_seconds = registry.add(Counter("recon_stage_db_seconds_total", "Database write time per stage"))
+tool_runs = registry.add(Counter("recon_tool_runs_total", "Tool process runs, by outcome"))
+tool_peak_rss = registry.add(Gauge("recon_tool_peak_rss_bytes", "Peak RSS of a tool's processes in the last scan"))
+request_duration = registry.add(Histogram(
+    "recon_http_request_duration_seconds", "API latency until the response starts", LATENCY_BUCKETS
+))
+
+
+def observe_scan(status: str, stages: Dict[str, dict], tools: Dict[str, Dict[str, float]]):
+    """Fold one finished scan's stage summary and tool report into the aggregates."""
+    scans_finished.inc(status=status)
+    for name, stage in stages.items():
+        stage_duration.observe(stage["wall_seconds"], stage=name)
+        stage_items.inc(stage["input"], stage=name, direction="in")
+        stage_items.inc(stage["output"], stage=name, direction="out")
+        stage_db_seconds.inc(stage["db_seconds"], stage=name)
+        if "lines" in stage:
+            stage_lines.inc(stage["lines"], stage=name)
+    for tool, counts in tools.items():
+        for outcome in ("ok", "empty", "timeout", "crashed"):
+            if counts[outcome]:
+                tool_runs.inc(counts[outcome], tool=tool, outcome=outcome)
+        if counts["peak_rss_kb"]:
+            tool_peak_rss.set(counts["peak_rss_kb"] * 1024, tool=tool)
+
+
+class RequestLatencyMiddleware:
+    """ASGI middleware timing each HTTP request until its response starts.
+
+    Streams (events, exports) are timed to their first byte rather than their
+    whole lifetime. Requests are labelled by route template, so path
+    parameters don't multiply series; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status: List[Optional[int]] = [None]
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                self._observe(scope, status[0], start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if status[0] is None:
+                self._observe(scope, 500, start)
+
+    @staticmethod
+    def _observe(scope, status: int, start: float):
+        route = scope.get("route")
+        request_duration.observe(
+            time.perf_counter() - start,
+            method=scope["method"],
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable
+from backend.config import TOOL_CACHE_PATH, TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_TTL
+from backend.recon.records import loads
+
+# SQLite's default limit on bound parameters per statement is 999 on older builds
+_SQL_BATCH = 900
+
+
+def cache_key(tool: str, host: str, args: str) -> str:
+    """Content address of one tool result: the tool, the host and the arguments that shape it."""
+    return hashlib.sha256(f"{tool}\0{host}\0{args}".encode()).hexdigest()
+
+
+class ToolCache:
+    """Per-host tool results shared across scans, stored in a small SQLite file.
+
+    Entries expire after the tool's TTL and the least recently used entries are
+    evicted once the cache holds more than max_entries. Methods are blocking and
+    thread-safe; call them from a worker thread.
+    """
+
+    def __init__(self, path: Path = TOOL_CACHE_PATH, max_entries: int = TOOL_CACHE_MAX_ENTRIES,
+                 ttl: Dict[str, int] = TOOL_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_cache ("
+                " key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_tool_cache_last_access ON tool_cache (last_access)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, tool: str, hosts: Iterable[str], args: str) -> dict:
+        """Return {host: value} for hosts with an unexpired entry."""
+        keys = {cache_key(tool, host, args): host for host in hosts}
+        now = time.time()
+        oldest = now - self.ttl.get(tool, 0)
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            key_list = list(keys)
+            for start in range(0, len(key_list), _SQL_BATCH):
+                batch = key_list[start:start + _SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, value FROM tool_cache WHERE stored_at >= ? AND key IN ({','.join('?' * len(batch))})",
+                    [oldest, *batch]
+                ).fetchall()
+                for key, value in rows:
+                    found[keys[key]] = loads(value)
+                conn.executemany("UPDATE tool_cache SET last_access = ? WHERE key = ?", [(now, key) for key, _ in rows])
+            conn.commit()
+            self.hits[tool] = self.hits.get(tool, 0) + len(found)
+            self.misses[tool] = self.misses.get(tool, 0) + len(keys) - len(found)
+        return found
+
+    def put_many(self, tool: str, values: dict, args: str):
+        """Store {host: value} results, then evict least recently used entries over the size limit."""
+        if not values:
+            return
+        now = time.time()
+        rows = [(cache_key(tool, host, args), tool, json.dumps(value), now, now) for host, value in values.items()]
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?, ?)", rows)
+            excess = conn.execute("SELECT COUNT(*) FROM tool_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM tool_cache WHERE key IN "
+                    "(SELECT key FROM tool_cache ORDER BY last_access LIMIT ?)", (excess,)
+                )
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection().execute("DELETE FROM tool_cache")
+            self._connection().commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = dict(self._connection().execute("SELECT tool, COUNT(*) FROM tool_cache GROUP BY tool").fetchall())
+        return {
+            "max_entries": self.max_entries,
+            "tools": {
+                tool: {
+                    "entries": entries.get(tool, 0),
+                    "ttl_seconds": self.ttl.get(tool, 0),
+                    "hits": self.hits.get(tool, 0),
+                    "misses": self.misses.get(tool, 0)
+                }
+                for tool in sorted(set(self.ttl) | set(entries))
+            }
+        }
+
+
+tool_cache = ToolCache()
@@ -0,0 +1,75 @@
+import json
+from typing import Dict, List, Optional, Set
+from sqlalchemy import delete, select
+from backend.database import AsyncSessionLocal, ScanCheckpoint
+from backend.recon.records import HttpRecord
+
+
+class Checkpoint:
+    """Stage output of an interrupted scan, rebuilt from its scan_checkpoints rows."""
+
+    def __init__(self):
+        self.subdomains: Optional[List[str]] = None
+        self.subdomains_complete = False  # subfinder finished with output, see backend.assets
+        # URLs live in the URL store; the checkpoint only records that gau finished
+        self.gau_urls: Optional[int] = None
+        self.port_results: Dict[str, List[int]] = {}
+        self.http_results: Dict[str, HttpRecord] = {}
+        self.naabu_done: Set[str] = set()
+        self.httpx_done: Set[str] = set()
+
+    def __bool__(self):
+        return bool(self.subdomains is not None or self.gau_urls is not None or self.naabu_done or self.httpx_done)
+
+    def describe(self) -> str:
+        parts = []
+        if self.subdomains is not None:
+            parts.append(f"{len(self.subdomains)} subdomains")
+        if self.naabu_done:
+            parts.append(f"naabu on {len(self.naabu_done)} hosts")
+        if self.httpx_done:
+            parts.append(f"httpx on {len(self.httpx_done)} hosts")
+        if self.gau_urls is not None:
+            parts.append(f"{self.gau_urls} URLs")
+        return ", ".join(parts)
+
+
+async def save_checkpoint(scan_id: int, stage: str, payload):
+    """Record a finished stage or tool batch. Uses its own session, so concurrent batches can call it."""
+    async with AsyncSessionLocal() as db:
+        db.add(ScanCheckpoint(scan_id=scan_id, stage=stage, payload=json.dumps(payload)))
+        await db.commit()
+
+
+async def load_checkpoint(scan_id: int) -> Checkpoint:
+    checkpoint = Checkpoint()
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(ScanCheckpoint.stage, ScanCheckpoint.payload)
+            .where(ScanCheckpoint.scan_id == scan_id)
+            .order_by(ScanCheckpoint.id)
+        )
+        for stage, payload in rows:
+            data = json.loads(payload)
+            if stage == "subfinder" and isinstance(data, dict):
+                checkpoint.subdomains = data["subdomains"]
+                checkpoint.subdomains_complete = data["complete"]
+            elif stage == "subfinder":  # Older bare lists don't say whether subfinder finished
+                checkpoint.subdomains = data
+            elif stage == "gau" and isinstance(data, dict):  # Older URL lists: run gau again
+                checkpoint.gau_urls = data["urls"]
+            elif stage == "naabu":
+                checkpoint.naabu_done.update(data["hosts"])
+                for host, ports in data["results"].items():
+                    checkpoint.port_results.setdefault(host, []).extend(ports)
+            elif stage == "httpx":
+                checkpoint.httpx_done.update(data["hosts"])
+                for item in data["results"]:
+                    record = HttpRecord.from_dict(item)
+                    checkpoint.http_results[record.host] = record
+    return checkpoint
+
+
+def clear_checkpoints(scan_id: int):
+    """DELETE statement for a scan's checkpoints, to run in the transaction that completes it."""
+    return delete(ScanCheckpoint).where(ScanCheckpoint.scan_id == scan_id)
@@ -0,0 +1,56 @@
+from typing import Dict
+from sqlalchemy.orm import Session
+from backend.database import Subdomain, SubdomainPort, SubdomainTechnology
+
+
+def _snapshot(db: Session, scan_id: int) -> Dict[str, dict]:
+    """Per-host comparable state of a scan, loaded with three flat queries."""
+    hosts = {}
+    for sub_id, name, status_code, title, is_alive in db.query(
+        Subdomain.id, Subdomain.subdomain, Subdomain.status_code, Subdomain.title, Subdomain.is_alive
+    ).filter(Subdomain.scan_id == scan_id):
+        hosts[sub_id] = {
+            "subdomain": name, "status_code": status_code, "title": title,
+            "is_alive": is_alive, "ports": set(), "technologies": set()
+        }
+    for sub_id, port in db.query(SubdomainPort.subdomain_id, SubdomainPort.port).filter(SubdomainPort.scan_id == scan_id):
+        if sub_id in hosts:
+            hosts[sub_id]["ports"].add(port)
+    for sub_id, tech in db.query(SubdomainTechnology.subdomain_id, SubdomainTechnology.tech).filter(
+        SubdomainTechnology.scan_id == scan_id
+    ):
+        if sub_id in hosts:
+            hosts[sub_id]["technologies"].add(tech)
+    return {host["subdomain"]: host for host in hosts.values()}
+
+
+def diff_scans(db: Session, old_scan_id: int, new_scan_id: int) -> dict:
+    """Hosts added/removed and per-host port, status, title and technology changes."""
+    old = _snapshot(db, old_scan_id)
+    new = _snapshot(db, new_scan_id)
+
+    changed = []
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        change = {}
+        if after["ports"] != before["ports"]:
+            change["opened_ports"] = sorted(after["ports"] - before["ports"])
+            change["closed_ports"] = sorted(before["ports"] - after["ports"])
+        for field in ("status_code", "title", "is_alive"):
+            if after[field] != before[field]:
+                change[field] = {"old": before[field], "new": after[field]}
+        if after["technologies"] != before["technologies"]:
+            change["technologies"] = {
+                "added": sorted(after["technologies"] - before["technologies"]),
+                "removed": sorted(before["technologies"] - after["technologies"])
+            }
+        if change:
+            changed.append({"subdomain": name, **change})
+
+    return {
+        "scan_id": new_scan_id,
+        "baseline_scan_id": old_scan_id,
+        "new_hosts": sorted(new.keys() - old.keys()),
+        "removed_hosts": sorted(old.keys() - new.keys()),
+        "changed_hosts": changed
+    }
@@ -1,110 +1,513 @@
 import asyncio
 import json
-from datetime import datetime
-from typing import Optional
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.config import (
+    PIPELINE_BATCH_SIZE, PIPELINE_QUEUE_SIZE, PIPELINE_FLUSH_SECONDS, PIPELINE_STAGE_WORKERS,
+    INCREMENTAL_RECHECK_HOURS, DNS_RESOLVE, URL_STORE_BATCH, URL_PREVIEW_LIMIT
+)
 from backend.database import Scan, Subdomain
-from backend.recon.tools import run_subfinder, run_naabu, run_httpx, run_gau
+from backend.recon.instrument import ScanMetrics
+from backend.recon.resolve import Resolver, WildcardDetector
+from backend.recon.tools import ToolReport, iter_subfinder, iter_gau, run_naabu, run_httpx
+from backend.recon.urls import build_host_index, group_urls
+from backend.recon.urlstore import url_store
+from backend.recon.persist import carry_forward, clear_scan_results, persist_subdomains
+from backend.recon.checkpoint import Checkpoint, clear_checkpoints, load_checkpoint, save_checkpoint
+from backend.events import event_bus, scan_summary
+from backend.assets import record_scan, subfinder_complete
+from backend import metrics
+
+# Marks the end of a pipeline queue
+_DONE = object()
+
+
+async def _batch_consumer(
+    queue: asyncio.Queue,
+    handler: Callable[[List[str]], Awaitable[None]],
+    batch_size: int = PIPELINE_BATCH_SIZE,
+    flush_seconds: float = PIPELINE_FLUSH_SECONDS,
+    workers: int = PIPELINE_STAGE_WORKERS
+):
+    """Drain a queue into batches and run handler on each, with bounded concurrency.
+
+    A partial batch is flushed once no new item has arrived for flush_seconds,
+    so slow producers still make progress downstream. The first batch that
+    fails stops the consumer with its exception.
+    """
+    slots = asyncio.Semaphore(workers)
+    tasks = set()
+    errors = []
+
+    def finished(task):
+        tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    async def run(batch):
+        try:
+            await handler(batch)
+        finally:
+            slots.release()
+
+    async def flush(batch):
+        await slots.acquire()
+        task = asyncio.create_task(run(batch))
+        tasks.add(task)
+        task.add_done_callback(finished)
+
+    batch = []
+    try:
+        while True:
+            if errors:
+                raise errors[0]
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=flush_seconds)
+            except asyncio.TimeoutError:
+                if batch:
+                    await flush(batch)
+                    batch = []
+                continue
+            if item is _DONE:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        if tasks:
+            await asyncio.gather(*tasks)
+        if errors:
+            raise errors[0]
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def _gather_stages(*stages: Awaitable):
+    """Run pipeline stages concurrently; if one fails, cancel the rest and re-raise."""
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
 
 class ReconEngine:
     """Main reconnaissance orchestration engine."""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
-    
+        self.scan_id: Optional[int] = None
+        self.report = ToolReport()
+        self.metrics = ScanMetrics()
+        # Set by _run_pipeline, for the asset history (backend.assets.record_scan)
+        self.lost_hosts: Set[str] = set()
+        self.subdomains_complete = False
+
+    def _progress(self, stage: str, done: int, total: Optional[int] = None, found: Optional[int] = None):
+        """Publish how far a stage of the current scan has got."""
+        if self.scan_id is not None:
+            event_bus.publish("progress", {
+                "scan_id": self.scan_id, "stage": stage, "done": done, "total": total, "found": found
+            })
+
+    def _finish_metrics(self, status: str) -> str:
+        """Fold the scan's stage metrics into the /metrics aggregates; returns them as JSON for the scan row."""
+        stages = self.metrics.summary(self.report.tools)
+        metrics.observe_scan(status, stages, self.report.tools)
+        return json.dumps(stages)
+
+    async def _checkpoint(self, stage: str, payload):
+        if self.scan_id is not None:
+            with self.metrics.db(stage):
+                await save_checkpoint(self.scan_id, stage, payload)
+
+    async def _open_resolver(self, domain: str) -> Optional[Resolver]:
+        """A resolver for the pre-probe DNS stage, or None if disabled or no resolver answers."""
+        if not DNS_RESOLVE:
+            return None
+        resolver = Resolver()
+        await resolver.open()
+        if await resolver.resolve(domain) is None:
+            print("[!] DNS resolvers are not answering; probing names without resolving them")
+            resolver.close()
+            return None
+        return resolver
+
+    async def _run_pipeline(
+        self,
+        domain: str,
+        skip_probe: Optional[Callable[[str], bool]] = None,
+        use_cache: bool = True,
+        checkpoint: Optional[Checkpoint] = None
+    ):
+        """Stream subfinder results through DNS resolution into batched naabu and httpx runs.
+
+        Returns (subdomains, port_results, http_results, addresses) once every
+        stage has drained; http_results maps hosts to their HttpRecord.
+        Subdomains for which skip_probe returns True are reported but not
+        probed. use_cache=False skips cached naabu/httpx results. Queues are
+        bounded so a fast subfinder applies backpressure instead of buffering
+        unboundedly. Hosts whose naabu or httpx shard failed are added to
+        self.lost_hosts, and self.subdomains_complete records whether
+        subfinder finished with output.
+
+        Names are resolved in batches before probing: names without an A record
+        and names that only match a wildcard zone are not probed, and naabu
+        scans each unique IP once, its ports fanned back out to every name on
+        that IP. addresses maps resolved names to the IP used. If resolution is
+        off or the resolvers don't answer, names are probed as-is.
+
+        The subdomain list and every naabu/httpx batch are checkpointed as they
+        finish. Given the checkpoint of an interrupted run, a saved subdomain
+        list replaces subfinder and hosts already probed are not probed again.
+        """
+        checkpoint = checkpoint or Checkpoint()
+        subdomains = []
+        port_results = {host: list(ports) for host, ports in checkpoint.port_results.items()}
+        http_results = dict(checkpoint.http_results)
+        probed = {"naabu": len(checkpoint.naabu_done), "httpx": len(checkpoint.httpx_done)}
+        queued = dict(probed)
+        addresses: Dict[str, str] = {}
+        # naabu results per scanned target (IP, or name if unresolved), shared across batches
+        target_ports: Dict[str, asyncio.Future] = {}
+        resolve_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        naabu_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        httpx_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        resolver = await self._open_resolver(domain)
+        wildcards = WildcardDetector(resolver, domain) if resolver else None
+        dns_counts = {"names": 0, "dropped": 0}
+
+        async def saved_subdomains():
+            for sub in checkpoint.subdomains:
+                yield sub
+
+        async def enqueue(sub):
+            if sub not in checkpoint.naabu_done:
+                queued["naabu"] += 1
+                await naabu_queue.put(sub)
+            if sub not in checkpoint.httpx_done:
+                queued["httpx"] += 1
+                await httpx_queue.put(sub)
+
+        async def produce():
+            resumed = checkpoint.subdomains is not None
+            try:
+                # Wall time includes waits on full queues, i.e. backpressure from naabu/httpx
+                with self.metrics.stage("subfinder") as stage:
+                    stage["input"] += 1
+                    async for sub in saved_subdomains() if resumed else iter_subfinder(domain, self.report):
+                        subdomains.append(sub)
+                        if len(subdomains) % PIPELINE_BATCH_SIZE == 0:
+                            self._progress("subfinder", len(subdomains))
+                        if skip_probe is not None and skip_probe(sub):
+                            continue
+                        await resolve_queue.put(sub)
+                    stage["output"] += len(subdomains)
+                print(f"[+] Found {len(subdomains)} subdomains")
+                if resumed:
+                    self.subdomains_complete = checkpoint.subdomains_complete
+                else:
+                    self.subdomains_complete = subfinder_complete(self.report.tools)
+                if not subdomains:
+                    subdomains.append(domain)  # At least scan the main domain
+                    await resolve_queue.put(domain)
+                if not resumed:
+                    await self._checkpoint("subfinder", {"subdomains": subdomains,
+                                                         "complete": self.subdomains_complete})
+                self._progress("subfinder", len(subdomains), len(subdomains))
+            finally:
+                await resolve_queue.put(_DONE)
+
+        async def resolve_batch(batch):
+            if resolver is None:
+                for sub in batch:
+                    await enqueue(sub)
+                return
+            with self.metrics.stage("dns") as stage:
+                answers = await resolver.resolve_many(batch)
+                dropped = 0
+                for sub in batch:
+                    ips = answers[sub]
+                    if ips:
+                        addresses[sub] = ips[0]
+                    if ips == [] or (ips and await wildcards.matches(sub, ips)):
+                        dropped += 1  # No A record, or only the zone's wildcard answer
+                        continue
+                    await enqueue(sub)  # Resolved, or no resolver answered: probe it
+                stage["input"] += len(batch)
+                stage["output"] += len(batch) - dropped
+            dns_counts["names"] += len(batch)
+            dns_counts["dropped"] += dropped
+            self._progress("dns", dns_counts["names"], None, len(set(addresses.values())))
+
+        async def resolve_stage():
+            try:
+                await _batch_consumer(resolve_queue, resolve_batch)
+                if resolver is not None:
+                    print(f"[+] Resolved {len(addresses)}/{dns_counts['names']} names to "
+                          f"{len(set(addresses.values()))} IPs; {dns_counts['dropped']} not probed "
+                          f"(no A record or wildcard match)")
+            finally:
+                await naabu_queue.put(_DONE)
+                await httpx_queue.put(_DONE)
+
+        async def scan_targets(targets: List[str]) -> Dict[str, Optional[List[int]]]:
+            """naabu ports per target; each target is scanned once per scan. None marks a lost target."""
+            new = [target for target in targets if target not in target_ports]
+            loop = asyncio.get_running_loop()
+            for target in new:
+                target_ports[target] = loop.create_future()
+            if new:
+                try:
+                    lost = []
+                    results = await run_naabu(new, use_cache=use_cache, failed=lost, report=self.report)
+                except Exception as e:
+                    # Batches waiting on these targets fail with the same error
+                    for target in new:
+                        target_ports[target].set_exception(e)
+                        target_ports[target].exception()  # Raised here; don't log it again if none wait
+                    raise
+                except BaseException:
+                    # The scan is being cancelled, and the batches waiting on these targets with it
+                    for target in new:
+                        target_ports[target].cancel()
+                    raise
+                lost_set = set(lost)
+                for target in new:
+                    target_ports[target].set_result(None if target in lost_set else results.get(target, []))
+            return {target: await target_ports[target] for target in targets}
+
+        async def probe_ports(batch):
+            targets = {host: addresses.get(host, host) for host in batch}
+            unique = list(dict.fromkeys(targets.values()))
+            print(f"[+] Running naabu on {len(batch)} hosts ({len(unique)} unique targets)...")
+            with self.metrics.stage("naabu") as stage:
+                target_results = await scan_targets(unique)
+                results = {host: target_results[target] for host, target in targets.items() if target_results[target]}
+                stage["input"] += len(batch)
+                stage["output"] += len(results)
+            # Hosts whose shard failed stay out of the checkpoint, so a resume retries them
+            lost = {host for host, target in targets.items() if target_results[target] is None}
+            self.lost_hosts.update(lost)
+            await self._checkpoint("naabu", {
+                "hosts": [host for host in batch if host not in lost],
+                "results": {host: ports for host, ports in results.items() if host not in lost}
+            })
+            for host, ports in results.items():
+                port_results.setdefault(host, []).extend(ports)
+            probed["naabu"] += len(batch)
+            self._progress("naabu", probed["naabu"], queued["naabu"], len(port_results))
+
+        async def probe_http(batch):
+            print(f"[+] Running httpx on {len(batch)} hosts...")
+            failed = []
+            with self.metrics.stage("httpx") as stage:
+                results = await run_httpx(batch, use_cache=use_cache, failed=failed, report=self.report)
+                stage["input"] += len(batch)
+                stage["output"] += len(results)
+            lost = set(failed)
+            self.lost_hosts.update(lost)
+            await self._checkpoint("httpx", {
+                "hosts": [host for host in batch if host not in lost],
+                "results": [record.to_dict() for record in results if record.host not in lost]
+            })
+            http_results.update((record.host, record) for record in results)
+            probed["httpx"] += len(batch)
+            self._progress("httpx", probed["httpx"], queued["httpx"], len(http_results))
+
+        try:
+            await _gather_stages(
+                produce(),
+                resolve_stage(),
+                _batch_consumer(naabu_queue, probe_ports),
+                _batch_consumer(httpx_queue, probe_http)
+            )
+        finally:
+            if resolver is not None:
+                wildcards.close()
+                resolver.close()
+        return subdomains, port_results, http_results, addresses
+
+    async def _run_gau(self, domain: str, saved: Optional[int] = None) -> int:
+        """Stream gau's URLs into the URL store and return how many the scan has.
+
+        URLs are written URL_STORE_BATCH at a time, so memory stays flat however
+        many gau finds. Skipped if an interrupted run already finished gau.
+        """
+        if saved is not None:
+            return saved
+        print(f"[+] Running gau on {domain}...")
+        with self.metrics.stage("gau") as stage:
+            batch = []
+            async for url in iter_gau(domain, self.report):
+                batch.append(url)
+                if len(batch) >= URL_STORE_BATCH:
+                    await asyncio.to_thread(url_store.add, self.scan_id, batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(url_store.add, self.scan_id, batch)
+            count = await asyncio.to_thread(url_store.count, self.scan_id)
+            stage["input"] += 1
+            stage["output"] += count
+        await self._checkpoint("gau", {"urls": count})
+        return count
+
+    async def _url_preview(self, subdomains: List[str]) -> Dict[str, List[str]]:
+        """Up to URL_PREVIEW_LIMIT stored URLs per subdomain, for the scan results."""
+        def build():
+            index = build_host_index(subdomains)
+            return group_urls(
+                (url for _, url in url_store.preview(self.scan_id, URL_PREVIEW_LIMIT)), index
+            )
+        return await asyncio.to_thread(build)
+
+    async def _fresh_baseline_hosts(self, scan: Scan) -> Dict[str, int]:
+        """For incremental scans, map recently probed hosts of the baseline scan to their row ids.
+
+        The baseline is the domain's latest completed scan. Hosts probed within
+        INCREMENTAL_RECHECK_HOURS are carried forward instead of re-probed.
+        """
+        baseline_id = await self.db.scalar(
+            select(Scan.id).where(
+                Scan.domain == scan.domain,
+                Scan.status == "completed",
+                Scan.id != scan.id
+            ).order_by(Scan.completed_at.desc()).limit(1)
+        )
+        if baseline_id is None:
+            return {}
+        scan.baseline_scan_id = baseline_id
+        await self.db.commit()
+
+        cutoff = datetime.utcnow() - timedelta(hours=INCREMENTAL_RECHECK_HOURS)
+        rows = await self.db.execute(
+            select(Subdomain.id, Subdomain.subdomain, Subdomain.probed_at, Subdomain.created_at)
+            .where(Subdomain.scan_id == baseline_id)
+        )
+        return {name: row_id for row_id, name, probed_at, created_at in rows if (probed_at or created_at) >= cutoff}
+
     async def run_full_scan(self, scan_id: int) -> bool:
-        """Execute full recon pipeline: subfinder → naabu → httpx → gau"""
-        scan = self.db.query(Scan).filter(Scan.id == scan_id).first()
+        """Execute full recon pipeline: subfinder → (naabu, httpx), with gau alongside"""
+        scan = await self.db.get(Scan, scan_id)
         if not scan:
             return False
+        self.scan_id = scan_id
         
         try:
             # Update status to running
             scan.status = "running"
-            self.db.commit()
+            await self.db.commit()
+            event_bus.publish("scan", scan_summary(scan))
             
             domain = scan.domain
-            print(f"[*] Starting scan for {domain}")
-            
-            # Step 1: Subdomain Enumeration
-            print(f"[+] Running subfinder on {domain}...")
-            subdomains = await run_subfinder(domain)
-            print(f"[+] Found {len(subdomains)} subdomains")
-            
-            if not subdomains:
-                subdomains = [domain]  # At least scan the main domain
-            
-            # Step 2: Port Scanning
-            print(f"[+] Running naabu on {len(subdomains)} hosts...")
-            port_results = await run_naabu(subdomains)
-            print(f"[+] Port scan complete")
-            
-            # Step 3: HTTP Probing
-            print(f"[+] Running httpx on {len(subdomains)} hosts...")
-            http_results = await run_httpx(subdomains)
-            print(f"[+] Found {len(http_results)} live web servers")
-            
-            # Create lookup dict for httpx results
-            http_lookup = {r['host']: r for r in http_results}
-            
-            # Step 4: URL Discovery (on main domain only to save time)
-            print(f"[+] Running gau on {domain}...")
-            all_urls = await run_gau(domain)
-            print(f"[+] Discovered {len(all_urls)} URLs")
+            print(f"[*] Starting {scan.mode or 'full'} scan for {domain}")
+
+            fresh = await self._fresh_baseline_hosts(scan) if scan.mode == "incremental" else {}
+            if fresh:
+                print(f"[+] {len(fresh)} hosts known from scan {scan.baseline_scan_id} are fresh")
+
+            # An interrupted run resumes from its checkpoints; rows it had
+            # started writing are dropped and written again in full
+            checkpoint = await load_checkpoint(scan_id)
+            if checkpoint:
+                print(f"[*] Resuming scan {scan_id} from checkpoint: {checkpoint.describe()}")
+            if await self.db.scalar(select(Subdomain.id).where(Subdomain.scan_id == scan_id).limit(1)):
+                await self.db.run_sync(clear_scan_results, scan_id)
             
-            # Group URLs by subdomain
-            url_map = {}
-            for url in all_urls:
-                for sub in subdomains:
-                    if sub in url:
-                        if sub not in url_map:
-                            url_map[sub] = []
-                        url_map[sub].append(url)
-                        break
+            # gau only needs the root domain, so it runs for the whole scan
+            gau_task = asyncio.create_task(self._run_gau(domain, checkpoint.gau_urls))
+
+            try:
+                # Subdomain enumeration feeding port scanning and HTTP probing
+                if checkpoint.subdomains is None:
+                    print(f"[+] Running subfinder on {domain}...")
+                subdomains, port_results, http_results, addresses = await self._run_pipeline(
+                    domain, fresh.__contains__, use_cache=not scan.bypass_cache, checkpoint=checkpoint
+                )
+                print(f"[+] Port scan complete")
+                print(f"[+] Found {len(http_results)} live web servers")
+
+                url_count = await gau_task
+                print(f"[+] Discovered {url_count} URLs")
+                self._progress("gau", 1, 1, url_count)
+            finally:
+                gau_task.cancel()
+
+            # The full corpus stays in the URL store; results keep a preview per host
+            url_map = await self._url_preview(subdomains)
             
-            # Save results to database
-            for subdomain in subdomains:
-                http_data = http_lookup.get(subdomain, {})
-                ports = port_results.get(subdomain, [])
-                urls = url_map.get(subdomain, [])
-                
-                subdomain_record = Subdomain(
-                    scan_id=scan_id,
-                    subdomain=subdomain,
-                    ip_address=http_data.get('ip'),
-                    ports=json.dumps(ports) if ports else None,
-                    status_code=http_data.get('status_code'),
-                    content_length=http_data.get('content_length'),
-                    title=http_data.get('title'),
-                    technologies=json.dumps(http_data.get('technologies', [])),
-                    urls=json.dumps(urls[:100]) if urls else None,  # Limit to 100 URLs per subdomain
-                    is_alive=http_data.get('is_alive', False)
+            # Save results to database; hosts that were not re-probed are copied from the baseline
+            carried = [fresh[sub] for sub in subdomains if sub in fresh]
+
+            def result_rows():
+                for subdomain in subdomains:
+                    if subdomain in fresh:
+                        continue
+                    http = http_results.get(subdomain)
+                    ports = port_results.get(subdomain, [])
+                    urls = url_map.get(subdomain, [])
+                    yield {
+                        'scan_id': scan_id,
+                        'subdomain': subdomain,
+                        'ip_address': addresses.get(subdomain) or (http.ip if http else None),
+                        'ports': ports,
+                        'status_code': http.status_code if http else None,
+                        'content_length': http.content_length if http else None,
+                        'title': http.title if http else None,
+                        'technologies': http.technologies if http else (),
+                        'urls': urls,
+                        'is_alive': http is not None
+                    }
+
+            with self.metrics.stage("persist") as stage, self.metrics.db("persist"):
+                written = await self.db.run_sync(persist_subdomains, result_rows())
+                print(f"[+] Saved {written} results")
+                if carried:
+                    await self.db.run_sync(carry_forward, scan_id, carried)
+                    print(f"[+] Carried forward {len(carried)} unchanged hosts")
+                if not self.subdomains_complete:
+                    print("[!] subfinder did not finish with results; no hosts are marked disappeared")
+                changes = await self.db.run_sync(
+                    record_scan, scan_id, lost=self.lost_hosts, subdomains_complete=self.subdomains_complete
                 )
-                self.db.add(subdomain_record)
+                print(f"[+] Recorded {changes} asset changes")
+                if self.lost_hosts:
+                    print(f"[!] {len(self.lost_hosts)} hosts lost their probe results and kept their last known state")
+                stage["input"] += len(subdomains)
+                stage["output"] += written + len(carried)
+            self._progress("persist", written + len(carried), len(subdomains))
             
+            failures = self.report.failures()
+            if failures:
+                print(f"[!] Some tool runs failed; results may be incomplete: {failures}")
+
             # Mark scan as completed
             scan.status = "completed"
             scan.completed_at = datetime.utcnow()
-            self.db.commit()
+            scan.tool_report = json.dumps(self.report.tools)
+            scan.metrics = self._finish_metrics("completed")
+            await self.db.execute(clear_checkpoints(scan_id))
+            await self.db.commit()
+            event_bus.publish("scan", scan_summary(scan))
             
             print(f"[✓] Scan completed for {domain}")
             return True
             
         except Exception as e:
             print(f"[!] Scan error: {e}")
+            await self.db.rollback()
             scan.status = "failed"
-            self.db.commit()
+            scan.tool_report = json.dumps(self.report.tools)
+            scan.metrics = self._finish_metrics("failed")
+            await self.db.commit()
+            event_bus.publish("scan", {"id": scan_id, "status": "failed"})
             return False
-
-
-# Global running scans tracker
-running_scans = {}
-
-
-async def start_scan_task(scan_id: int, db: Session):
-    """Background task to run a scan."""
-    engine = ReconEngine(db)
-    await engine.run_full_scan(scan_id)
-    if scan_id in running_scans:
-        del running_scans[scan_id]
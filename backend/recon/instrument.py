@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+class ScanMetrics:
+    """Per-stage wall time, input/output counts and database write time for one scan.
+
+    input and output count what a stage consumes and produces: the domain and
+    subdomains for subfinder, hosts and hosts with results for naabu/httpx,
+    the domain and URLs for gau, and subdomains and rows for persist.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+        self._spans: Dict[str, List[float]] = {}
+
+    def _stage(self, name: str) -> dict:
+        return self.stages.setdefault(name, {"wall_seconds": 0.0, "input": 0, "output": 0, "db_seconds": 0.0})
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time one run of a stage; a stage's wall time spans its first start to its last end."""
+        stage = self._stage(name)
+        start = time.perf_counter()
+        span = self._spans.setdefault(name, [start, start])
+        try:
+            yield stage
+        finally:
+            span[1] = max(span[1], time.perf_counter())
+            stage["wall_seconds"] = round(span[1] - span[0], 3)
+
+    @contextmanager
+    def db(self, name: str):
+        """Add the time spent in the block to a stage's database write time."""
+        stage = self._stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage["db_seconds"] = round(stage["db_seconds"] + time.perf_counter() - start, 3)
+
+    def summary(self, tools: Dict[str, Dict[str, float]]) -> Dict[str, dict]:
+        """Stages merged with their tool's process stats from a ToolReport, as stored on the scan."""
+        summary = {}
+        for name, stage in self.stages.items():
+            entry = dict(stage)
+            counts = tools.get(name)
+            if counts:
+                wall = stage["wall_seconds"]
+                entry["lines"] = counts["lines"]
+                entry["lines_per_second"] = round(counts["lines"] / wall, 1) if wall else None
+                entry["process_seconds"] = counts["seconds"]
+                entry["peak_rss_kb"] = counts["peak_rss_kb"] or None
+            summary[name] = entry
+        return summary
@@ -0,0 +1,408 @@
+import asyncio
+import heapq
+import itertools
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from backend.config import (
+    MAX_CONCURRENT_SCANS, RESUME_INTERRUPTED_SCANS, SCAN_QUEUE, WORKER_LEASE_SECONDS, WORKER_POLL_SECONDS
+)
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.database import AsyncSessionLocal, Scan, ScanJob
+from backend.recon.engine import ReconEngine
+from backend.events import event_bus, scan_summary
+from backend import metrics
+
+# Lower runs first: manual scans jump ahead of scheduled ones
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 10
+
+
+class ScanQueue:
+    """Process-wide scan job queue with a bounded pool of workers.
+
+    Scans are run in priority order, FIFO within a priority, by at most
+    max_concurrent workers. Cancelling a running scan cancels its task, which
+    kills the tool subprocesses it started.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_SCANS):
+        self.max_concurrent = max_concurrent
+        self._heap: List[tuple] = []
+        self._queued: Dict[int, tuple] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+        self._started_at: Dict[int, datetime] = {}
+        self._stopped: Dict[int, asyncio.Event] = {}  # Set once a running scan's worker is done with it
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Condition] = None
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+
+    def describe(self) -> str:
+        return f"{self.max_concurrent} concurrent scans"
+
+    def start(self):
+        """Start the worker pool on the running event loop."""
+        self._stopping = False
+        self._wakeup = asyncio.Condition()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent)]
+
+    async def stop(self):
+        """Stop the workers and cancel running scans."""
+        self._stopping = True
+        for task in list(self._running.values()) + self._workers:
+            task.cancel()
+        await asyncio.gather(*self._running.values(), *self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, scan_id: int, priority: int = PRIORITY_MANUAL):
+        """Queue a scan. Re-submitting a queued or running scan is a no-op."""
+        if scan_id in self._queued or scan_id in self._running:
+            return
+        entry = (priority, next(self._counter), scan_id)
+        self._queued[scan_id] = entry
+        heapq.heappush(self._heap, entry)
+        async with self._wakeup:
+            self._wakeup.notify()
+
+    async def cancel(self, scan_id: int) -> bool:
+        """Drop a queued scan or cancel a running one. Returns False if unknown."""
+        if self._queued.pop(scan_id, None) is not None:
+            await _set_status(scan_id, "cancelled")
+            return True
+        task = self._running.get(scan_id)
+        if task is not None:
+            task.cancel()
+            return True
+        return False
+
+    async def wait(self, scan_id: int, timeout: float) -> bool:
+        """Wait up to timeout seconds for a running scan to stop. Returns False if it is still running."""
+        stopped = self._stopped.get(scan_id)
+        if stopped is None:
+            return True
+        try:
+            await asyncio.wait_for(stopped.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def is_active(self, scan_id: int) -> bool:
+        return scan_id in self._queued or scan_id in self._running
+
+    def status(self, scan_id: int) -> Optional[dict]:
+        """Queue state of a scan: running, or queued with its 1-based position."""
+        if scan_id in self._running:
+            return {"state": "running", "started_at": self._started_at[scan_id].isoformat()}
+        entry = self._queued.get(scan_id)
+        if entry is None:
+            return None
+        position = sum(1 for other in self._queued.values() if other < entry) + 1
+        return {"state": "queued", "position": position, "priority": entry[0]}
+
+    def snapshot(self) -> dict:
+        queued = sorted(self._queued.values())
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": [
+                {"scan_id": scan_id, "started_at": self._started_at[scan_id].isoformat()}
+                for scan_id in self._running
+            ],
+            "queued": [
+                {"scan_id": scan_id, "position": position, "priority": priority}
+                for position, (priority, _, scan_id) in enumerate(queued, start=1)
+            ]
+        }
+
+    async def _next(self) -> int:
+        async with self._wakeup:
+            while True:
+                while self._heap:
+                    entry = heapq.heappop(self._heap)
+                    # Entries removed by cancel() are skipped lazily
+                    if self._queued.get(entry[2]) == entry:
+                        del self._queued[entry[2]]
+                        return entry[2]
+                await self._wakeup.wait()
+
+    async def _worker(self):
+        while True:
+            scan_id = await self._next()
+            task = asyncio.create_task(run_scan(scan_id))
+            self._running[scan_id] = task
+            self._started_at[scan_id] = datetime.utcnow()
+            self._stopped[scan_id] = asyncio.Event()
+            try:
+                await task
+            except asyncio.CancelledError:
+                if self._stopping or not task.cancelled():
+                    raise  # the worker itself is being stopped
+                print(f"[!] Scan {scan_id} cancelled")
+                await _set_status(scan_id, "cancelled")
+            except Exception as e:
+                print(f"[!] Scan {scan_id} crashed: {e}")
+            finally:
+                self._running.pop(scan_id, None)
+                self._started_at.pop(scan_id, None)
+                self._stopped.pop(scan_id).set()
+
+
+class DatabaseScanQueue:
+    """Scan queue kept in the scan_jobs table and run by worker processes (backend.worker).
+
+    The API process only adds and cancels jobs. A watcher re-reads the table
+    every poll_seconds to answer status()/snapshot(), relays the workers'
+    progress and scan status changes to the event bus, and folds scans that
+    finished on a worker into the /metrics aggregates. Cancelling a running
+    scan flags its job; the worker holding it stops the scan on its next
+    heartbeat.
+    """
+
+    def __init__(self, poll_seconds: float = WORKER_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._jobs: Dict[int, ScanJob] = {}
+        self._watcher: Optional[asyncio.Task] = None
+
+    def describe(self) -> str:
+        return "scan_jobs table, run by worker processes"
+
+    def start(self):
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Stop watching. Running scans carry on on their workers."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def submit(self, scan_id: int, priority: int = PRIORITY_MANUAL):
+        """Queue a scan. Re-submitting a queued or running scan is a no-op."""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                sqlite_insert(ScanJob.__table__)
+                .values(scan_id=scan_id, priority=priority)
+                .on_conflict_do_nothing(index_elements=["scan_id"])
+            )
+            await db.commit()
+        await self._load()
+
+    async def cancel(self, scan_id: int) -> bool:
+        """Drop a queued scan or flag a running one for its worker. Returns False if unknown."""
+        async with AsyncSessionLocal() as db:
+            dropped = (await db.execute(
+                delete(ScanJob).where(ScanJob.scan_id == scan_id, ScanJob.state == "queued")
+            )).rowcount
+            flagged = 0 if dropped else (await db.execute(
+                update(ScanJob).where(ScanJob.scan_id == scan_id).values(state="cancelling")
+            )).rowcount
+            await db.commit()
+        if dropped:
+            await _set_status(scan_id, "cancelled")
+        await self._load()
+        return bool(dropped or flagged)
+
+    async def wait(self, scan_id: int, timeout: float) -> bool:
+        """Wait up to timeout seconds for a running scan to stop. Returns False if it is still running.
+
+        A scan has stopped once its worker removed the job, or its lease
+        lapsed because the worker died.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            async with AsyncSessionLocal() as db:
+                running = await db.scalar(
+                    select(ScanJob.id).where(ScanJob.scan_id == scan_id, ScanJob.state != "queued",
+                                             ScanJob.lease_expires_at >= datetime.utcnow())
+                )
+            if running is None:
+                return True
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(min(1.0, deadline - loop.time()))
+
+    def is_active(self, scan_id: int) -> bool:
+        return scan_id in self._jobs
+
+    def status(self, scan_id: int) -> Optional[dict]:
+        """Queue state of a scan: running (with its worker), or queued with its 1-based position."""
+        job = self._jobs.get(scan_id)
+        if job is None:
+            return None
+        if job.state != "queued":
+            return {"state": "running", "started_at": job.started_at.isoformat(), "worker": job.worker_id}
+        position = sum(1 for other in self._queued() if (other.priority, other.id) < (job.priority, job.id)) + 1
+        return {"state": "queued", "position": position, "priority": job.priority}
+
+    def snapshot(self) -> dict:
+        running = [job for job in self._jobs.values() if job.state != "queued"]
+        workers: Dict[str, dict] = {}
+        for job in running:
+            worker = workers.setdefault(job.worker_id, {"worker": job.worker_id, "running": 0, "heartbeat_at": None})
+            worker["running"] += 1
+            heartbeat = job.heartbeat_at.isoformat()
+            worker["heartbeat_at"] = max(worker["heartbeat_at"] or heartbeat, heartbeat)
+        queued = sorted(self._queued(), key=lambda job: (job.priority, job.id))
+        return {
+            "workers": list(workers.values()),
+            "running": [
+                {"scan_id": job.scan_id, "started_at": job.started_at.isoformat(), "worker": job.worker_id}
+                for job in running
+            ],
+            "queued": [
+                {"scan_id": job.scan_id, "position": position, "priority": job.priority}
+                for position, job in enumerate(queued, start=1)
+            ]
+        }
+
+    def _queued(self) -> List[ScanJob]:
+        return [job for job in self._jobs.values() if job.state == "queued"]
+
+    async def _load(self) -> Dict[int, ScanJob]:
+        async with AsyncSessionLocal() as db:
+            jobs = (await db.execute(select(ScanJob))).scalars().all()
+        previous, self._jobs = self._jobs, {job.scan_id: job for job in jobs}
+        return previous
+
+    async def _watch(self):
+        while True:
+            try:
+                await self._poll()
+            except Exception as e:
+                print(f"[!] Job watcher: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _poll(self):
+        # A cancel whose worker died before acting on it has nobody left to finish it
+        async with AsyncSessionLocal() as db:
+            abandoned = (await db.execute(
+                delete(ScanJob)
+                .where(ScanJob.state == "cancelling", ScanJob.lease_expires_at < datetime.utcnow())
+                .returning(ScanJob.scan_id)
+            )).scalars().all()
+            await db.commit()
+        for scan_id in abandoned:
+            await _set_status(scan_id, "cancelled")
+
+        previous = await self._load()
+        for scan_id, job in self._jobs.items():
+            old = previous.get(scan_id)
+            if job.progress and (old is None or old.progress != job.progress):
+                for stage in json.loads(job.progress).values():
+                    event_bus.publish("progress", stage)
+        # Scans a worker has started (or restarted) or finished since the last poll
+        changed = [scan_id for scan_id, job in self._jobs.items()
+                   if job.started_at is not None
+                   and (scan_id not in previous or previous[scan_id].started_at != job.started_at)]
+        changed += [scan_id for scan_id in previous if scan_id not in self._jobs and scan_id not in abandoned]
+        if not changed:
+            return
+        async with AsyncSessionLocal() as db:
+            scans = (await db.execute(select(Scan).where(Scan.id.in_(changed)))).scalars().all()
+        for scan in scans:
+            event_bus.publish("scan", scan_summary(scan))
+            if scan.id not in self._jobs and scan.status in ("completed", "failed") and scan.metrics:
+                metrics.observe_scan(scan.status, json.loads(scan.metrics), json.loads(scan.tool_report or "{}"))
+
+
+async def claim_job(worker_id: str) -> Optional[Tuple[int, int]]:
+    """Lease the next queued (or abandoned) job to a worker. Returns (scan_id, attempts) or None.
+
+    The candidate is picked and leased in one UPDATE, so two workers can't
+    claim the same job.
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        ScanJob.state == "queued",
+        and_(ScanJob.state == "leased", ScanJob.lease_expires_at < now)
+    )
+    candidate = select(ScanJob.id).where(claimable).order_by(ScanJob.priority, ScanJob.id).limit(1)
+    async with AsyncSessionLocal() as db:
+        claimed = (await db.execute(
+            update(ScanJob)
+            .where(ScanJob.id == candidate.scalar_subquery(), claimable)
+            .values(state="leased", worker_id=worker_id, attempts=ScanJob.attempts + 1,
+                    started_at=now, heartbeat_at=now,
+                    lease_expires_at=now + timedelta(seconds=WORKER_LEASE_SECONDS))
+            .returning(ScanJob.scan_id, ScanJob.attempts)
+        )).first()
+        await db.commit()
+    return tuple(claimed) if claimed else None
+
+
+async def heartbeat_job(scan_id: int, worker_id: str, progress: Optional[dict] = None) -> Optional[str]:
+    """Renew a worker's lease and record the scan's progress.
+
+    Returns the job state (leased, or cancelling if a cancel was requested),
+    or None if the worker no longer holds the job: it was reclaimed after
+    the lease lapsed, or the scan was deleted.
+    """
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        state = (await db.execute(
+            update(ScanJob)
+            .where(ScanJob.scan_id == scan_id, ScanJob.worker_id == worker_id,
+                   ScanJob.state.in_(("leased", "cancelling")))
+            .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=WORKER_LEASE_SECONDS),
+                    progress=json.dumps(progress) if progress else None)
+            .returning(ScanJob.state)
+        )).scalar()
+        await db.commit()
+    return state
+
+
+async def release_job(scan_id: int, worker_id: str):
+    """Put a leased job back in the queue without counting the attempt (worker shutdown)."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ScanJob)
+            .where(ScanJob.scan_id == scan_id, ScanJob.worker_id == worker_id)
+            .values(state="queued", worker_id=None, lease_expires_at=None, attempts=ScanJob.attempts - 1)
+        )
+        await db.commit()
+
+
+async def finish_job(scan_id: int, worker_id: str):
+    """Remove a job its worker is done with."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ScanJob).where(ScanJob.scan_id == scan_id, ScanJob.worker_id == worker_id))
+        await db.commit()
+
+
+async def _set_status(scan_id: int, status: str):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Scan).where(Scan.id == scan_id).values(status=status))
+        await db.commit()
+    event_bus.publish("scan", {"id": scan_id, "status": status})
+
+
+async def run_scan(scan_id: int) -> bool:
+    """Run a scan to completion with its own DB session."""
+    async with AsyncSessionLocal() as db:
+        return await ReconEngine(db).run_full_scan(scan_id)
+
+
+async def recover_interrupted_scans(resume: bool = RESUME_INTERRUPTED_SCANS) -> int:
+    """Re-queue scans a restart left pending or running, or mark them failed if resume is off.
+
+    The local queue lives in memory, so any such scan was orphaned; scans
+    with a scan_jobs row belong to the database queue's workers and are left
+    alone. Running ones resume from their checkpoints. Returns the number of
+    scans recovered.
+    """
+    stmt = select(Scan.id, Scan.is_scheduled).where(Scan.status.in_(("pending", "running"))).order_by(Scan.id)
+    if SCAN_QUEUE == "database":
+        stmt = stmt.where(~Scan.jobs.any())
+    async with AsyncSessionLocal() as db:
+        interrupted = (await db.execute(stmt)).all()
+    for scan_id, is_scheduled in interrupted:
+        if resume:
+            await scan_queue.submit(scan_id, PRIORITY_SCHEDULED if is_scheduled else PRIORITY_MANUAL)
+        else:
+            await _set_status(scan_id, "failed")
+    return len(interrupted)
+
+
+scan_queue = DatabaseScanQueue() if SCAN_QUEUE == "database" else ScanQueue()
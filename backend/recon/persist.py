@@ -0,0 +1,123 @@
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from backend.config import PERSIST_CHUNK_SIZE
+from backend.database import Subdomain, SubdomainPort, SubdomainTechnology, SubdomainUrl
+from backend import search, stats
+
+
+def persist_subdomains(db: Session, rows: Iterable[dict], chunk_size: int = PERSIST_CHUNK_SIZE) -> int:
+    """Bulk insert Subdomain rows in fixed-size chunks, committing each chunk.
+
+    Each row is a dict of Subdomain columns plus optional 'ports',
+    'technologies' and 'urls' lists, which are written to the normalized child
+    tables. rows is consumed lazily, so callers can pass a generator and only
+    one chunk of parameter dicts is held in memory at a time. No ORM objects
+    are created. The materialized stat counters and the search index are
+    updated in the same transaction as each chunk. Returns the number of rows
+    written.
+    """
+    table = Subdomain.__table__
+    # Core insert on the table: a single executemany per chunk, without the
+    # ORM bulk path splitting batches on rows whose NULL columns differ. No
+    # RETURNING, which makes SQLAlchemy insert the rows one statement at a
+    # time; the chunk's ids are the contiguous range ending at
+    # last_insert_rowid(), as nothing else can insert inside the transaction
+    stmt = insert(table)
+    written = 0
+    probed_at = datetime.utcnow()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        deltas_by_scan = {}
+        for row in chunk:
+            row.setdefault('probed_at', probed_at)
+            stats.count_row(deltas_by_scan.setdefault(row['scan_id'], Counter()), row)
+        children = [
+            (row.pop('ports', None) or [], row.pop('technologies', None) or [], row.pop('urls', None) or [])
+            for row in chunk
+        ]
+        db.execute(stmt, chunk)
+        last_id = db.execute(select(func.last_insert_rowid())).scalar()
+        ids = range(last_id - len(chunk) + 1, last_id + 1)
+
+        ports, techs, urls, entries = [], [], [], []
+        for sub_id, row, (row_ports, row_techs, row_urls) in zip(ids, chunk, children):
+            scan_id = row['scan_id']
+            entries.append(search.index_entry(sub_id, row, row_techs))
+            ports.extend({'subdomain_id': sub_id, 'scan_id': scan_id, 'port': port} for port in row_ports)
+            techs.extend({'subdomain_id': sub_id, 'scan_id': scan_id, 'tech': tech} for tech in row_techs)
+            urls.extend({'subdomain_id': sub_id, 'scan_id': scan_id, 'host': row['subdomain'], 'url': url}
+                        for url in row_urls)
+        if ports:
+            db.execute(insert(SubdomainPort.__table__), ports)
+        if techs:
+            db.execute(insert(SubdomainTechnology.__table__), techs)
+        if urls:
+            db.execute(insert(SubdomainUrl.__table__), urls)
+        search.index_entries(db, entries)
+        for scan_id, deltas in deltas_by_scan.items():
+            stats.apply_deltas(db, scan_id, deltas)
+        db.commit()
+        written += len(chunk)
+    return written
+
+
+def carry_forward(db: Session, scan_id: int, subdomain_ids: List[int], chunk_size: int = PERSIST_CHUNK_SIZE) -> int:
+    """Copy existing Subdomain rows, with their child rows, into another scan.
+
+    The copy runs entirely inside SQLite with INSERT ... SELECT, so hosts an
+    incremental scan did not re-probe cost no Python-side row building. probed_at
+    is kept from the source row so staleness keeps accumulating. Returns the
+    number of rows copied.
+    """
+    table = Subdomain.__table__
+    copied = ['subdomain', 'ip_address', 'status_code', 'content_length', 'title', 'is_alive', 'probed_at']
+    source = table.alias('source')
+    target = table.alias('target')
+    now = datetime.utcnow()
+    written = 0
+    for start in range(0, len(subdomain_ids), chunk_size):
+        chunk = subdomain_ids[start:start + chunk_size]
+        first_new_id = (db.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+        db.execute(insert(table).from_select(
+            ['scan_id', 'created_at'] + copied,
+            select(literal(scan_id), literal(now), *[table.c[name] for name in copied]).where(table.c.id.in_(chunk))
+        ))
+        for child, columns in ((SubdomainPort, ['port']), (SubdomainTechnology, ['tech']), (SubdomainUrl, ['host', 'url'])):
+            child_table = child.__table__
+            db.execute(insert(child_table).from_select(
+                ['subdomain_id', 'scan_id'] + columns,
+                select(target.c.id, literal(scan_id), *[child_table.c[name] for name in columns])
+                .select_from(
+                    child_table
+                    .join(source, child_table.c.subdomain_id == source.c.id)
+                    .join(target, (target.c.subdomain == source.c.subdomain)
+                          & (target.c.scan_id == scan_id) & (target.c.id >= first_new_id))
+                )
+                .where(source.c.id.in_(chunk))
+            ))
+        stats.add_rows_from(db, scan_id, first_new_id)
+        search.add_rows_from(db, scan_id, first_new_id)
+        db.commit()
+        written += len(chunk)
+    return written
+
+
+def delete_scan_results(db: Session, scan_id: int):
+    """Delete a scan's result rows, counters and index entries with set-based DELETEs (no commit)."""
+    stats.remove_scan(db, scan_id)
+    search.remove_scan(db, scan_id)
+    for model in (SubdomainPort, SubdomainTechnology, SubdomainUrl, Subdomain):
+        db.execute(delete(model).where(model.scan_id == scan_id))
+
+
+def clear_scan_results(db: Session, scan_id: int):
+    """Delete a scan's result rows, counters and index entries, e.g. a partial write before a resume (commits)."""
+    delete_scan_results(db, scan_id)
+    db.commit()
@@ -0,0 +1,82 @@
+from typing import Dict, List
+from backend.config import (
+    DEFAULT_PORTS, SCAN_TIMEOUT, TOOL_BASE_TIMEOUT, TOOL_TIMEOUT_SLACK, TOOL_CONCURRENCY,
+    SCAN_BANDWIDTH_MBPS, SCAN_CPU_CORES, NAABU_MAX_RATE,
+    HTTPX_THREADS_PER_CORE, HTTPX_AVG_RESPONSE_KB, HTTPX_PROBE_SECONDS
+)
+
+# A SYN probe and its reply, with Ethernet/IP/TCP headers
+_PROBE_BITS = 2 * 64 * 8
+
+
+def _clamp(value: float, low: int, high: int) -> int:
+    return int(max(low, min(high, value)))
+
+
+def port_count(ports: str) -> int:
+    """Number of ports in a naabu port list such as "22,80,8000-8100"."""
+    count = 0
+    for part in ports.split(","):
+        part = part.strip()
+        if "-" in part:
+            low, high = part.split("-", 1)
+            count += max(int(high) - int(low) + 1, 0)
+        elif part:
+            count += 1
+    return max(count, 1)
+
+
+def naabu_rate() -> int:
+    """Packets/s for one naabu process: its share of the bandwidth budget."""
+    total = SCAN_BANDWIDTH_MBPS * 1_000_000 / _PROBE_BITS
+    return _clamp(total / TOOL_CONCURRENCY.get("naabu", 1), 100, NAABU_MAX_RATE)
+
+
+def httpx_threads() -> int:
+    """Threads for one httpx process: its share of the CPU budget."""
+    return _clamp(SCAN_CPU_CORES * HTTPX_THREADS_PER_CORE / TOOL_CONCURRENCY.get("httpx", 1), 5, 500)
+
+
+def httpx_rate_limit() -> int:
+    """Requests/s for one httpx process: its share of the bandwidth budget."""
+    total = SCAN_BANDWIDTH_MBPS * 1_000_000 / 8 / (HTTPX_AVG_RESPONSE_KB * 1024)
+    return _clamp(total / TOOL_CONCURRENCY.get("httpx", 1), 5, 5000)
+
+
+def naabu_flags() -> List[str]:
+    return ["-rate", str(naabu_rate())]
+
+
+def httpx_flags() -> List[str]:
+    return ["-threads", str(httpx_threads()), "-rl", str(httpx_rate_limit())]
+
+
+def timeout_for(tool: str, hosts: int = 0, ports: int = 1) -> int:
+    """Timeout in seconds for one run of tool over hosts (and ports, for naabu).
+
+    The base timeout plus TOOL_TIMEOUT_SLACK times the run's expected duration
+    at the configured rates, capped at SCAN_TIMEOUT.
+    """
+    if tool == "naabu":
+        expected = hosts * ports / naabu_rate()
+    elif tool == "httpx":
+        expected = max(hosts / httpx_rate_limit(), hosts * HTTPX_PROBE_SECONDS / httpx_threads())
+    else:
+        expected = 0
+    return int(min(TOOL_BASE_TIMEOUT.get(tool, 600) + TOOL_TIMEOUT_SLACK * expected, SCAN_TIMEOUT))
+
+
+def describe() -> Dict[str, dict]:
+    """Effective per-process settings, for the API."""
+    return {
+        "naabu": {"rate": naabu_rate()},
+        "httpx": {"threads": httpx_threads(), "rate_limit": httpx_rate_limit()},
+        "timeouts": {
+            "base": TOOL_BASE_TIMEOUT,
+            "slack": TOOL_TIMEOUT_SLACK,
+            "max": SCAN_TIMEOUT,
+            "naabu_per_1000_hosts": timeout_for("naabu", 1000, port_count(DEFAULT_PORTS)),
+            "httpx_per_1000_hosts": timeout_for("httpx", 1000)
+        }
+    }
+
@@ -0,0 +1,77 @@
+"""Compact records for naabu/httpx output, shared by the probing stages, checkpoints, the tool cache and persistence."""
+import json
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+try:  # Optional: orjson decodes httpx's JSON lines several times faster than the json module
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_DECODER = "orjson" if orjson is not None else "json"
+
+# Both raise a ValueError subclass on malformed input
+loads = orjson.loads if orjson is not None else json.loads
+
+
+@dataclass(slots=True)
+class HttpRecord:
+    """One host's httpx probe, with only the fields results keep.
+
+    Technology names and IPs repeat across many hosts and are interned, so
+    100k records share one copy of each.
+    """
+    host: str
+    status_code: Optional[int] = None
+    content_length: Optional[int] = None
+    title: Optional[str] = ""
+    technologies: Tuple[str, ...] = ()
+    ip: str = ""
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HttpRecord":
+        """Rebuild a record from to_dict() output, as stored in checkpoints and the tool cache."""
+        return cls(
+            data['host'], data.get('status_code'), data.get('content_length'), data.get('title', ''),
+            tuple(map(sys.intern, data.get('technologies') or ())), sys.intern(data.get('ip') or '')
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'host': self.host,
+            'status_code': self.status_code,
+            'content_length': self.content_length,
+            'title': self.title,
+            'technologies': list(self.technologies),
+            'ip': self.ip
+        }
+
+
+def parse_httpx(line: str, loads=loads) -> Optional[HttpRecord]:
+    """An httpx -json line as a record, or None if it isn't a JSON object. Other fields are dropped."""
+    try:
+        data = loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return HttpRecord(
+        data.get('input', ''), data.get('status_code'), data.get('content_length'), data.get('title', ''),
+        tuple(map(sys.intern, data.get('tech') or ())), sys.intern(data.get('host') or '')
+    )
+
+
+def parse_naabu(line: str, loads=loads) -> Optional[Tuple[str, int]]:
+    """(host, port) from a naabu -json line, or None if it has neither."""
+    try:
+        data = loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    host = data.get('host', data.get('ip', ''))
+    port = data.get('port')
+    if host and port:
+        return host, port
+    return None
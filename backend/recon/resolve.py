@@ -0,0 +1,175 @@
+import asyncio
+import itertools
+import random
+import struct
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from backend.config import DNS_RESOLVERS, DNS_CONCURRENCY, DNS_TIMEOUT, DNS_RETRIES
+
+_TYPE_A = 1
+_CLASS_IN = 1
+_NOERROR, _NXDOMAIN = 0, 3
+
+
+def build_query(name: str, qid: int) -> bytes:
+    """A-record query for name with recursion desired."""
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(bytes([len(label)]) + label for label in name.rstrip(".").encode("idna").split(b".") if label)
+    return header + labels + b"\x00" + struct.pack("!HH", _TYPE_A, _CLASS_IN)
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:  # compression pointer ends the name
+            return offset + 2
+        offset += length + 1
+        if length == 0:
+            return offset
+
+
+def parse_response(data: bytes) -> Tuple[int, int, List[str]]:
+    """(query id, rcode, IPv4 addresses) of a response; CNAME chains are followed by the resolver."""
+    qid, flags, qdcount, ancount = struct.unpack("!HHHH", data[:8])
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    addresses = []
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, rclass, _, length = struct.unpack("!HHIH", data[offset:offset + 10])
+        offset += 10
+        if rtype == _TYPE_A and rclass == _CLASS_IN and length == 4:
+            addresses.append(".".join(str(b) for b in data[offset:offset + 4]))
+        offset += length
+    return qid, flags & 0x0F, addresses
+
+
+def _parse_server(server: str) -> Tuple[str, int]:
+    host, _, port = server.partition(":")
+    return host, int(port or 53)
+
+
+class _DNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self, pending: Dict[int, Tuple[asyncio.Future, Tuple[str, int]]]):
+        self.pending = pending
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < 12:
+            return
+        entry = self.pending.get(struct.unpack("!H", data[:2])[0])
+        if entry is not None and not entry[0].done() and addr[:2] == entry[1]:
+            entry[0].set_result(data)
+
+    def error_received(self, exc):
+        pass  # Unreachable resolvers surface as timeouts
+
+
+class Resolver:
+    """Concurrent A-record lookups over UDP, spread round-robin over a list of IPv4 resolvers.
+
+    One socket carries every query; replies are matched by query id and
+    source address. A resolver that times out or answers SERVFAIL/REFUSED is
+    retried on the next one.
+    """
+
+    def __init__(
+        self,
+        servers: Iterable[str] = DNS_RESOLVERS,
+        concurrency: int = DNS_CONCURRENCY,
+        timeout: float = DNS_TIMEOUT,
+        retries: int = DNS_RETRIES
+    ):
+        self.servers = [_parse_server(server) for server in servers]
+        self.timeout = timeout
+        self.retries = retries
+        self._slots = asyncio.Semaphore(concurrency)
+        self._next_server = itertools.cycle(self.servers)
+        self._pending: Dict[int, Tuple[asyncio.Future, Tuple[str, int]]] = {}
+        self._transport = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DNSProtocol(self._pending), local_addr=("0.0.0.0", 0)
+        )
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def _query_id(self) -> int:
+        while True:
+            qid = random.randrange(1, 65536)
+            if qid not in self._pending:
+                return qid
+
+    async def resolve(self, name: str) -> Optional[List[str]]:
+        """Sorted IPv4 addresses of name; [] if it has none, None if no resolver answered."""
+        try:
+            query = build_query(name, 0)
+        except UnicodeError:  # Not a valid DNS name; leave it to the tools
+            return None
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            for _ in range(self.retries + 1):
+                server = next(self._next_server)
+                qid = self._query_id()
+                future = loop.create_future()
+                self._pending[qid] = (future, server)
+                try:
+                    self._transport.sendto(struct.pack("!H", qid) + query[2:], server)
+                    data = await asyncio.wait_for(future, self.timeout)
+                    _, rcode, addresses = parse_response(data)
+                except (asyncio.TimeoutError, OSError, struct.error, IndexError):
+                    continue
+                finally:
+                    del self._pending[qid]
+                if rcode in (_NOERROR, _NXDOMAIN):
+                    return sorted(set(addresses))
+        return None
+
+    async def resolve_many(self, names: List[str]) -> Dict[str, Optional[List[str]]]:
+        answers = await asyncio.gather(*(self.resolve(name) for name in names))
+        return dict(zip(names, answers))
+
+
+class WildcardDetector:
+    """Remembers which zones answer for any name, and with which addresses.
+
+    A zone is checked once, by resolving two random labels under it. A name
+    whose addresses all belong to its parent zone's wildcard answer is a
+    wildcard match rather than a host of its own.
+    """
+
+    def __init__(self, resolver: Resolver, root_domain: str):
+        self.resolver = resolver
+        self.root_domain = root_domain.lower()
+        self._zones: Dict[str, asyncio.Task] = {}
+
+    async def _probe(self, zone: str) -> Set[str]:
+        addresses: Set[str] = set()
+        for _ in range(2):
+            label = "".join(random.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=16))
+            addresses.update(await self.resolver.resolve(f"{label}.{zone}") or ())
+        return addresses
+
+    async def wildcard_addresses(self, zone: str) -> Set[str]:
+        task = self._zones.get(zone)
+        if task is None:
+            task = self._zones[zone] = asyncio.ensure_future(self._probe(zone))
+        return await task
+
+    async def matches(self, name: str, addresses: List[str]) -> bool:
+        name = name.lower()
+        if name == self.root_domain or "." not in name:
+            return False
+        zone = name.split(".", 1)[1]
+        if zone != self.root_domain and not zone.endswith("." + self.root_domain):
+            return False
+        wildcard = await self.wildcard_addresses(zone)
+        return bool(wildcard) and set(addresses) <= wildcard
+
+    def close(self):
+        for task in self._zones.values():
+            task.cancel()
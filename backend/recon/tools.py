@@ -1,123 +1,422 @@
 import asyncio
-import subprocess
-import json
 import tempfile
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional
-from backend.config import SUBFINDER_PATH, NAABU_PATH, HTTPX_PATH, GAU_PATH, DEFAULT_PORTS
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+from backend.config import (
+    SUBFINDER_PATH, NAABU_PATH, HTTPX_PATH, GAU_PATH, DEFAULT_PORTS, TOOL_CONCURRENCY,
+    TOOL_SHARD_SIZE, TOOL_SHARD_RETRIES
+)
+from backend.recon.cache import tool_cache
+from backend.recon.records import HttpRecord, parse_httpx, parse_naabu
+from backend.recon import policy
 
+# Upper bound on a single output line; longer lines are discarded whole rather
+# than buffered without limit (httpx can emit very large JSON records).
+STREAM_LINE_LIMIT = 1024 * 1024
 
-async def run_command(cmd: List[str], timeout: int = 600) -> str:
-    """Run a command asynchronously and return output."""
+# How often a running tool's peak RSS is read from /proc
+RSS_SAMPLE_SECONDS = 0.5
+
+# Marks the end of one shard's output in iter_sharded
+_SHARD_DONE = object()
+
+
+class ToolError(Exception):
+    """A tool process did not finish normally."""
+
+
+class ToolTimeout(ToolError):
+    pass
+
+
+class ToolCrashed(ToolError):
+    pass
+
+
+class ToolReport:
+    """Outcomes of a scan's tool runs, so a timeout or crash never reads as "no results".
+
+    Per tool it counts runs that finished with output (ok), finished without
+    output (empty), timed out or crashed, and hosts lost to shards that failed
+    on every attempt. It also sums output lines, lines discarded for being
+    longer than STREAM_LINE_LIMIT and process time, and keeps the highest
+    peak RSS seen.
+    """
+
+    OUTCOMES = ("ok", "empty", "timeout", "crashed")
+
+    def __init__(self):
+        self.tools: Dict[str, Dict[str, float]] = {}
+
+    def _counts(self, tool: str) -> Dict[str, float]:
+        counts = self.tools.get(tool)
+        if counts is None:
+            counts = self.tools[tool] = dict.fromkeys(
+                self.OUTCOMES + ("hosts_lost", "lines", "lines_dropped", "peak_rss_kb"), 0
+            )
+            counts["seconds"] = 0.0
+        return counts
+
+    def record(self, tool: str, outcome: str, lines: int = 0, seconds: float = 0.0, peak_rss_kb: int = 0,
+               dropped: int = 0):
+        counts = self._counts(tool)
+        counts[outcome] += 1
+        counts["lines"] += lines
+        counts["lines_dropped"] += dropped
+        counts["seconds"] = round(counts["seconds"] + seconds, 3)
+        counts["peak_rss_kb"] = max(counts["peak_rss_kb"], peak_rss_kb)
+
+    def lose(self, tool: str, hosts: int):
+        self._counts(tool)["hosts_lost"] += hosts
+
+    def failures(self) -> Dict[str, Dict[str, int]]:
+        """Tools with at least one timed-out or crashed run."""
+        return {
+            tool: {key: counts[key] for key in ("timeout", "crashed", "hosts_lost") if counts[key]}
+            for tool, counts in self.tools.items()
+            if counts["timeout"] or counts["crashed"]
+        }
+
+
+# Process-wide caps on concurrently running processes per tool
+_tool_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+@asynccontextmanager
+async def tool_slot(tool: str):
+    """Hold one of the configured concurrency slots for a tool while it runs."""
+    slots = _tool_slots.get(tool)
+    if slots is None:
+        slots = _tool_slots[tool] = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool, 1))
+    async with slots:
+        yield
+
+
+async def _drain(stream: Optional[asyncio.StreamReader]) -> None:
+    """Read and discard a stream so the child never blocks on a full pipe."""
+    if stream is None:
+        return
+    while await stream.read(65536):
+        pass
+
+
+async def _read_line(stream: asyncio.StreamReader) -> Optional[bytes]:
+    """The next line, b"" at EOF, or None for a line over the stream's limit.
+
+    An over-long line is skipped through its newline, so its tail is never
+    returned as a line of its own.
+    """
+    try:
+        return await stream.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial  # Last line without a newline, or b"" at EOF
+    except asyncio.LimitOverrunError as e:
+        overrun = e
+    while True:
+        await stream.readexactly(overrun.consumed)
+        try:
+            await stream.readuntil(b"\n")
+            return None
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as e:
+            overrun = e
+
+
+async def _sample_peak_rss(pid: int, peak: List[int]) -> None:
+    """Track a process's peak RSS in KiB (VmHWM) while it runs. Linux only; a no-op elsewhere."""
+    path = f"/proc/{pid}/status"
+    while True:
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak[0] = max(peak[0], int(line.split()[1]))
+                        break
+        except (OSError, ValueError):
+            return
+        await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+
+async def stream_command(
+    cmd: List[str],
+    timeout: int = 600,
+    check: bool = False,
+    report: Optional[ToolReport] = None,
+    tool: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Run a command and yield its stdout line by line as it is produced.
+
+    stderr is drained concurrently so a chatty tool cannot deadlock on a full
+    pipe. The process is killed if the overall timeout expires or the consumer
+    stops iterating early. A run that finishes is classified as ok, empty,
+    timeout or crashed (failed start or non-zero exit) and recorded in report
+    under tool, with its line count, run time and sampled peak RSS. Lines
+    longer than STREAM_LINE_LIMIT are discarded and counted. With check=True
+    a timeout raises ToolTimeout and a crash raises ToolCrashed; otherwise
+    they are only logged.
+    """
+    tool = tool or Path(cmd[0]).name
     try:
         process = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await asyncio.wait_for(
-            process.communicate(),
-            timeout=timeout
+            stderr=asyncio.subprocess.PIPE,
+            limit=STREAM_LINE_LIMIT
         )
-        return stdout.decode('utf-8', errors='ignore')
-    except asyncio.TimeoutError:
-        process.kill()
-        return ""
     except Exception as e:
-        print(f"Command error: {e}")
-        return ""
+        print(f"[!] {tool} failed to start: {e}")
+        if report is not None:
+            report.record(tool, "crashed")
+        if check:
+            raise ToolCrashed(f"{tool} failed to start: {e}") from e
+        return
+
+    stderr_task = asyncio.create_task(_drain(process.stderr))
+    peak_rss = [0]
+    rss_task = asyncio.create_task(_sample_peak_rss(process.pid, peak_rss))
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + timeout
+    timed_out = False
+    lines = 0
+    dropped = 0
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            raw = await asyncio.wait_for(_read_line(process.stdout), timeout=remaining)
+            if raw is None:
+                dropped += 1
+                continue
+            if not raw:
+                break
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if line:
+                lines += 1
+                yield line
+        await asyncio.wait_for(process.wait(), timeout=max(deadline - loop.time(), 1))
+    except asyncio.TimeoutError:
+        timed_out = True
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_task.cancel()
+        rss_task.cancel()
 
+    if timed_out:
+        outcome = "timeout"
+        print(f"[!] {tool} timed out after {timeout}s ({lines} lines of output kept)")
+    elif process.returncode:
+        outcome = "crashed"
+        print(f"[!] {tool} exited with status {process.returncode} ({lines} lines of output kept)")
+    else:
+        outcome = "ok" if lines else "empty"
+    if dropped:
+        print(f"[!] {tool}: discarded {dropped} lines longer than {STREAM_LINE_LIMIT} bytes")
+    if report is not None:
+        report.record(tool, outcome, lines, loop.time() - started, peak_rss[0], dropped)
+    if check and outcome == "timeout":
+        raise ToolTimeout(f"{tool} timed out after {timeout}s")
+    if check and outcome == "crashed":
+        raise ToolCrashed(f"{tool} exited with status {process.returncode}")
 
-async def run_subfinder(domain: str) -> List[str]:
-    """Run subfinder for subdomain enumeration."""
-    cmd = [SUBFINDER_PATH, "-d", domain, "-silent", "-all"]
-    output = await run_command(cmd)
-    subdomains = [line.strip() for line in output.split('\n') if line.strip()]
-    return list(set(subdomains))
 
+async def iter_sharded(
+    tool: str,
+    hosts: List[str],
+    build_cmd: Callable[[str], List[str]],
+    timeout: Union[int, Callable[[int], int]],
+    failed: Optional[List[str]] = None,
+    shard_size: Optional[int] = None,
+    retries: int = TOOL_SHARD_RETRIES,
+    report: Optional[ToolReport] = None
+) -> AsyncIterator[str]:
+    """Run a host-list tool over shards of hosts concurrently and merge their output lines.
 
-async def run_naabu(hosts: List[str], ports: str = DEFAULT_PORTS) -> dict:
-    """Run naabu for port scanning. Returns {host: [ports]}"""
+    build_cmd maps a hosts file path to the command line. Each shard is its own
+    process, holding one of the tool's concurrency slots, with its own timeout
+    (seconds, or a function of the shard's host count). A shard that times out
+    or crashes is retried up to retries times; lines it emitted before failing
+    are yielded again on retry, so callers dedupe. Hosts of shards that never
+    succeed are appended to failed and counted as lost in report.
+    """
     if not hosts:
-        return {}
-    
-    results = {}
-    
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-        f.write('\n'.join(hosts))
-        hosts_file = f.name
-    
+        return
+    shard_size = shard_size or TOOL_SHARD_SIZE.get(tool, len(hosts))
+    shards = [hosts[i:i + shard_size] for i in range(0, len(hosts), shard_size)]
+    lines: asyncio.Queue = asyncio.Queue(maxsize=len(shards) * 100)
+    shard_timeout = timeout if callable(timeout) else lambda _: timeout
+
+    async def run_shard(shard: List[str]):
+        try:
+            for attempt in range(retries + 1):
+                async with tool_slot(tool):
+                    hosts_file = _write_hosts_file(shard)
+                    try:
+                        async for line in stream_command(build_cmd(hosts_file), timeout=shard_timeout(len(shard)),
+                                                         check=True, report=report, tool=tool):
+                            await lines.put(line)
+                        return
+                    except ToolError as e:
+                        outcome = "retrying" if attempt < retries else "giving up"
+                        print(f"[!] {tool} shard of {len(shard)} hosts failed ({e}), {outcome}")
+                    finally:
+                        Path(hosts_file).unlink(missing_ok=True)
+            if failed is not None:
+                failed.extend(shard)
+            if report is not None:
+                report.lose(tool, len(shard))
+        finally:
+            await lines.put(_SHARD_DONE)
+
+    tasks = [asyncio.create_task(run_shard(shard)) for shard in shards]
     try:
-        cmd = [NAABU_PATH, "-list", hosts_file, "-p", ports, "-silent", "-json"]
-        output = await run_command(cmd, timeout=1200)
-        
-        for line in output.split('\n'):
-            if not line.strip():
-                continue
-            try:
-                data = json.loads(line)
-                host = data.get('host', data.get('ip', ''))
-                port = data.get('port')
-                if host and port:
-                    if host not in results:
-                        results[host] = []
-                    results[host].append(port)
-            except json.JSONDecodeError:
-                continue
+        remaining = len(tasks)
+        while remaining:
+            line = await lines.get()
+            if line is _SHARD_DONE:
+                remaining -= 1
+            else:
+                yield line
+        await asyncio.gather(*tasks)
     finally:
-        Path(hosts_file).unlink(missing_ok=True)
-    
-    return results
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
-async def run_httpx(hosts: List[str]) -> List[dict]:
-    """Run httpx for web probing and tech detection."""
-    if not hosts:
-        return []
-    
-    results = []
-    
+# httpx probe flags; also part of the httpx cache key
+HTTPX_PROBE_FLAGS = [
+    "-td",  # Tech detect
+    "-sc",  # Status code
+    "-cl",  # Content length
+    "-title",
+    "-ip"
+]
+HTTPX_CACHE_ARGS = " ".join(HTTPX_PROBE_FLAGS)
+
+
+def _write_hosts_file(hosts: List[str]) -> str:
     with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
         f.write('\n'.join(hosts))
-        hosts_file = f.name
-    
-    try:
-        cmd = [
-            HTTPX_PATH, "-l", hosts_file, "-silent", "-json",
-            "-td",  # Tech detect
-            "-sc",  # Status code
-            "-cl",  # Content length
-            "-title",
-            "-ip"
-        ]
-        output = await run_command(cmd, timeout=900)
-        
-        for line in output.split('\n'):
-            if not line.strip():
-                continue
-            try:
-                data = json.loads(line)
-                results.append({
-                    'url': data.get('url', ''),
-                    'host': data.get('input', ''),
-                    'status_code': data.get('status_code'),
-                    'content_length': data.get('content_length'),
-                    'title': data.get('title', ''),
-                    'technologies': data.get('tech', []),
-                    'ip': data.get('host', ''),
-                    'is_alive': True
-                })
-            except json.JSONDecodeError:
-                continue
-    finally:
-        Path(hosts_file).unlink(missing_ok=True)
-    
+        return f.name
+
+
+async def iter_subfinder(domain: str, report: Optional[ToolReport] = None) -> AsyncIterator[str]:
+    """Stream unique subdomains from subfinder as they are discovered."""
+    cmd = [SUBFINDER_PATH, "-d", domain, "-silent", "-all"]
+    seen = set()
+    async with tool_slot("subfinder"):
+        async for line in stream_command(cmd, timeout=policy.timeout_for("subfinder"), report=report, tool="subfinder"):
+            if line not in seen:
+                seen.add(line)
+                yield line
+
+
+async def iter_naabu(hosts: List[str], ports: str = DEFAULT_PORTS, failed: Optional[List[str]] = None,
+                     report: Optional[ToolReport] = None) -> AsyncIterator[tuple]:
+    """Stream unique (host, port) pairs from sharded naabu runs as they are found.
+
+    Hosts whose shard failed on every attempt are appended to failed.
+    """
+    seen = set()
+    ports_per_host = policy.port_count(ports)
+
+    def build_cmd(hosts_file):
+        return [NAABU_PATH, "-list", hosts_file, "-p", ports, "-silent", "-json", *policy.naabu_flags()]
+
+    def timeout(shard_hosts):
+        return policy.timeout_for("naabu", shard_hosts, ports_per_host)
+
+    async for line in iter_sharded("naabu", hosts, build_cmd, timeout=timeout, failed=failed, report=report):
+        found = parse_naabu(line)
+        if found is not None and found not in seen:
+            seen.add(found)
+            yield found
+
+
+async def run_naabu(hosts: List[str], ports: str = DEFAULT_PORTS, use_cache: bool = True,
+                    failed: Optional[List[str]] = None, report: Optional[ToolReport] = None) -> dict:
+    """Run naabu for port scanning. Returns {host: [ports]}
+
+    Hosts with an unexpired cached result for the same ports string are not
+    rescanned; hosts with no open ports are cached too. Hosts that could not be
+    scanned are appended to failed and not cached.
+    """
+    cached = await asyncio.to_thread(tool_cache.get_many, "naabu", hosts, ports) if use_cache else {}
+    results = {host: host_ports for host, host_ports in cached.items() if host_ports}
+    misses = [host for host in hosts if host not in cached]
+
+    scanned = {host: [] for host in misses}
+    lost = []
+    async for host, port in iter_naabu(misses, ports, failed=lost, report=report):
+        scanned.setdefault(host, []).append(port)
+    # Partial output from a failed shard is returned but never cached
+    lost_set = set(lost)
+    complete = {host: host_ports for host, host_ports in scanned.items() if host not in lost_set}
+    await asyncio.to_thread(tool_cache.put_many, "naabu", complete, ports)
+    if failed is not None:
+        failed.extend(lost)
+
+    results.update((host, host_ports) for host, host_ports in scanned.items() if host_ports)
+    return results
+
+
+async def iter_httpx(hosts: List[str], failed: Optional[List[str]] = None,
+                     report: Optional[ToolReport] = None) -> AsyncIterator[HttpRecord]:
+    """Stream one httpx probe record per host from sharded httpx runs as they are produced.
+
+    Hosts whose shard failed on every attempt are appended to failed.
+    """
+    seen = set()
+
+    def build_cmd(hosts_file):
+        return [HTTPX_PATH, "-l", hosts_file, "-silent", "-json", *HTTPX_PROBE_FLAGS, *policy.httpx_flags()]
+
+    def timeout(shard_hosts):
+        return policy.timeout_for("httpx", shard_hosts)
+
+    async for line in iter_sharded("httpx", hosts, build_cmd, timeout=timeout, failed=failed, report=report):
+        record = parse_httpx(line)
+        if record is None or record.host in seen:
+            continue
+        seen.add(record.host)
+        yield record
+
+
+async def run_httpx(hosts: List[str], use_cache: bool = True, failed: Optional[List[str]] = None,
+                    report: Optional[ToolReport] = None) -> List[HttpRecord]:
+    """Run httpx for web probing and tech detection.
+
+    Hosts with an unexpired cached probe are not re-probed; hosts that did not
+    answer are cached as None. Hosts that could not be probed are appended to
+    failed and not cached.
+    """
+    cached = await asyncio.to_thread(tool_cache.get_many, "httpx", hosts, HTTPX_CACHE_ARGS) if use_cache else {}
+    results = [HttpRecord.from_dict(record) for record in cached.values() if record]
+    misses = [host for host in hosts if host not in cached]
+
+    probed = dict.fromkeys(misses)
+    lost = []
+    async for record in iter_httpx(misses, failed=lost, report=report):
+        probed[record.host] = record
+    lost_set = set(lost)
+    complete = {host: record.to_dict() if record else None for host, record in probed.items() if host not in lost_set}
+    await asyncio.to_thread(tool_cache.put_many, "httpx", complete, HTTPX_CACHE_ARGS)
+    if failed is not None:
+        failed.extend(lost)
+
+    results.extend(record for record in probed.values() if record)
     return results
 
 
-async def run_gau(domain: str) -> List[str]:
-    """Run gau for URL discovery."""
+async def iter_gau(domain: str, report: Optional[ToolReport] = None) -> AsyncIterator[str]:
+    """Stream URLs from gau as they are discovered (not deduplicated)."""
     cmd = [GAU_PATH, "--subs", domain]
-    output = await run_command(cmd, timeout=600)
-    urls = [line.strip() for line in output.split('\n') if line.strip()]
-    return list(set(urls))
+    async with tool_slot("gau"):
+        async for line in stream_command(cmd, timeout=policy.timeout_for("gau"), report=report, tool="gau"):
+            yield line
@@ -0,0 +1,54 @@
+from typing import Dict, Iterable, List, Optional
+
+
+def url_host(url: str) -> Optional[str]:
+    """Return the lowercased hostname of a URL, or None if it has none."""
+    start = url.find('://')
+    start = start + 3 if start != -1 else (2 if url.startswith('//') else 0)
+    end = len(url)
+    for sep in '/?#':
+        idx = url.find(sep, start)
+        if idx != -1 and idx < end:
+            end = idx
+    netloc = url[start:end]
+    at = netloc.rfind('@')
+    if at != -1:
+        netloc = netloc[at + 1:]
+    if netloc.startswith('['):
+        close = netloc.find(']')
+        host = netloc[1:close] if close != -1 else netloc[1:]
+    else:
+        colon = netloc.find(':')
+        host = netloc[:colon] if colon != -1 else netloc
+    host = host.rstrip('.').lower()
+    return host or None
+
+
+def build_host_index(subdomains: Iterable[str]) -> Dict[str, str]:
+    """Map normalized hostnames to the subdomain names used by the scan."""
+    return {sub.rstrip('.').lower(): sub for sub in subdomains}
+
+
+def group_urls(
+    urls: Iterable[str],
+    index: Dict[str, str],
+    per_host_limit: Optional[int] = None
+) -> Dict[str, List[str]]:
+    """Assign each URL to the subdomain whose hostname it has exactly.
+
+    Cost is one hostname parse and one dict lookup per URL. URLs whose host is
+    not in the index are dropped. When per_host_limit is set, at most that many
+    URLs are kept for each subdomain.
+    """
+    url_map = {}
+    lookup = index.get
+    for url in urls:
+        sub = lookup(url_host(url))
+        if sub is None:
+            continue
+        bucket = url_map.get(sub)
+        if bucket is None:
+            url_map[sub] = bucket = []
+        if per_host_limit is None or len(bucket) < per_host_limit:
+            bucket.append(url)
+    return url_map
@@ -0,0 +1,286 @@
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from backend.config import URL_STORE_PATH
+from backend.recon.urls import url_host
+
+# SQLite's default limit on bound parameters per statement is 999 on older builds
+_SQL_BATCH = 900
+
+# Scheme codes; RAW keeps the whole URL when it can't be rebuilt from scheme + host + rest
+_RAW, _HTTP, _HTTPS = 0, 1, 2
+_SCHEMES = {"http://": _HTTP, "https://": _HTTPS}
+_PREFIXES = {_HTTP: "http://", _HTTPS: "https://"}
+
+# Preset dictionary for compressing the part of a URL after its host. Stored
+# rows depend on it: never change it, only add a new codec version.
+_ZDICT = (
+    b"index.php index.html .html .htm .aspx .asp .jsp .json .xml .txt .pdf .svg .gif .png .jpg .jpeg "
+    b".woff2 .woff .ttf .ico .map .min.js .min.css .js .css /static/ /assets/ /images/ /img/ /js/ /css/ "
+    b"/media/ /uploads/ /wp-includes/ /wp-content/plugins/ /wp-content/themes/ /wp-content/uploads/ "
+    b"/wp-json/ /wp-admin/ /admin/ /login /api/v1/ /api/v2/ /api/ /search ?page= ?id= &id= ?q= "
+    b"&utm_source= &utm_medium= &utm_campaign= ?utm_source= ?ver= ?v= &lang= ?lang= ?url= ?redirect= "
+    b"?callback= ?token= ?ref= &ref= ?s= ?p= &p= ?category= /product/ /products/ /category/ /blog/ "
+    b"/tag/ /page/ /user/ /users/ /account/ /cart/ /checkout/ /news/ /docs/ /en/ /en-us/ /robots.txt"
+)
+
+
+def _compress(text: str) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, _ZDICT)
+    return compressor.compress(text.encode()) + compressor.flush()
+
+
+def _decompress(data: bytes) -> str:
+    return zlib.decompressobj(-15, _ZDICT).decompress(data).decode()
+
+
+def url_hash(url: str) -> int:
+    """Signed 64-bit content address of a URL: its row id, and so the dedup key."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def split_url(url: str, host: str) -> Tuple[int, str]:
+    """(scheme code, rest) such that the URL is scheme + host + rest, or (RAW, url)."""
+    for prefix, scheme in _SCHEMES.items():
+        if url.startswith(prefix):
+            end = len(prefix) + len(host)
+            if url[len(prefix):end] == host:
+                return scheme, url[end:]
+            break
+    return _RAW, url
+
+
+def join_url(scheme: int, host: str, rest: str) -> str:
+    return rest if scheme == _RAW else _PREFIXES[scheme] + host + rest
+
+
+def url_path(scheme: int, rest: str) -> str:
+    """Path and query of a stored URL, for prefix matching."""
+    if scheme == _RAW:
+        start = rest.find("://")
+        start = rest.find("/", start + 3) if start != -1 else rest.find("/")
+        return rest[start:] if start != -1 else ""
+    slash = rest.find("/")
+    return rest[slash:] if rest.startswith(":") and slash != -1 else rest
+
+
+class UrlStore:
+    """Every URL a scan discovered, deduplicated across scans, in its own SQLite file.
+
+    Each distinct URL is stored once: its host in hosts, and the rest of it
+    deflate-compressed with a preset URL dictionary, under a 64-bit hash of
+    the URL as its row id (no separate dedup index).
+    scan_urls records which scans saw which URLs, clustered by scan and host,
+    so a scan's URLs for one host are a single range read. Methods are
+    blocking and thread-safe; call them from a worker thread.
+    """
+
+    def __init__(self, path: Path = URL_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Truncate the WAL after checkpoints instead of leaving it at its peak size
+            conn.execute("PRAGMA journal_size_limit=8388608")
+            conn.execute("CREATE TABLE IF NOT EXISTS hosts (id INTEGER PRIMARY KEY, host TEXT NOT NULL UNIQUE)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                " id INTEGER PRIMARY KEY, host_id INTEGER NOT NULL,"
+                " scheme INTEGER NOT NULL, rest BLOB NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scan_urls ("
+                " scan_id INTEGER NOT NULL, host_id INTEGER NOT NULL, url_id INTEGER NOT NULL,"
+                " PRIMARY KEY (scan_id, host_id, url_id)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_scan_urls_url ON scan_urls (url_id)")
+            self._conn = conn
+        return self._conn
+
+    def _host_ids(self, conn: sqlite3.Connection, hosts: List[str]) -> Dict[str, int]:
+        conn.executemany("INSERT OR IGNORE INTO hosts (host) VALUES (?)", [(host,) for host in hosts])
+        ids = {}
+        for start in range(0, len(hosts), _SQL_BATCH):
+            batch = hosts[start:start + _SQL_BATCH]
+            ids.update(conn.execute(
+                f"SELECT host, id FROM hosts WHERE host IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return ids
+
+    def add(self, scan_id: int, urls: Iterable[str]) -> int:
+        """Record a batch of a scan's URLs. Returns how many the scan had not recorded before."""
+        parsed = {}
+        for url in urls:
+            host = url_host(url)
+            if host is not None:
+                parsed.setdefault(url_hash(url), (url, host))
+        if not parsed:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            host_ids = self._host_ids(conn, sorted({host for _, host in parsed.values()}))
+            # Only URLs no scan has stored yet are compressed and written
+            known = set()
+            digests = list(parsed)
+            for start in range(0, len(digests), _SQL_BATCH):
+                batch = digests[start:start + _SQL_BATCH]
+                known.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM urls WHERE id IN ({','.join('?' * len(batch))})", batch
+                ))
+            conn.executemany(
+                "INSERT INTO urls (id, host_id, scheme, rest) VALUES (?, ?, ?, ?)",
+                [
+                    (digest, host_ids[host], scheme, _compress(rest))
+                    for digest, (url, host) in parsed.items() if digest not in known
+                    for scheme, rest in (split_url(url, host),)
+                ]
+            )
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO scan_urls VALUES (?, ?, ?)",
+                [(scan_id, host_ids[host], digest) for digest, (_, host) in parsed.items()]
+            )
+            added = conn.total_changes - before
+            conn.commit()
+        return added
+
+    def _rows(self, scan_id: int, host: Optional[str], after: Tuple[int, int], limit: int) -> List[tuple]:
+        with self._lock:
+            conn = self._connection()
+            where, params = "s.scan_id = ? AND (s.host_id, s.url_id) > (?, ?)", (scan_id, *after)
+            if host is not None:
+                # Spelled out per column: with the row-value form SQLite ignores host_id = ?
+                row = conn.execute("SELECT id FROM hosts WHERE host = ?", (host.lower(),)).fetchone()
+                if row is None or after[0] > row[0]:
+                    return []
+                where, params = "s.scan_id = ? AND s.host_id = ?", (scan_id, row[0])
+                if after[0] == row[0]:
+                    where, params = where + " AND s.url_id > ?", (*params, after[1])
+            return conn.execute(
+                "SELECT s.host_id, s.url_id, h.host, u.scheme, u.rest FROM scan_urls s"
+                " JOIN urls u ON u.id = s.url_id JOIN hosts h ON h.id = s.host_id"
+                f" WHERE {where} ORDER BY s.host_id, s.url_id LIMIT ?", (*params, limit)
+            ).fetchall()
+
+    def iter_urls(
+        self,
+        scan_id: int,
+        host: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        after: Tuple[int, int] = (0, 0),
+        batch_size: int = 1000
+    ) -> Iterator[Tuple[Tuple[int, int], str]]:
+        """Yield (position, url) for a scan's URLs in storage order, optionally for one host
+        and/or a path prefix, starting after a position. Reads batch_size rows at a time."""
+        while True:
+            rows = self._rows(scan_id, host, after, batch_size)
+            for host_id, url_id, name, scheme, blob in rows:
+                rest = _decompress(blob)
+                if path_prefix is None or url_path(scheme, rest).startswith(path_prefix):
+                    yield (host_id, url_id), join_url(scheme, name, rest)
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][:2]
+
+    def page(
+        self,
+        scan_id: int,
+        host: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[str], Optional[str]]:
+        """One page of URLs and the cursor for the next page (None on the last one)."""
+        last = tuple(int(part) for part in cursor.split(":")) if cursor else (0, 0)
+        urls = []
+        for position, url in self.iter_urls(scan_id, host, path_prefix, last, batch_size=max(limit, 100)):
+            if len(urls) == limit:
+                return urls, f"{last[0]}:{last[1]}"
+            urls.append(url)
+            last = position
+        return urls, None
+
+    def hosts(self, scan_id: int, cursor: Optional[str] = None, limit: int = 1000) -> Tuple[List[dict], Optional[str]]:
+        """One page of a scan's hosts with their URL counts, and the cursor for the next page."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT s.host_id, h.host, s.urls FROM ("
+                "  SELECT host_id, COUNT(*) AS urls FROM scan_urls WHERE scan_id = ? AND host_id > ?"
+                "  GROUP BY host_id ORDER BY host_id LIMIT ?"
+                ") s JOIN hosts h ON h.id = s.host_id ORDER BY s.host_id",
+                (scan_id, int(cursor or 0), limit + 1)
+            ).fetchall()
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [{"host": host, "urls": count} for _, host, count in rows[:limit]], next_cursor
+
+    def preview(self, scan_id: int, per_host: int) -> Iterator[Tuple[str, str]]:
+        """(host, url) for at most per_host URLs of each of a scan's hosts."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT h.host, u.scheme, u.rest FROM ("
+                "  SELECT host_id, url_id, ROW_NUMBER() OVER (PARTITION BY host_id ORDER BY url_id) AS n"
+                "  FROM scan_urls WHERE scan_id = ?"
+                ") s JOIN urls u ON u.id = s.url_id JOIN hosts h ON h.id = s.host_id WHERE s.n <= ?",
+                (scan_id, per_host)
+            ).fetchall()
+        for host, scheme, blob in rows:
+            yield host, join_url(scheme, host, _decompress(blob))
+
+    def count(self, scan_id: int) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM scan_urls WHERE scan_id = ?", (scan_id,)
+            ).fetchone()[0]
+
+    def delete_scan(self, scan_id: int):
+        """Forget a scan's URLs, and the URLs no other scan saw."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS doomed (url_id INTEGER PRIMARY KEY)")
+            conn.execute("INSERT OR IGNORE INTO doomed SELECT url_id FROM scan_urls WHERE scan_id = ?", (scan_id,))
+            conn.execute("DELETE FROM scan_urls WHERE scan_id = ?", (scan_id,))
+            conn.execute(
+                "DELETE FROM urls WHERE id IN (SELECT url_id FROM doomed)"
+                " AND NOT EXISTS (SELECT 1 FROM scan_urls s WHERE s.url_id = urls.id)"
+            )
+            conn.execute("DELETE FROM doomed")
+            conn.commit()
+
+    def maintain(self, vacuum_ratio: float) -> bool:
+        """Drop hosts no scan has URLs for, refresh planner statistics, and VACUUM
+        once vacuum_ratio of the file is free pages. Returns whether it vacuumed."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM hosts WHERE id NOT IN (SELECT host_id FROM scan_urls)")
+            conn.commit()
+            conn.execute("PRAGMA analysis_limit=1000")
+            conn.execute("ANALYZE")
+            conn.commit()
+            pages, free = conn.execute(
+                "SELECT * FROM pragma_page_count(), pragma_freelist_count()"
+            ).fetchone()
+            if not pages or free / pages < vacuum_ratio:
+                return False
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connection()
+            urls, hosts, memberships = conn.execute(
+                "SELECT (SELECT COUNT(*) FROM urls), (SELECT COUNT(*) FROM hosts), (SELECT COUNT(*) FROM scan_urls)"
+            ).fetchone()
+        size = sum(p.stat().st_size for p in self.path.parent.glob(self.path.name + "*") if p.is_file())
+        return {"urls": urls, "hosts": hosts, "scan_urls": memberships, "bytes": size}
+
+
+url_store = UrlStore()
@@ -0,0 +1,283 @@
+import asyncio
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from backend.config import (
+    ARCHIVE_DIR, EXPORT_BATCH_SIZE, PERSIST_CHUNK_SIZE, RETENTION_KEEP_DAYS, RETENTION_KEEP_LAST,
+    URL_STORE_BATCH, VACUUM_FREE_RATIO
+)
+from backend.database import (
+    RetentionPolicy, Scan, ScanCheckpoint, ScanJob, Subdomain, SubdomainPort, SubdomainTechnology, SubdomainUrl,
+    SessionLocal, engine
+)
+from backend.events import event_bus, scan_summary
+from backend.recon.persist import delete_scan_results, persist_subdomains
+from backend.recon.urlstore import url_store
+
+# Scans retention may archive or delete
+FINISHED = ("completed", "failed", "cancelled")
+
+# Subdomain columns kept in archives; row ids are reassigned on restore
+ARCHIVED_COLUMNS = ("subdomain", "ip_address", "status_code", "content_length", "title", "is_alive",
+                    "created_at", "probed_at")
+_DATETIME_COLUMNS = ("created_at", "probed_at")
+_CHILDREN = (
+    ("ports", SubdomainPort, SubdomainPort.port),
+    ("technologies", SubdomainTechnology, SubdomainTechnology.tech),
+    ("urls", SubdomainUrl, SubdomainUrl.url),
+)
+
+
+def in_session(fn, *args):
+    """Call fn(db, *args) with a session of its own, e.g. from asyncio.to_thread."""
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def default_policy() -> dict:
+    return {"keep_last": RETENTION_KEEP_LAST or None, "keep_days": RETENTION_KEEP_DAYS or None, "archive": True}
+
+
+def policy_dict(policy: RetentionPolicy) -> dict:
+    return {
+        "domain": policy.domain,
+        "keep_last": policy.keep_last,
+        "keep_days": policy.keep_days,
+        "archive": policy.archive,
+        "updated_at": policy.updated_at.isoformat() if policy.updated_at else None
+    }
+
+
+def archive_path(scan_id: int) -> Path:
+    return ARCHIVE_DIR / f"scan-{scan_id}.jsonl.gz"
+
+
+def delete_scan(db: Session, scan_id: int):
+    """Delete a scan, its results and its archive with set-based DELETEs (commits).
+
+    Child rows are deleted explicitly rather than left to ON DELETE CASCADE,
+    which databases created before the constraints were declared don't have.
+    The caller drops the scan's URLs from the URL store.
+    """
+    delete_scan_results(db, scan_id)
+    for model in (ScanCheckpoint, ScanJob):
+        db.execute(delete(model).where(model.scan_id == scan_id))
+    db.execute(delete(Scan).where(Scan.id == scan_id))
+    db.commit()
+    archive_path(scan_id).unlink(missing_ok=True)
+
+
+def _archived_rows(db: Session, scan_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """A scan's results with their child lists, batch_size rows per round-trip."""
+    columns = [Subdomain.__table__.c[name] for name in ARCHIVED_COLUMNS]
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Subdomain.id, *columns)
+            .where(Subdomain.scan_id == scan_id, Subdomain.id > last_id)
+            .order_by(Subdomain.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        ids = [row.id for row in rows]
+        children: Dict[str, Dict[int, list]] = {}
+        for key, model, column in _CHILDREN:
+            values = children[key] = defaultdict(list)
+            for subdomain_id, value in db.execute(
+                select(model.subdomain_id, column).where(model.subdomain_id.in_(ids)).order_by(model.id)
+            ):
+                values[subdomain_id].append(value)
+        for row in rows:
+            item = {name: getattr(row, name) for name in ARCHIVED_COLUMNS}
+            for name in _DATETIME_COLUMNS:
+                item[name] = item[name].isoformat() if item[name] else None
+            for key, _, _ in _CHILDREN:
+                item[key] = children[key][row.id]
+            yield item
+        last_id = ids[-1]
+
+
+def archive_scan(db: Session, scan_id: int) -> Optional[dict]:
+    """Move a finished scan's results and stored URLs into a gzipped JSON lines file (commits).
+
+    The scan row stays, with status archived, so it is still listed and
+    restore_scan can bring its results back. Returns counts and the archive
+    size, or None if the scan doesn't exist or isn't finished.
+    """
+    scan = db.get(Scan, scan_id)
+    if scan is None or scan.status not in FINISHED:
+        return None
+    path = archive_path(scan_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    results = urls = 0
+    with gzip.open(partial, "wt", compresslevel=6, encoding="utf-8") as out:
+        header = {"id": scan_id, "domain": scan.domain, "status": scan.status,
+                  "archived_at": datetime.utcnow().isoformat()}
+        out.write(json.dumps({"scan": header}) + "\n")
+        for row in _archived_rows(db, scan_id):
+            out.write(json.dumps({"result": row}) + "\n")
+            results += 1
+        batch = []
+        for _, url in url_store.iter_urls(scan_id, batch_size=URL_STORE_BATCH):
+            batch.append(url)
+            if len(batch) >= URL_STORE_BATCH:
+                out.write(json.dumps({"urls": batch}) + "\n")
+                urls, batch = urls + len(batch), []
+        if batch:
+            out.write(json.dumps({"urls": batch}) + "\n")
+            urls += len(batch)
+    os.replace(partial, path)
+
+    delete_scan_results(db, scan_id)
+    db.execute(delete(ScanCheckpoint).where(ScanCheckpoint.scan_id == scan_id))
+    scan.status = "archived"
+    db.commit()
+    url_store.delete_scan(scan_id)
+    return {"scan_id": scan_id, "results": results, "urls": urls, "bytes": path.stat().st_size}
+
+
+def restore_scan(db: Session, scan_id: int) -> Optional[dict]:
+    """Load an archived scan's results and URLs back, restore its status and delete the archive (commits).
+
+    Rows left by an interrupted restore are cleared first. Returns counts, or
+    None if the scan isn't archived.
+    """
+    scan = db.get(Scan, scan_id)
+    path = archive_path(scan_id)
+    if scan is None or scan.status != "archived" or not path.exists():
+        return None
+    delete_scan_results(db, scan_id)
+    db.commit()
+    url_store.delete_scan(scan_id)
+
+    results = urls = 0
+    with gzip.open(path, "rt", encoding="utf-8") as src:
+        header = json.loads(src.readline())["scan"]
+        batch = []
+        for line in src:
+            item = json.loads(line)
+            if "urls" in item:
+                url_store.add(scan_id, item["urls"])
+                urls += len(item["urls"])
+                continue
+            row = item["result"]
+            row["scan_id"] = scan_id
+            for name in _DATETIME_COLUMNS:
+                row[name] = datetime.fromisoformat(row[name]) if row[name] else None
+            batch.append(row)
+            if len(batch) >= PERSIST_CHUNK_SIZE:
+                results += persist_subdomains(db, batch)
+                batch = []
+        results += persist_subdomains(db, batch)
+
+    scan.status = header["status"]
+    db.commit()
+    path.unlink()
+    return {"scan_id": scan_id, "results": results, "urls": urls}
+
+
+def expired_scans(db: Session, now: Optional[datetime] = None) -> List[Tuple[int, bool]]:
+    """Finished scans no keep rule of their domain's policy holds on to, with whether to archive them.
+
+    A scan is kept if it is among the domain's keep_last newest finished scans
+    or younger than keep_days; domains whose policy (or the default) sets
+    neither rule keep everything. The newest completed scan of a domain is
+    always kept, as the baseline for its next incremental scan.
+    """
+    now = now or datetime.utcnow()
+    policies = {policy.domain: policy for policy in db.scalars(select(RetentionPolicy))}
+    rows = db.execute(
+        select(Scan.id, Scan.domain, Scan.status, Scan.created_at)
+        .where(Scan.status.in_(FINISHED))
+        .order_by(Scan.domain, Scan.id.desc())
+    ).all()
+    expired = []
+    for domain, scans in groupby(rows, key=lambda row: row.domain):
+        policy = policies.get(domain)
+        rules = default_policy() if policy is None else policy_dict(policy)
+        if not rules["keep_last"] and not rules["keep_days"]:
+            continue
+        cutoff = now - timedelta(days=rules["keep_days"]) if rules["keep_days"] else None
+        has_baseline = False
+        for position, scan in enumerate(scans):
+            kept = (
+                (scan.status == "completed" and not has_baseline)
+                or (rules["keep_last"] and position < rules["keep_last"])
+                or (cutoff is not None and scan.created_at is not None and scan.created_at >= cutoff)
+            )
+            has_baseline = has_baseline or scan.status == "completed"
+            if not kept:
+                expired.append((scan.id, rules["archive"]))
+    return expired
+
+
+def apply_retention(db: Session) -> dict:
+    """Archive or delete every expired scan. Returns the ids of each."""
+    archived, deleted = [], []
+    for scan_id, archive in expired_scans(db):
+        if archive:
+            if archive_scan(db, scan_id) is not None:
+                archived.append(scan_id)
+        else:
+            delete_scan(db, scan_id)
+            url_store.delete_scan(scan_id)
+            deleted.append(scan_id)
+    if archived or deleted:
+        print(f"[*] Retention: archived {len(archived)} scans, deleted {len(deleted)}")
+    return {"archived": archived, "deleted": deleted}
+
+
+def maintain(vacuum: bool = True, vacuum_ratio: float = VACUUM_FREE_RATIO) -> dict:
+    """Refresh planner statistics, and VACUUM databases once vacuum_ratio of their file is free pages.
+
+    ANALYZE samples (analysis_limit), so it stays fast on large tables.
+    VACUUM rewrites the whole file and blocks writers while it runs, so
+    callers pass vacuum=False while scans are writing.
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA analysis_limit=1000")
+        conn.exec_driver_sql("ANALYZE")
+        conn.commit()
+        pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    vacuumed = vacuum and bool(pages) and free / pages >= vacuum_ratio
+    if vacuumed:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"[*] Vacuumed the database ({free} of {pages} pages were free)")
+    urls_vacuumed = url_store.maintain(vacuum_ratio if vacuum else float("inf"))
+    return {"pages": pages, "free_pages": free, "vacuumed": vacuumed, "url_store_vacuumed": urls_vacuumed}
+
+
+def _retention_pass(vacuum: bool) -> Tuple[dict, List[dict]]:
+    db = SessionLocal()
+    try:
+        result = apply_retention(db)
+        archived = [scan_summary(db.get(Scan, scan_id)) for scan_id in result["archived"]]
+    finally:
+        db.close()
+    result["maintenance"] = maintain(vacuum)
+    return result, archived
+
+
+async def run_retention(vacuum: bool = True) -> dict:
+    """Run a retention pass and database maintenance in a worker thread, then publish the scans it changed."""
+    result, archived = await asyncio.to_thread(_retention_pass, vacuum)
+    for summary in archived:
+        event_bus.publish("scan", summary)
+    for scan_id in result["deleted"]:
+        event_bus.publish("scan_deleted", {"id": scan_id})
+    return result
@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import RESULTS_MAX_PAGE_SIZE
+from backend.database import get_async_db, Asset, AssetEvent
+from backend import assets
+
+router = APIRouter(prefix="/assets", tags=["assets"])
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert aware query parameters to match."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _check_kinds(kind: List[str]):
+    unknown = set(kind) - set(assets.EVENT_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event kinds: {', '.join(sorted(unknown))}")
+
+
+async def _position(db: AsyncSession, cursor: Optional[int]):
+    """(at, id) of the cursor event, to resume (at, id) ordered pages after it."""
+    if cursor is None:
+        return None
+    at = await db.scalar(select(AssetEvent.at).where(AssetEvent.id == cursor))
+    if at is None:
+        raise HTTPException(status_code=400, detail="Unknown cursor")
+    return at, cursor
+
+
+@router.get("/")
+async def list_assets(
+    domain: Optional[str] = Query(None),
+    present: Optional[bool] = Query(None, description="only hosts the latest scan of their domain found (or didn't)"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Known hosts with their latest state and first/last seen times, newest first."""
+    query = select(Asset)
+    if domain:
+        query = query.where(Asset.domain == domain)
+    if present is not None:
+        query = query.where(Asset.present == present)
+    if cursor is not None:
+        query = query.where(Asset.id < cursor)
+    rows = (await db.scalars(query.order_by(Asset.id.desc()).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "assets": [assets.asset_dict(a) for a in rows],
+        "next_cursor": rows[-1].id if has_more else None
+    }
+
+
+@router.get("/changes")
+async def list_changes(
+    since: datetime = Query(..., description="ISO timestamp (UTC if no offset)"),
+    until: Optional[datetime] = Query(None),
+    domain: Optional[str] = Query(None),
+    kind: List[str] = Query([]),
+    value: Optional[str] = Query(None, description="port, technology or field value, old or new"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Changes to any host since a time, oldest first, one keyset page at a time.
+
+    Repeated kind parameters match any of the kinds, e.g.
+    kind=port_opened&value=9200 for hosts that opened port 9200.
+    """
+    _check_kinds(kind)
+    query = select(AssetEvent, Asset.host).join(Asset, Asset.id == AssetEvent.asset_id).where(
+        AssetEvent.at >= _utc(since))
+    if until is not None:
+        query = query.where(AssetEvent.at < _utc(until))
+    if domain:
+        query = query.where(Asset.domain == domain)
+    if kind:
+        query = query.where(AssetEvent.kind.in_(kind))
+    if value is not None:
+        query = query.where(or_(AssetEvent.new_value == value, AssetEvent.old_value == value))
+    position = await _position(db, cursor)
+    if position is not None:
+        at, event_id = position
+        query = query.where(AssetEvent.at >= at, or_(AssetEvent.at > at, AssetEvent.id > event_id))
+    rows = (await db.execute(query.order_by(AssetEvent.at, AssetEvent.id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "changes": [assets.event_dict(event, host) for event, host in rows],
+        "next_cursor": rows[-1][0].id if has_more else None
+    }
+
+
+@router.post("/rebuild")
+async def rebuild_assets(db: AsyncSession = Depends(get_async_db)):
+    """Rebuild the asset history by replaying every completed scan that still has its results."""
+    events = await db.run_sync(assets.rebuild)
+    return {"message": "Asset history rebuilt", "events": events}
+
+
+@router.get("/{host}")
+async def get_asset(host: str, db: AsyncSession = Depends(get_async_db)):
+    """A host's latest state and first/last seen times."""
+    asset = await db.scalar(select(Asset).where(Asset.host == host))
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return assets.asset_dict(asset)
+
+
+@router.get("/{host}/timeline")
+async def get_timeline(
+    host: str,
+    kind: List[str] = Query([]),
+    since: Optional[datetime] = Query(None),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """A host's change history, newest first, one keyset page at a time.
+
+    kind=port_opened lists when each of its ports opened, e.g. to find when
+    port 9200 first did without reading every scan's copy of the host.
+    """
+    _check_kinds(kind)
+    asset = await db.scalar(select(Asset).where(Asset.host == host))
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    query = select(AssetEvent).where(AssetEvent.asset_id == asset.id)
+    if kind:
+        query = query.where(AssetEvent.kind.in_(kind))
+    if since is not None:
+        query = query.where(AssetEvent.at >= _utc(since))
+    position = await _position(db, cursor)
+    if position is not None:
+        at, event_id = position
+        query = query.where(AssetEvent.at <= at, or_(AssetEvent.at < at, AssetEvent.id < event_id))
+    events = (await db.scalars(
+        query.order_by(AssetEvent.at.desc(), AssetEvent.id.desc()).limit(limit + 1)
+    )).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+    return {
+        "asset": assets.asset_dict(asset),
+        "events": [assets.event_dict(e) for e in events],
+        "next_cursor": events[-1].id if has_more else None
+    }
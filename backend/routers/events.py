@@ -0,0 +1,61 @@
+import asyncio
+import json
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from backend.config import EVENTS_HEARTBEAT_SECONDS
+from backend.database import AsyncSessionLocal, Scan
+from backend.events import event_bus, scan_summary, RESYNC
+from backend.recon.jobs import scan_queue
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(queue: asyncio.Queue, snapshot: dict):
+    """Send the snapshot, then every published event until the client goes away."""
+    try:
+        yield sse("snapshot", snapshot)
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is RESYNC:
+                return
+            yield sse(event, data)
+    finally:
+        event_bus.unsubscribe(queue)
+
+
+@router.get("/")
+async def subscribe_events(limit: int = 50):
+    """Server-sent events for the dashboard.
+
+    Starts with a snapshot (recent scans, stats, queue and in-flight progress),
+    then streams scan, progress and stats events as they happen. The snapshot
+    uses its own short-lived session so open streams don't hold pool connections.
+    """
+    # Subscribe before reading the snapshot so no event falls in between
+    queue = event_bus.subscribe()
+    try:
+        async with AsyncSessionLocal() as db:
+            scans = (await db.scalars(select(Scan).order_by(Scan.created_at.desc()).limit(limit))).all()
+        snapshot = {
+            "scans": [scan_summary(scan) for scan in scans],
+            "stats": await event_bus.read_stats(),
+            "queue": scan_queue.snapshot(),
+            "progress": event_bus.progress
+        }
+    except BaseException:
+        event_bus.unsubscribe(queue)
+        raise
+    return StreamingResponse(event_stream(queue, snapshot), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # stop nginx buffering the stream
+    })
@@ -1,123 +1,296 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import asyncio
+import csv
+import io
 import json
+from collections import defaultdict
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select
 
-from backend.database import get_db, Subdomain, Scan
+from backend.config import EXPORT_BATCH_SIZE, RESULTS_MAX_PAGE_SIZE
+from backend.database import get_async_db, AsyncSessionLocal, Scan, Subdomain, SubdomainPort, SubdomainTechnology
+from backend import search, stats
+from backend.recon.urlstore import url_store
 
 router = APIRouter(prefix="/results", tags=["results"])
 
 
+def with_children(stmt):
+    """Eager-load the normalized ports/technologies/urls for a page of rows."""
+    return stmt.options(
+        selectinload(Subdomain.port_entries),
+        selectinload(Subdomain.technology_entries),
+        selectinload(Subdomain.url_entries)
+    )
+
+
+def serialize_subdomain(r: Subdomain) -> dict:
+    """Render a Subdomain row, with its child tables eager-loaded, as a result dict."""
+    return {
+        "id": r.id,
+        "scan_id": r.scan_id,
+        "subdomain": r.subdomain,
+        "ip_address": r.ip_address,
+        "ports": r.port_list,
+        "status_code": r.status_code,
+        "content_length": r.content_length,
+        "title": r.title,
+        "technologies": r.technology_list,
+        "urls": r.url_list,
+        "is_alive": r.is_alive,
+        "created_at": r.created_at.isoformat() if r.created_at else None
+    }
+
+
 @router.get("/")
-def get_all_results(
+async def get_all_results(
     scan_id: int = Query(None),
     alive_only: bool = Query(False),
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    port: int = Query(None),
+    tech: str = Query(None),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    total: str = Query("approx", pattern="^(approx|exact|none)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all subdomain results with optional filtering."""
-    query = db.query(Subdomain)
+    """Get subdomain results, newest first, one keyset page at a time."""
+    query = select(Subdomain)
     
     if scan_id:
-        query = query.filter(Subdomain.scan_id == scan_id)
+        query = query.where(Subdomain.scan_id == scan_id)
     
     if alive_only:
-        query = query.filter(Subdomain.is_alive == True)
-    
-    total = query.count()
-    results = query.order_by(Subdomain.id.desc()).offset(skip).limit(limit).all()
-    
-    # Parse JSON fields
-    parsed_results = []
-    for r in results:
-        parsed_results.append({
-            "id": r.id,
-            "scan_id": r.scan_id,
-            "subdomain": r.subdomain,
-            "ip_address": r.ip_address,
-            "ports": json.loads(r.ports) if r.ports else [],
-            "status_code": r.status_code,
-            "content_length": r.content_length,
-            "title": r.title,
-            "technologies": json.loads(r.technologies) if r.technologies else [],
-            "urls": json.loads(r.urls) if r.urls else [],
-            "is_alive": r.is_alive,
-            "created_at": r.created_at.isoformat() if r.created_at else None
-        })
-    
-    return {"results": parsed_results, "total": total}
+        query = query.where(Subdomain.is_alive == True)
 
+    if port is not None:
+        query = query.where(Subdomain.id.in_(
+            select(SubdomainPort.subdomain_id).where(SubdomainPort.port == port)
+        ))
 
-@router.get("/stats")
-def get_global_stats(db: Session = Depends(get_db)):
-    """Get global statistics across all scans."""
-    total_scans = db.query(Scan).count()
-    completed_scans = db.query(Scan).filter(Scan.status == "completed").count()
-    running_scans = db.query(Scan).filter(Scan.status == "running").count()
-    
-    total_subdomains = db.query(Subdomain).count()
-    alive_hosts = db.query(Subdomain).filter(Subdomain.is_alive == True).count()
-    with_ports = db.query(Subdomain).filter(Subdomain.ports.isnot(None)).count()
-    
-    # Get technology distribution
-    tech_counts = {}
-    subdomains_with_tech = db.query(Subdomain).filter(Subdomain.technologies.isnot(None)).all()
-    for sub in subdomains_with_tech:
-        try:
-            techs = json.loads(sub.technologies)
-            for tech in techs:
-                tech_counts[tech] = tech_counts.get(tech, 0) + 1
-        except:
-            pass
-    
-    # Get top 10 technologies
-    top_technologies = sorted(tech_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    # Port distribution
-    port_counts = {}
-    subdomains_with_ports = db.query(Subdomain).filter(Subdomain.ports.isnot(None)).all()
-    for sub in subdomains_with_ports:
-        try:
-            ports = json.loads(sub.ports)
-            for port in ports:
-                port_counts[str(port)] = port_counts.get(str(port), 0) + 1
-        except:
-            pass
-    
-    top_ports = sorted(port_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    if tech:
+        query = query.where(Subdomain.id.in_(
+            select(SubdomainTechnology.subdomain_id).where(SubdomainTechnology.tech == tech)
+        ))
+
+    count = None
+    if total == "approx":
+        count = await db.run_sync(stats.approximate_total, scan_id, alive_only, port, tech)
+    if total == "exact" or (total == "approx" and count is None):
+        count = await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    if cursor is not None:
+        query = query.where(Subdomain.id < cursor)
+    results = (await db.scalars(
+        with_children(query).order_by(Subdomain.id.desc()).limit(limit + 1)
+    )).all()
+    has_more = len(results) > limit
+    results = results[:limit]
     
     return {
-        "scans": {
-            "total": total_scans,
-            "completed": completed_scans,
-            "running": running_scans
-        },
-        "subdomains": {
-            "total": total_subdomains,
-            "alive": alive_hosts,
-            "with_open_ports": with_ports
-        },
-        "top_technologies": top_technologies,
-        "top_ports": top_ports
+        "results": [serialize_subdomain(r) for r in results],
+        "next_cursor": results[-1].id if has_more else None,
+        "total": count
+    }
+
+
+@router.get("/search")
+async def search_results(
+    q: Optional[str] = Query(None, description="FTS5 query over subdomain, title and technologies, e.g. title:jenkins"),
+    scan_id: Optional[int] = Query(None),
+    domain: Optional[str] = Query(None, description="scans of this root domain"),
+    status_code: List[int] = Query([]),
+    port: List[int] = Query([]),
+    tech: List[str] = Query([]),
+    alive: Optional[bool] = Query(None),
+    facets: bool = Query(True, description="include match count and facet counts"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Full-text search over results with facet filters, newest first, one keyset page at a time.
+
+    Repeated status_code, port or tech parameters match any of the values.
+    """
+    if q:
+        try:
+            await db.run_sync(search.check_query, q)
+        except search.InvalidQuery as e:
+            raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+    filters = dict(q=q, scan_id=scan_id, domain=domain, status_codes=status_code, ports=port, techs=tech, alive=alive)
+
+    query, order = search.matching([Subdomain], **filters)
+    if cursor is not None:
+        query = query.where(order < cursor)
+    results = (await db.scalars(
+        with_children(query).order_by(order.desc()).limit(limit + 1)
+    )).all()
+    has_more = len(results) > limit
+    results = results[:limit]
+
+    response = {
+        "results": [serialize_subdomain(r) for r in results],
+        "next_cursor": results[-1].id if has_more else None
     }
+    if facets:
+        response.update(await db.run_sync(lambda session: search.facet_counts(session, **filters)))
+    return response
+
+
+@router.post("/search/rebuild")
+async def rebuild_search_index(db: AsyncSession = Depends(get_async_db)):
+    """Re-index every result row for search."""
+    await db.run_sync(search.rebuild)
+    return {"message": "Search index rebuilt"}
+
+
+@router.get("/stats")
+async def get_global_stats(db: AsyncSession = Depends(get_async_db)):
+    """Get global statistics across all scans."""
+    return await db.run_sync(stats.global_summary)
+
+
+@router.post("/stats/rebuild")
+async def rebuild_stats(db: AsyncSession = Depends(get_async_db)):
+    """Recompute the materialized statistics from the result tables."""
+    await db.run_sync(stats.rebuild)
+    return {"message": "Statistics rebuilt"}
+
+
+EXPORT_FIELDS = ["subdomain", "ip", "ports", "status_code", "title", "technologies", "is_alive"]
+
+
+async def iter_export_rows(scan_id: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield a scan's results as export dicts, batch_size rows per database round-trip.
+
+    Uses its own session so the stream outlives the request handler, and plain
+    rows rather than ORM objects so memory stays flat however large the scan is.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Subdomain.id, Subdomain.subdomain, Subdomain.ip_address, Subdomain.status_code,
+                   Subdomain.title, Subdomain.is_alive)
+            .where(Subdomain.scan_id == scan_id)
+            .order_by(Subdomain.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for batch in result.partitions():
+            ids = [row.id for row in batch]
+            ports = defaultdict(list)
+            for subdomain_id, value in await db.execute(
+                select(SubdomainPort.subdomain_id, SubdomainPort.port)
+                .where(SubdomainPort.subdomain_id.in_(ids)).order_by(SubdomainPort.id)
+            ):
+                ports[subdomain_id].append(value)
+            techs = defaultdict(list)
+            for subdomain_id, value in await db.execute(
+                select(SubdomainTechnology.subdomain_id, SubdomainTechnology.tech)
+                .where(SubdomainTechnology.subdomain_id.in_(ids)).order_by(SubdomainTechnology.id)
+            ):
+                techs[subdomain_id].append(value)
+
+            for row in batch:
+                yield {
+                    "subdomain": row.subdomain,
+                    "ip": row.ip_address,
+                    "ports": ports[row.id],
+                    "status_code": row.status_code,
+                    "title": row.title,
+                    "technologies": techs[row.id],
+                    "is_alive": row.is_alive
+                }
+
+
+async def ndjson_lines(rows):
+    """Encode export rows as newline-delimited JSON."""
+    async for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+async def csv_lines(rows):
+    """Encode export rows as CSV, with list fields joined by ';'."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    async for row in rows:
+        row["ports"] = ";".join(str(p) for p in row["ports"])
+        row["technologies"] = ";".join(row["technologies"])
+        writer.writerow([row[field] for field in EXPORT_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
 
 
 @router.get("/export/{scan_id}")
-def export_scan_results(scan_id: int, db: Session = Depends(get_db)):
-    """Export scan results for download."""
-    subdomains = db.query(Subdomain).filter(Subdomain.scan_id == scan_id).all()
-    
-    export_data = []
-    for r in subdomains:
-        export_data.append({
-            "subdomain": r.subdomain,
-            "ip": r.ip_address,
-            "ports": json.loads(r.ports) if r.ports else [],
-            "status_code": r.status_code,
-            "title": r.title,
-            "technologies": json.loads(r.technologies) if r.technologies else [],
-            "is_alive": r.is_alive
-        })
-    
-    return {"scan_id": scan_id, "results": export_data}
+async def export_scan_results(
+    scan_id: int,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream scan results for download as NDJSON or CSV."""
+    if await db.get(Scan, scan_id) is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    rows = iter_export_rows(scan_id)
+    if format == "csv":
+        body, media_type = csv_lines(rows), "text/csv"
+    else:
+        body, media_type = ndjson_lines(rows), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="recon_results_{scan_id}.{format}"'
+    })
+
+
+async def _require_scan(db: AsyncSession, scan_id: int):
+    if await db.get(Scan, scan_id) is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+
+@router.get("/urls/{scan_id}")
+async def get_scan_urls(
+    scan_id: int,
+    host: Optional[str] = Query(None, description="only URLs of this exact host"),
+    path_prefix: Optional[str] = Query(None, description="only URLs whose path starts with this"),
+    cursor: Optional[str] = Query(None, pattern=r"^\d+:-?\d+$", description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Page through every URL gau found for a scan."""
+    await _require_scan(db, scan_id)
+    urls, next_cursor = await asyncio.to_thread(url_store.page, scan_id, host, path_prefix, cursor, limit)
+    return {"urls": urls, "next_cursor": next_cursor}
+
+
+@router.get("/urls/{scan_id}/hosts")
+async def get_scan_url_hosts(
+    scan_id: int,
+    cursor: Optional[str] = Query(None, pattern=r"^\d+$", description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Hosts with stored URLs for a scan, with their URL counts."""
+    await _require_scan(db, scan_id)
+    hosts, next_cursor = await asyncio.to_thread(url_store.hosts, scan_id, cursor, limit)
+    return {"hosts": hosts, "next_cursor": next_cursor}
+
+
+@router.get("/urls/{scan_id}/export")
+async def export_scan_urls(
+    scan_id: int,
+    host: Optional[str] = Query(None),
+    path_prefix: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream a scan's URLs as plain text, one per line."""
+    await _require_scan(db, scan_id)
+
+    # A plain generator: the response iterates it in a worker thread
+    def lines():
+        for _, url in url_store.iter_urls(scan_id, host, path_prefix, batch_size=EXPORT_BATCH_SIZE):
+            yield url + "\n"
+
+    return StreamingResponse(lines(), media_type="text/plain", headers={
+        "Content-Disposition": f'attachment; filename="recon_urls_{scan_id}.txt"'
+    })
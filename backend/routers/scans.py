@@ -1,29 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 import asyncio
+import json
 
-from backend.database import get_db, Scan, Subdomain, ScheduledScan
-from backend.recon.engine import start_scan_task, running_scans
+from backend.config import SCAN_STOP_TIMEOUT
+from backend.database import get_async_db, RetentionPolicy, Scan, Subdomain, ScheduledScan
+from backend import retention, stats
+from backend.routers.results import serialize_subdomain, with_children
+from backend.recon.jobs import scan_queue, PRIORITY_MANUAL
+from backend.recon.diff import diff_scans
+from backend.recon.cache import tool_cache
+from backend.recon.urlstore import url_store
+from backend.recon import policy
+from backend.events import event_bus, scan_summary
 
 router = APIRouter(prefix="/scans", tags=["scans"])
 
 
 class ScanCreate(BaseModel):
     domain: str
-    
+    incremental: bool = False  # Reuse fresh results from the domain's last completed scan
+    bypass_cache: bool = False  # Re-probe hosts even if naabu/httpx results are cached
+
 
 class ScheduledScanCreate(BaseModel):
     domain: str
     cron_expression: str  # e.g., "0 0 * * *" for daily at midnight
+    incremental: bool = True
+
+
+class RetentionPolicyUpdate(BaseModel):
+    keep_last: Optional[int] = Field(None, ge=1)  # Keep this many newest finished scans
+    keep_days: Optional[int] = Field(None, ge=1)  # Keep scans younger than this
+    archive: bool = True  # Archive expired scans; False deletes them
 
 
 class ScanResponse(BaseModel):
     id: int
     domain: str
     status: str
+    mode: Optional[str] = None
     created_at: datetime
     completed_at: Optional[datetime] = None
     
@@ -34,120 +54,264 @@ class ScanResponse(BaseModel):
 @router.post("/", response_model=ScanResponse)
 async def create_scan(
     scan_data: ScanCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Start a new reconnaissance scan."""
     # Create scan record
-    scan = Scan(domain=scan_data.domain.strip().lower())
+    scan = Scan(
+        domain=scan_data.domain.strip().lower(),
+        mode="incremental" if scan_data.incremental else "full",
+        bypass_cache=scan_data.bypass_cache
+    )
     db.add(scan)
-    db.commit()
-    db.refresh(scan)
+    await db.commit()
+    await db.refresh(scan)
+    event_bus.publish("scan", scan_summary(scan))
     
-    # Start background scan task
-    background_tasks.add_task(run_scan_background, scan.id)
+    # Queue the scan; manual scans run ahead of scheduled ones
+    await scan_queue.submit(scan.id, PRIORITY_MANUAL)
     
     return scan
 
 
-async def run_scan_background(scan_id: int):
-    """Run scan in background with new DB session."""
-    from backend.database import SessionLocal
-    db = SessionLocal()
-    try:
-        running_scans[scan_id] = True
-        await start_scan_task(scan_id, db)
-    finally:
-        db.close()
+@router.get("/queue")
+def get_scan_queue():
+    """Show running scans and queued scans in the order they will run."""
+    return scan_queue.snapshot()
+
+
+@router.get("/cache")
+async def get_tool_cache_stats():
+    """Cached naabu/httpx entries, TTLs and hit/miss counters per tool."""
+    return await asyncio.to_thread(tool_cache.stats)
+
+
+@router.delete("/cache")
+async def clear_tool_cache():
+    """Drop every cached tool result."""
+    await asyncio.to_thread(tool_cache.clear)
+    return {"message": "Tool cache cleared"}
+
+
+@router.get("/policy")
+def get_tool_policy():
+    """Rate/thread flags and timeouts the tools run with, derived from the configured budgets."""
+    return policy.describe()
+
+
+@router.get("/retention")
+async def list_retention_policies(db: AsyncSession = Depends(get_async_db)):
+    """The default retention rules and per-domain policies."""
+    policies = (await db.scalars(select(RetentionPolicy).order_by(RetentionPolicy.domain))).all()
+    return {"default": retention.default_policy(), "policies": [retention.policy_dict(p) for p in policies]}
+
+
+@router.put("/retention/{domain}")
+async def set_retention_policy(domain: str, data: RetentionPolicyUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Set a domain's retention policy; leaving both rules unset keeps all its scans."""
+    domain = domain.strip().lower()
+    policy = await db.get(RetentionPolicy, domain)
+    if policy is None:
+        policy = RetentionPolicy(domain=domain)
+        db.add(policy)
+    policy.keep_last, policy.keep_days, policy.archive = data.keep_last, data.keep_days, data.archive
+    await db.commit()
+    await db.refresh(policy)
+    return retention.policy_dict(policy)
+
+
+@router.delete("/retention/{domain}")
+async def delete_retention_policy(domain: str, db: AsyncSession = Depends(get_async_db)):
+    """Drop a domain's policy, so the default rules apply to it again."""
+    policy = await db.get(RetentionPolicy, domain.strip().lower())
+    if not policy:
+        raise HTTPException(status_code=404, detail="Retention policy not found")
+    await db.delete(policy)
+    await db.commit()
+    return {"message": "Retention policy deleted"}
+
+
+@router.post("/retention/run")
+async def run_retention():
+    """Archive or delete expired scans now, then ANALYZE (and VACUUM if idle and fragmented)."""
+    return await retention.run_retention(vacuum=not scan_queue.snapshot()["running"])
 
 
 @router.get("/")
-def list_scans(
+async def list_scans(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """List all scans with pagination."""
-    scans = db.query(Scan).order_by(Scan.created_at.desc()).offset(skip).limit(limit).all()
-    total = db.query(Scan).count()
+    scans = (await db.scalars(select(Scan).order_by(Scan.created_at.desc()).offset(skip).limit(limit))).all()
+    total = await db.scalar(select(func.count(Scan.id)))
     return {"scans": scans, "total": total}
 
 
 @router.get("/{scan_id}")
-def get_scan(scan_id: int, db: Session = Depends(get_db)):
+async def get_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get scan details with results."""
-    scan = db.query(Scan).filter(Scan.id == scan_id).first()
+    scan = await db.get(Scan, scan_id)
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    subdomains = db.query(Subdomain).filter(Subdomain.scan_id == scan_id).all()
+    subdomains = (await db.scalars(with_children(select(Subdomain).where(Subdomain.scan_id == scan_id)))).all()
+    summary = await db.run_sync(stats.read_scope, scan_id)
     
     return {
         "scan": scan,
-        "subdomains": subdomains,
+        "queue": scan_queue.status(scan_id),
+        "tools": json.loads(scan.tool_report) if scan.tool_report else None,
+        "metrics": json.loads(scan.metrics) if scan.metrics else None,
+        "subdomains": [serialize_subdomain(s) for s in subdomains],
         "stats": {
-            "total_subdomains": len(subdomains),
-            "alive_hosts": sum(1 for s in subdomains if s.is_alive),
-            "with_ports": sum(1 for s in subdomains if s.ports)
+            "total_subdomains": summary["subdomains"],
+            "alive_hosts": summary["alive"],
+            "with_ports": summary["with_ports"]
         }
     }
 
 
+@router.get("/{scan_id}/diff")
+async def get_scan_diff(scan_id: int, against: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """Changes since a previous scan: new/removed hosts, opened/closed ports, status/title/tech changes.
+
+    Compares against the given scan, else the scan's incremental baseline, else
+    the domain's previous completed scan.
+    """
+    scan = await db.get(Scan, scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+
+    baseline_id = against or scan.baseline_scan_id
+    if baseline_id is None:
+        baseline_id = await db.scalar(
+            select(Scan.id).where(
+                Scan.domain == scan.domain, Scan.status == "completed", Scan.id < scan_id
+            ).order_by(Scan.id.desc()).limit(1)
+        )
+        if baseline_id is None:
+            raise HTTPException(status_code=404, detail="No previous scan to compare against")
+    elif await db.get(Scan, baseline_id) is None:
+        raise HTTPException(status_code=404, detail="Baseline scan not found")
+
+    return await db.run_sync(diff_scans, baseline_id, scan_id)
+
+
+@router.post("/{scan_id}/cancel")
+async def cancel_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Cancel a queued or running scan, killing its tool processes."""
+    scan = await db.get(Scan, scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    if not await scan_queue.cancel(scan_id):
+        raise HTTPException(status_code=409, detail="Scan is not queued or running")
+    return {"message": "Scan cancelled"}
+
+
+@router.post("/{scan_id}/resume")
+async def resume_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Re-queue a failed or cancelled scan; finished stages are reused from its checkpoints."""
+    scan = await db.get(Scan, scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    if scan.status not in ("failed", "cancelled") or scan_queue.is_active(scan_id):
+        raise HTTPException(status_code=409, detail="Only failed or cancelled scans can be resumed")
+    scan.status = "pending"
+    await db.commit()
+    event_bus.publish("scan", scan_summary(scan))
+    await scan_queue.submit(scan_id, PRIORITY_MANUAL)
+    return {"message": "Scan resumed"}
+
+
+@router.post("/{scan_id}/archive")
+async def archive_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Move a finished scan's results and URLs into a compressed archive file."""
+    if not await db.get(Scan, scan_id):
+        raise HTTPException(status_code=404, detail="Scan not found")
+    archived = await asyncio.to_thread(retention.in_session, retention.archive_scan, scan_id)
+    if archived is None:
+        raise HTTPException(status_code=409, detail="Only completed, failed or cancelled scans can be archived")
+    event_bus.publish("scan", {"id": scan_id, "status": "archived"})
+    return archived
+
+
+@router.post("/{scan_id}/restore")
+async def restore_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Load an archived scan's results and URLs back from its archive file."""
+    scan = await db.get(Scan, scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    restored = await asyncio.to_thread(retention.in_session, retention.restore_scan, scan_id)
+    if restored is None:
+        raise HTTPException(status_code=409, detail="Scan is not archived")
+    await db.refresh(scan)
+    event_bus.publish("scan", scan_summary(scan))
+    return restored
+
+
 @router.delete("/{scan_id}")
-def delete_scan(scan_id: int, db: Session = Depends(get_db)):
+async def delete_scan(scan_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a scan and its results."""
-    scan = db.query(Scan).filter(Scan.id == scan_id).first()
+    scan = await db.get(Scan, scan_id)
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    db.delete(scan)
-    db.commit()
+    await scan_queue.cancel(scan_id)
+    # A cancelled scan writes results until it stops; delete them only after that
+    if not await scan_queue.wait(scan_id, SCAN_STOP_TIMEOUT):
+        raise HTTPException(status_code=409, detail="Scan is still stopping; try deleting it again shortly")
+    await asyncio.to_thread(retention.in_session, retention.delete_scan, scan_id)
+    await asyncio.to_thread(url_store.delete_scan, scan_id)
+    event_bus.publish("scan_deleted", {"id": scan_id})
     return {"message": "Scan deleted"}
 
 
 # Scheduled Scans Endpoints
 
 @router.post("/scheduled")
-def create_scheduled_scan(
+async def create_scheduled_scan(
     data: ScheduledScanCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a scheduled scan."""
     scheduled = ScheduledScan(
         domain=data.domain.strip().lower(),
-        cron_expression=data.cron_expression
+        cron_expression=data.cron_expression,
+        incremental=data.incremental
     )
     db.add(scheduled)
-    db.commit()
-    db.refresh(scheduled)
+    await db.commit()
+    await db.refresh(scheduled)
     return scheduled
 
 
 @router.get("/scheduled/list")
-def list_scheduled_scans(db: Session = Depends(get_db)):
+async def list_scheduled_scans(db: AsyncSession = Depends(get_async_db)):
     """List all scheduled scans."""
-    return db.query(ScheduledScan).all()
+    return (await db.scalars(select(ScheduledScan))).all()
 
 
 @router.delete("/scheduled/{scheduled_id}")
-def delete_scheduled_scan(scheduled_id: int, db: Session = Depends(get_db)):
+async def delete_scheduled_scan(scheduled_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a scheduled scan."""
-    scheduled = db.query(ScheduledScan).filter(ScheduledScan.id == scheduled_id).first()
+    scheduled = await db.get(ScheduledScan, scheduled_id)
     if not scheduled:
         raise HTTPException(status_code=404, detail="Scheduled scan not found")
     
-    db.delete(scheduled)
-    db.commit()
+    await db.delete(scheduled)
+    await db.commit()
     return {"message": "Scheduled scan deleted"}
 
 
 @router.patch("/scheduled/{scheduled_id}/toggle")  
-def toggle_scheduled_scan(scheduled_id: int, db: Session = Depends(get_db)):
+async def toggle_scheduled_scan(scheduled_id: int, db: AsyncSession = Depends(get_async_db)):
     """Toggle scheduled scan active status."""
-    scheduled = db.query(ScheduledScan).filter(ScheduledScan.id == scheduled_id).first()
+    scheduled = await db.get(ScheduledScan, scheduled_id)
     if not scheduled:
         raise HTTPException(status_code=404, detail="Scheduled scan not found")
     
     scheduled.is_active = not scheduled.is_active
-    db.commit()
+    await db.commit()
     return scheduled
@@ -0,0 +1,176 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import ColumnElement, Select, column, delete, exists, func, insert, literal, select, table, union_all
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from backend.config import SEARCH_FACET_LIMIT, SEARCH_FACET_SIZE
+from backend.database import Scan, Subdomain, SubdomainPort, SubdomainTechnology
+
+# The FTS5 table created in backend.database. Its hidden column named after
+# the table is the MATCH target for queries over all three columns.
+search_index = table(
+    "subdomain_search",
+    column("rowid"), column("subdomain"), column("title"), column("technologies"), column("subdomain_search")
+)
+
+FACETS = ("status_code", "port", "tech", "domain", "alive")
+
+
+class InvalidQuery(ValueError):
+    """A search query FTS5 can't parse."""
+
+
+def index_entry(subdomain_id: int, row: dict, technologies: Sequence[str]) -> dict:
+    """Index parameters for one result row, as passed to persist_subdomains."""
+    return {
+        'rowid': subdomain_id,
+        'subdomain': row['subdomain'],
+        'title': row.get('title') or '',
+        'technologies': ' '.join(technologies)
+    }
+
+
+def index_entries(db: Session, entries: List[dict]):
+    """Add rows built by index_entry to the index (no commit)."""
+    if entries:
+        db.execute(insert(search_index), entries)
+
+
+def _index_select(scan_id: Optional[int] = None, min_subdomain_id: Optional[int] = None):
+    techs = (
+        select(func.group_concat(SubdomainTechnology.tech, ' '))
+        .where(SubdomainTechnology.subdomain_id == Subdomain.id)
+        .scalar_subquery()
+    )
+    stmt = select(Subdomain.id, Subdomain.subdomain, func.coalesce(Subdomain.title, ''), func.coalesce(techs, ''))
+    if scan_id is not None:
+        stmt = stmt.where(Subdomain.scan_id == scan_id)
+    if min_subdomain_id is not None:
+        stmt = stmt.where(Subdomain.id >= min_subdomain_id)
+    return stmt
+
+
+def add_rows_from(db: Session, scan_id: int, min_subdomain_id: int):
+    """Index rows written to a scan by SQL (not persist_subdomains) (no commit)."""
+    db.execute(insert(search_index).from_select(
+        ['rowid', 'subdomain', 'title', 'technologies'], _index_select(scan_id, min_subdomain_id)
+    ))
+
+
+def remove_scan(db: Session, scan_id: int):
+    """Drop a scan's rows from the index (no commit)."""
+    db.execute(delete(search_index).where(
+        search_index.c.rowid.in_(select(Subdomain.id).where(Subdomain.scan_id == scan_id))
+    ))
+
+
+def rebuild(db: Session):
+    """Re-index every result row."""
+    db.execute(delete(search_index))
+    db.execute(insert(search_index).from_select(['rowid', 'subdomain', 'title', 'technologies'], _index_select()))
+    db.commit()
+
+
+def rebuild_if_missing(db: Session):
+    """Index databases that have results but predate the search index."""
+    has_index = db.execute(select(search_index.c.rowid).limit(1)).first() is not None
+    has_results = db.query(Subdomain.id).first() is not None
+    if has_results and not has_index:
+        print("[*] Building search index")
+        rebuild(db)
+
+
+def check_query(db: Session, q: str):
+    """Raise InvalidQuery if FTS5 rejects q (syntax errors, unknown columns)."""
+    try:
+        db.execute(select(search_index.c.rowid).where(search_index.c.subdomain_search.match(q)).limit(1)).all()
+    except OperationalError as e:
+        raise InvalidQuery(str(e.orig)) from e
+
+
+def matching(
+    columns: Sequence,
+    q: Optional[str] = None,
+    scan_id: Optional[int] = None,
+    domain: Optional[str] = None,
+    status_codes: Sequence[int] = (),
+    ports: Sequence[int] = (),
+    techs: Sequence[str] = (),
+    alive: Optional[bool] = None
+) -> Tuple[Select, ColumnElement]:
+    """SELECT of columns for the subdomains a search matches, and the id column to order and page it by.
+
+    q is an FTS5 query over subdomain, title and technologies (e.g.
+    'title:jenkins', 'admin*', '"grafana" OR "kibana"'). Each list filter
+    matches any of its values; different filters must all match. With q, the
+    index drives the scan in descending rowid order, so a page stops at its
+    first matches and port/technology filters are probed per candidate.
+    Without it, those filters are IN lists, as in GET /results/.
+    """
+    if q:
+        stmt = (
+            select(*columns).select_from(search_index)
+            .join(Subdomain, Subdomain.id == search_index.c.rowid)
+            .where(search_index.c.subdomain_search.match(q))
+        )
+        order = search_index.c.rowid
+    else:
+        stmt, order = select(*columns), Subdomain.id
+    for model, column, values in ((SubdomainPort, SubdomainPort.port, ports),
+                                  (SubdomainTechnology, SubdomainTechnology.tech, techs)):
+        if not values:
+            continue
+        if q:
+            stmt = stmt.where(exists().where(model.subdomain_id == Subdomain.id, column.in_(values)))
+        else:
+            stmt = stmt.where(Subdomain.id.in_(select(model.subdomain_id).where(column.in_(values))))
+    if scan_id is not None:
+        stmt = stmt.where(Subdomain.scan_id == scan_id)
+    if domain:
+        stmt = stmt.where(Subdomain.scan_id.in_(select(Scan.id).where(Scan.domain == domain)))
+    if status_codes:
+        stmt = stmt.where(Subdomain.status_code.in_(status_codes))
+    if alive is not None:
+        stmt = stmt.where(Subdomain.is_alive == alive)
+    return stmt, order
+
+
+def facet_counts(db: Session, limit: int = SEARCH_FACET_LIMIT, size: int = SEARCH_FACET_SIZE, **filters) -> dict:
+    """Match count and the most common values of each facet for a search (filters as for matching()).
+
+    Counts cover at most the limit newest matches, materialized once and
+    grouped for every facet in a single query; past that, total_exact is
+    false and the facets describe those matches. Port and technology rows
+    are reached by LEFT JOIN from the matches, which SQLite won't reorder:
+    an inner join lets it scan the whole child table instead.
+    """
+    stmt, order = matching((Subdomain.id, Subdomain.scan_id, Subdomain.status_code, Subdomain.is_alive), **filters)
+    matched = stmt.order_by(order.desc()).limit(limit + 1).cte("matched").prefix_with("MATERIALIZED")
+    rows = db.execute(union_all(
+        select(literal("status_code"), matched.c.status_code, func.count()).group_by(matched.c.status_code),
+        select(literal("alive"), matched.c.is_alive, func.count()).group_by(matched.c.is_alive),
+        select(literal("port"), SubdomainPort.port, func.count(func.distinct(SubdomainPort.subdomain_id)))
+        .select_from(matched).outerjoin(SubdomainPort, SubdomainPort.subdomain_id == matched.c.id)
+        .group_by(SubdomainPort.port),
+        select(literal("tech"), SubdomainTechnology.tech, func.count(func.distinct(SubdomainTechnology.subdomain_id)))
+        .select_from(matched).outerjoin(SubdomainTechnology, SubdomainTechnology.subdomain_id == matched.c.id)
+        .group_by(SubdomainTechnology.tech),
+        select(literal("domain"), Scan.domain, func.count())
+        .select_from(matched).join(Scan, Scan.id == matched.c.scan_id).group_by(Scan.domain),
+    )).all()
+
+    values: Dict[str, list] = {facet: [] for facet in FACETS}
+    for facet, value, count in rows:
+        if facet in ("port", "tech") and value is None:  # Matches without any
+            continue
+        if facet == "alive" and value is not None:
+            value = bool(value)
+        values[facet].append((value, count))
+    total = sum(count for _, count in values["alive"])
+    return {
+        "total": min(total, limit),
+        "total_exact": total <= limit,
+        "facets": {
+            facet: sorted(counts, key=lambda item: item[1], reverse=True)[:size]
+            for facet, counts in values.items()
+        }
+    }
@@ -0,0 +1,195 @@
+from collections import Counter
+from typing import Optional
+from sqlalchemy import delete, func, insert, literal, select, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+from backend.database import Scan, StatCounter, Subdomain, SubdomainPort, SubdomainTechnology
+
+GLOBAL_SCOPE = 0
+
+
+def count_row(deltas: Counter, row: dict):
+    """Add one result row, as passed to persist_subdomains, to a counter delta."""
+    deltas[('subdomains', '')] += 1
+    if row.get('is_alive'):
+        deltas[('alive', '')] += 1
+    ports = set(row.get('ports') or ())
+    if ports:
+        deltas[('with_ports', '')] += 1
+    for port in ports:
+        deltas[('port', str(port))] += 1
+    for tech in set(row.get('technologies') or ()):
+        deltas[('tech', tech)] += 1
+
+
+def apply_deltas(db: Session, scan_id: int, deltas: Counter):
+    """Add counter deltas to a scan's counters and the global ones (no commit)."""
+    if not deltas:
+        return
+    params = [
+        {'scan_id': scope, 'metric': metric, 'key': key, 'value': value}
+        for scope in (scan_id, GLOBAL_SCOPE)
+        for (metric, key), value in deltas.items()
+    ]
+    stmt = sqlite_insert(StatCounter.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['scan_id', 'metric', 'key'],
+        set_={'value': StatCounter.__table__.c.value + stmt.excluded.value}
+    )
+    db.execute(stmt, params)
+
+
+def remove_scan(db: Session, scan_id: int):
+    """Subtract a scan's counters from the global ones and drop them (no commit)."""
+    scoped = aliased(StatCounter)
+    matching = select(scoped.value).where(
+        scoped.scan_id == scan_id,
+        scoped.metric == StatCounter.metric,
+        scoped.key == StatCounter.key
+    ).scalar_subquery()
+    db.execute(
+        update(StatCounter)
+        .where(StatCounter.scan_id == GLOBAL_SCOPE, matching.isnot(None))
+        .values(value=StatCounter.value - matching)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(StatCounter).where(
+        (StatCounter.scan_id == scan_id) | ((StatCounter.scan_id == GLOBAL_SCOPE) & (StatCounter.value <= 0))
+    ).execution_options(synchronize_session=False))
+
+
+def _aggregate(scan_id: Optional[int] = None, min_subdomain_id: Optional[int] = None):
+    """SELECT of (scan_id, metric, key, value) counter rows computed from the result tables.
+
+    Optionally limited to one scan and to subdomain rows with id >= min_subdomain_id.
+    """
+    def scoped(stmt, scan_col, subdomain_col):
+        if scan_id is not None:
+            stmt = stmt.where(scan_col == scan_id)
+        if min_subdomain_id is not None:
+            stmt = stmt.where(subdomain_col >= min_subdomain_id)
+        return stmt
+
+    return union_all(
+        scoped(select(Subdomain.scan_id, literal('subdomains'), literal(''), func.count()),
+               Subdomain.scan_id, Subdomain.id)
+        .group_by(Subdomain.scan_id),
+        scoped(select(Subdomain.scan_id, literal('alive'), literal(''), func.count()),
+               Subdomain.scan_id, Subdomain.id)
+        .where(Subdomain.is_alive == True).group_by(Subdomain.scan_id),
+        scoped(select(SubdomainPort.scan_id, literal('with_ports'), literal(''),
+                      func.count(func.distinct(SubdomainPort.subdomain_id))),
+               SubdomainPort.scan_id, SubdomainPort.subdomain_id)
+        .group_by(SubdomainPort.scan_id),
+        scoped(select(SubdomainPort.scan_id, literal('port'), func.cast(SubdomainPort.port, StatCounter.key.type),
+                      func.count(func.distinct(SubdomainPort.subdomain_id))),
+               SubdomainPort.scan_id, SubdomainPort.subdomain_id)
+        .group_by(SubdomainPort.scan_id, SubdomainPort.port),
+        scoped(select(SubdomainTechnology.scan_id, literal('tech'), SubdomainTechnology.tech,
+                      func.count(func.distinct(SubdomainTechnology.subdomain_id))),
+               SubdomainTechnology.scan_id, SubdomainTechnology.subdomain_id)
+        .group_by(SubdomainTechnology.scan_id, SubdomainTechnology.tech),
+    )
+
+
+def add_rows_from(db: Session, scan_id: int, min_subdomain_id: int):
+    """Count rows written to a scan by SQL (not persist_subdomains) into the counters (no commit)."""
+    deltas = Counter()
+    for _, metric, key, value in db.execute(_aggregate(scan_id, min_subdomain_id)):
+        deltas[(metric, key)] += value
+    apply_deltas(db, scan_id, deltas)
+
+
+def rebuild(db: Session):
+    """Recompute every counter from the result tables with set-based SQL."""
+    db.execute(delete(StatCounter))
+    columns = ['scan_id', 'metric', 'key', 'value']
+    db.execute(insert(StatCounter).from_select(columns, _aggregate()))
+    db.execute(insert(StatCounter).from_select(columns, select(
+        literal(GLOBAL_SCOPE), StatCounter.metric, StatCounter.key, func.sum(StatCounter.value)
+    ).where(StatCounter.scan_id != GLOBAL_SCOPE).group_by(StatCounter.metric, StatCounter.key)))
+    db.commit()
+
+
+def rebuild_if_missing(db: Session):
+    """Build counters for databases that have results but predate stat_counters."""
+    has_counters = db.query(StatCounter.scan_id).first() is not None
+    has_results = db.query(Subdomain.id).first() is not None
+    if has_results and not has_counters:
+        print("[*] Building result statistics")
+        rebuild(db)
+
+
+def read_scope(db: Session, scan_id: int = GLOBAL_SCOPE, top: int = 10) -> dict:
+    """Read totals and top ports/technologies for one scope from the counters."""
+    totals = dict(
+        db.query(StatCounter.metric, StatCounter.value).filter(
+            StatCounter.scan_id == scan_id,
+            StatCounter.metric.in_(('subdomains', 'alive', 'with_ports'))
+        ).all()
+    )
+
+    def top_keys(metric):
+        return [
+            (key, value) for key, value in
+            db.query(StatCounter.key, StatCounter.value)
+            .filter(StatCounter.scan_id == scan_id, StatCounter.metric == metric)
+            .order_by(StatCounter.value.desc())
+            .limit(top)
+        ]
+
+    return {
+        "subdomains": totals.get('subdomains', 0),
+        "alive": totals.get('alive', 0),
+        "with_ports": totals.get('with_ports', 0),
+        "top_ports": top_keys('port'),
+        "top_technologies": top_keys('tech')
+    }
+
+
+def approximate_total(db: Session, scan_id: Optional[int] = None, alive_only: bool = False,
+                      port: Optional[int] = None, tech: Optional[str] = None) -> Optional[int]:
+    """Result count for a filter read from the counters, or None if they can't answer it.
+
+    The counters cover one filter at a time (alive, one port or one technology),
+    so combinations of those return None.
+    """
+    filters = [(metric, key) for metric, key, active in (
+        ('alive', '', alive_only),
+        ('port', str(port), port is not None),
+        ('tech', tech, bool(tech))
+    ) if active]
+    if len(filters) > 1:
+        return None
+    metric, key = filters[0] if filters else ('subdomains', '')
+    value = db.query(StatCounter.value).filter(
+        StatCounter.scan_id == (scan_id or GLOBAL_SCOPE),
+        StatCounter.metric == metric,
+        StatCounter.key == key
+    ).scalar()
+    return value or 0
+
+
+def scan_status_counts(db: Session) -> dict:
+    """Number of scans per status, in one grouped query."""
+    return dict(db.query(Scan.status, func.count(Scan.id)).group_by(Scan.status).all())
+
+
+def global_summary(db: Session) -> dict:
+    """The /results/stats payload: scan counts by status plus global counters."""
+    scan_counts = scan_status_counts(db)
+    summary = read_scope(db)
+    return {
+        "scans": {
+            "total": sum(scan_counts.values()),
+            "completed": scan_counts.get("completed", 0),
+            "running": scan_counts.get("running", 0)
+        },
+        "subdomains": {
+            "total": summary["subdomains"],
+            "alive": summary["alive"],
+            "with_open_ports": summary["with_ports"]
+        },
+        "top_technologies": summary["top_technologies"],
+        "top_ports": summary["top_ports"]
+    }
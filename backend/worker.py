@@ -0,0 +1,130 @@
+"""Scan worker for SCAN_QUEUE=database: leases jobs from the scan_jobs table and runs them.
+
+Start as many as the host (or hosts sharing the database volume) can take;
+the API process then only queues, cancels and reports scans.
+
+Usage: python -m backend.worker [--id NAME] [--concurrency N]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+from typing import Dict, Set
+from sqlalchemy.exc import OperationalError
+from backend.config import (
+    WORKER_CONCURRENCY, WORKER_HEARTBEAT_SECONDS, WORKER_ID, WORKER_MAX_ATTEMPTS, WORKER_POLL_SECONDS
+)
+from backend.database import async_engine, init_db
+from backend.events import event_bus
+from backend.recon.jobs import claim_job, finish_job, heartbeat_job, release_job, run_scan, _set_status
+
+
+class ScanWorker:
+    """Runs up to concurrency leased scans, heartbeating each until it ends.
+
+    A scan whose job is flagged cancelling is cancelled. One whose lease was
+    lost (reclaimed by another worker after missed heartbeats, or the scan
+    was deleted) is stopped without touching its rows. On shutdown, running
+    scans are stopped and their jobs put back in the queue, to be resumed
+    from their checkpoints by whichever worker claims them next.
+    """
+
+    def __init__(self, worker_id: str, concurrency: int = WORKER_CONCURRENCY):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._lost: Set[int] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        print(f"[*] Worker {self.worker_id} started ({self.concurrency} concurrent scans)")
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping.is_set():
+                await self._claim()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), WORKER_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            heartbeat.cancel()
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(heartbeat, *self._tasks.values(), return_exceptions=True)
+            print(f"[*] Worker {self.worker_id} stopped")
+
+    async def _claim(self):
+        while len(self._tasks) < self.concurrency:
+            try:
+                claimed = await claim_job(self.worker_id)
+            except OperationalError as e:  # Database busy; try again next poll
+                print(f"[!] Claiming a job failed: {e}")
+                return
+            if claimed is None:
+                return
+            scan_id, attempts = claimed
+            if attempts > WORKER_MAX_ATTEMPTS:
+                print(f"[!] Scan {scan_id} abandoned after {attempts - 1} attempts")
+                await _set_status(scan_id, "failed")
+                await finish_job(scan_id, self.worker_id)
+                continue
+            print(f"[*] Claimed scan {scan_id} (attempt {attempts})")
+            self._tasks[scan_id] = asyncio.create_task(self._run(scan_id))
+
+    async def _run(self, scan_id: int):
+        try:
+            await run_scan(scan_id)
+        except asyncio.CancelledError:
+            if not self._stopping.is_set() and scan_id not in self._lost:
+                print(f"[!] Scan {scan_id} cancelled")
+                await _set_status(scan_id, "cancelled")
+        except Exception as e:
+            print(f"[!] Scan {scan_id} crashed: {e}")
+        finally:
+            self._tasks.pop(scan_id, None)
+            if scan_id in self._lost:
+                print(f"[!] Lost the lease on scan {scan_id}; stopped it")
+                self._lost.discard(scan_id)
+            elif self._stopping.is_set():
+                await release_job(scan_id, self.worker_id)
+            else:
+                await finish_job(scan_id, self.worker_id)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+            for scan_id, task in list(self._tasks.items()):
+                try:
+                    state = await heartbeat_job(scan_id, self.worker_id, event_bus.progress.get(scan_id))
+                except OperationalError as e:  # Missed beat; the lease outlasts a few of them
+                    print(f"[!] Heartbeat for scan {scan_id} failed: {e}")
+                    continue
+                if state is None:
+                    self._lost.add(scan_id)
+                    task.cancel()
+                elif state == "cancelling":
+                    task.cancel()
+
+
+async def main(worker_id: str, concurrency: int):
+    worker = ScanWorker(worker_id, concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--id", default=WORKER_ID or f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    init_db()
+    asyncio.run(main(args.id, args.concurrency))
@@ -0,0 +1,105 @@
+"""API latency while scans run: p50/p99 of dashboard endpoints under N concurrent scans.
+
+Runs the app in-process against stub recon tools, starts --scans scans at once
+and polls /results/stats and /scans/ until they all finish.
+
+Usage: python -m benchmarks.bench_api_latency [--scans 20] [--hosts 500] [--urls 5000]
+"""
+import argparse
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+
+STUB = '''#!{python}
+import sys
+hosts = {hosts}
+urls = {urls}
+tool = "{tool}"
+args = sys.argv[1:]
+if tool == "subfinder":
+    domain = args[args.index("-d") + 1]
+    for i in range(hosts):
+        print(f"h{{i}}.{{domain}}")
+elif tool == "gau":
+    domain = args[-1]
+    for i in range(urls):
+        print(f"https://h{{i % hosts}}.{{domain}}/path/{{i}}?q={{i}}")
+else:
+    flag = "-list" if tool == "naabu" else "-l"
+    with open(args[args.index(flag) + 1]) as f:
+        for host in f.read().split():
+            if tool == "naabu":
+                print('{{"host": "%s", "port": 443}}' % host)
+            else:
+                print('{{"input": "%s", "url": "https://%s", "status_code": 200, "title": "t", "tech": ["nginx"], "host": "10.0.0.1"}}' % (host, host))
+'''
+
+
+def install_stubs(hosts: int, urls: int):
+    for tool in ("subfinder", "naabu", "httpx", "gau"):
+        path = os.path.join(_tmpdir, tool)
+        with open(path, "w") as f:
+            f.write(STUB.format(python=sys.executable, hosts=hosts, urls=urls, tool=tool))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        os.environ[f"{tool.upper()}_PATH"] = path
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(scans: int):
+    import httpx
+    from backend.main import app
+
+    latencies = {"/results/stats": [], "/scans/": []}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            ids = [
+                (await client.post("/scans/", json={"domain": f"bench{n}.example.com"})).json()["id"]
+                for n in range(scans)
+            ]
+            start = time.perf_counter()
+            while True:
+                for path in latencies:
+                    t0 = time.perf_counter()
+                    response = await client.get(path)
+                    latencies[path].append(time.perf_counter() - t0)
+                statuses = [s["status"] for s in response.json()["scans"] if s["id"] in ids]
+                if all(status in ("completed", "failed", "cancelled") for status in statuses):
+                    break
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - start
+
+    print(f"{scans} scans finished in {elapsed:.1f}s")
+    for path, values in latencies.items():
+        print(f"{path:16} n={len(values):5}  p50={percentile(values, 50) * 1000:8.1f} ms"
+              f"  p99={percentile(values, 99) * 1000:8.1f} ms  max={max(values) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--urls", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+    os.environ["TOOL_CACHE_PATH"] = f"{_tmpdir}/tool_cache.db"
+    os.environ["URL_STORE_PATH"] = f"{_tmpdir}/urls.db"
+    os.environ.setdefault("MAX_CONCURRENT_SCANS", str(args.scans))
+    os.environ.setdefault("PIPELINE_FLUSH_SECONDS", "0.5")
+    os.environ.setdefault("DNS_RESOLVE", "false")
+    install_stubs(args.hosts, args.urls)
+    asyncio.run(run(args.scans))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""naabu/httpx output parsing: lines per second and memory held by the parsed results.
+
+Writes --hosts synthetic httpx -json lines, shaped like real httpx output with
+the fields we don't store, and --ports naabu -json lines per host. Each is
+parsed the previous way (json.loads into a dict per line, then a lookup dict
+rebuilt from the list) and into HttpRecords, with the json module and, if it is
+installed, orjson. Throughput is timed on its own pass; memory is measured
+with tracemalloc on a second one.
+
+Usage: python -m benchmarks.bench_parse [--hosts 100000] [--ports 2]
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from backend.recon import records
+
+_TECH = (["Nginx:1.18.0", "PHP:7.4"], ["Apache HTTP Server", "jQuery:3.5.1", "Bootstrap"],
+         ["Cloudflare", "React", "Next.js"], ["IIS:10.0", "Microsoft ASP.NET"])
+_PORTS = (80, 443, 8080, 8443, 22, 21, 3306, 5432, 6379, 9200)
+
+
+def httpx_line(i: int) -> str:
+    host = f"h{i}.bench.example.com"
+    ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+    return json.dumps({
+        "timestamp": "2026-10-17T00:00:00.000000000Z", "port": "443", "url": f"https://{host}",
+        "input": host, "title": f"Welcome to {host}", "scheme": "https", "webserver": "nginx/1.18.0",
+        "content_type": "text/html", "method": "GET", "host": ip, "path": "/", "time": "182.739ms",
+        "a": [ip], "cname": [f"lb-{i % 97}.cdn.example.net"], "tech": _TECH[i % len(_TECH)],
+        "words": 1200 + i % 500, "lines": 80 + i % 40, "status_code": 200, "content_length": 14000 + i % 9000,
+        "failed": False, "knowledgebase": {"PageType": "nonerror", "pHash": 0},
+        "resolvers": ["1.1.1.1:53", "8.8.8.8:53"]
+    })
+
+
+def naabu_line(i: int, port: int) -> str:
+    ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+    return json.dumps({"host": f"h{i}.bench.example.com", "ip": ip, "port": port, "protocol": "tcp",
+                       "tls": False, "timestamp": "2026-10-17T00:00:00.000000000Z"})
+
+
+def httpx_previous(lines, loads=json.loads) -> dict:
+    """The previous path: a dict per line, collected in a list, then a lookup dict rebuilt from it."""
+    results = []
+    for line in lines:
+        try:
+            data = loads(line)
+        except ValueError:
+            continue
+        results.append({
+            'url': data.get('url', ''),
+            'host': data.get('input', ''),
+            'status_code': data.get('status_code'),
+            'content_length': data.get('content_length'),
+            'title': data.get('title', ''),
+            'technologies': data.get('tech', []),
+            'ip': data.get('host', ''),
+            'is_alive': True
+        })
+    return {r['host']: r for r in results}
+
+
+def httpx_records(lines, loads) -> dict:
+    results = {}
+    for line in lines:
+        record = records.parse_httpx(line, loads)
+        if record is not None:
+            results[record.host] = record
+    return results
+
+
+def naabu_previous(lines, loads=json.loads) -> dict:
+    results = {}
+    for line in lines:
+        try:
+            data = loads(line)
+        except ValueError:
+            continue
+        host = data.get('host', data.get('ip', ''))
+        port = data.get('port')
+        if host and port:
+            results.setdefault(host, []).append(port)
+    return results
+
+
+def naabu_records(lines, loads) -> dict:
+    results = {}
+    for line in lines:
+        found = records.parse_naabu(line, loads)
+        if found is not None:
+            results.setdefault(found[0], []).append(found[1])
+    return results
+
+
+def measure(label: str, path: str, parse, *args):
+    with open(path) as f:
+        start = time.perf_counter()
+        count = len(parse(f, *args))
+        seconds = time.perf_counter() - start
+    with open(path) as f:
+        lines = sum(1 for _ in f)
+    tracemalloc.start()
+    with open(path) as f:
+        result = parse(f, *args)
+        held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{label:28} {lines / seconds:>11,.0f} lines/s   held {held / 2**20:7.1f} MiB   "
+          f"peak {peak / 2**20:7.1f} MiB   ({count:,} hosts)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=100000)
+    parser.add_argument("--ports", type=int, default=2, help="naabu lines per host")
+    args = parser.parse_args()
+
+    print(f"Scans decode tool output with {records.JSON_DECODER}")
+    decoders = [("json", json.loads)]
+    if records.orjson is not None:
+        decoders.append(("orjson", records.orjson.loads))
+    else:
+        print("orjson is not installed; timing the json module only")
+
+    with tempfile.TemporaryDirectory(prefix="recon-bench-") as tmpdir:
+        httpx_path = os.path.join(tmpdir, "httpx.jsonl")
+        naabu_path = os.path.join(tmpdir, "naabu.jsonl")
+        with open(httpx_path, "w") as f:
+            f.writelines(httpx_line(i) + "\n" for i in range(args.hosts))
+        with open(naabu_path, "w") as f:
+            f.writelines(naabu_line(i, port) + "\n" for i in range(args.hosts) for port in _PORTS[:args.ports])
+        print(f"httpx: {args.hosts:,} lines, {os.path.getsize(httpx_path) / 2**20:.1f} MiB; "
+              f"naabu: {args.hosts * args.ports:,} lines, {os.path.getsize(naabu_path) / 2**20:.1f} MiB")
+
+        measure("httpx previous (dicts)", httpx_path, httpx_previous)
+        for name, loads in decoders:
+            measure(f"httpx records ({name})", httpx_path, httpx_records, loads)
+        measure("naabu previous", naabu_path, naabu_previous)
+        for name, loads in decoders:
+            measure(f"naabu parse_naabu ({name})", naabu_path, naabu_records, loads)
+    print(f"process peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare Subdomain persistence throughput: per-object ORM adds vs chunked bulk insert.
+
+Usage: python -m benchmarks.bench_persist [--sizes 10000,100000,1000000] [--skip-orm-above N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from backend.database import Base, Scan, SessionLocal, Subdomain, engine  # noqa: E402
+from backend.recon.persist import persist_subdomains  # noqa: E402
+
+
+def synthetic_rows(count: int, scan_id: int = 1):
+    for i in range(count):
+        yield {
+            'scan_id': scan_id,
+            'subdomain': f"host{i}.bench.example.com",
+            'ip_address': f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            'ports': [80, 443] if i % 3 == 0 else [],
+            'status_code': 200 if i % 2 == 0 else None,
+            'content_length': 1024,
+            'title': f"Host {i}",
+            'technologies': ["nginx"],
+            'urls': [],
+            'is_alive': i % 2 == 0
+        }
+
+
+def reset_schema():
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS subdomain_search")  # Not part of the metadata
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(Scan(id=1, domain="bench.example.com"))
+        db.commit()
+
+
+def bench_orm(count: int) -> float:
+    """The original path: one ORM object per row, single commit at the end."""
+    reset_schema()
+    db = SessionLocal()
+    start = time.perf_counter()
+    for row in synthetic_rows(count):
+        row['ports'] = json.dumps(row['ports']) if row['ports'] else None
+        row['technologies'] = json.dumps(row['technologies'])
+        row['urls'] = None
+        db.add(Subdomain(**row))
+    db.commit()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed
+
+
+def bench_bulk(count: int) -> float:
+    reset_schema()
+    db = SessionLocal()
+    start = time.perf_counter()
+    persist_subdomains(db, synthetic_rows(count))
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--skip-orm-above", type=int, default=None,
+                        help="skip the slow ORM path for sizes above this")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'orm rows/s':>14} {'bulk rows/s':>14} {'speedup':>8}")
+    for count in (int(s) for s in args.sizes.split(",")):
+        bulk = bench_bulk(count)
+        if args.skip_orm_above is not None and count > args.skip_orm_above:
+            print(f"{count:>10} {'-':>14} {count / bulk:>14,.0f} {'-':>8}")
+            continue
+        orm = bench_orm(count)
+        print(f"{count:>10} {count / orm:>14,.0f} {count / bulk:>14,.0f} {orm / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Time /results/ paging (OFFSET vs keyset) and export (in-memory list vs stream) on one large scan.
+
+Usage: python -m benchmarks.bench_results_paging [--subdomains 500000] [--page-size 100]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import resource
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from backend.database import AsyncSessionLocal, SessionLocal, Scan, Subdomain, init_db  # noqa: E402
+from backend.recon.persist import persist_subdomains  # noqa: E402
+from backend.routers.results import iter_export_rows, ndjson_lines, with_children  # noqa: E402
+
+PORTS = [22, 80, 443, 8080, 8443]
+TECHS = ["nginx", "Apache", "PHP", "React", "Cloudflare"]
+
+
+def populate(subdomains: int) -> int:
+    rng = random.Random(0)
+    db = SessionLocal()
+    scan = Scan(domain="bench.example.com", status="completed")
+    db.add(scan)
+    db.commit()
+    scan_id = scan.id
+    persist_subdomains(db, (
+        {
+            'scan_id': scan_id,
+            'subdomain': f"host{i}.bench.example.com",
+            'is_alive': rng.random() < 0.4,
+            'ports': rng.sample(PORTS, rng.randint(0, 2)),
+            'technologies': rng.sample(TECHS, rng.randint(0, 2)),
+        }
+        for i in range(subdomains)
+    ))
+    db.close()
+    return scan_id
+
+
+async def page_by_offset(db, scan_id: int, page: int, size: int):
+    """Previous implementation: full count plus OFFSET."""
+    query = select(Subdomain).where(Subdomain.scan_id == scan_id)
+    await db.scalar(select(func.count()).select_from(query.subquery()))
+    return (await db.scalars(
+        with_children(query).order_by(Subdomain.id.desc()).offset(page * size).limit(size)
+    )).all()
+
+
+async def page_by_cursor(db, scan_id: int, cursor, size: int):
+    query = select(Subdomain).where(Subdomain.scan_id == scan_id)
+    if cursor is not None:
+        query = query.where(Subdomain.id < cursor)
+    return (await db.scalars(with_children(query).order_by(Subdomain.id.desc()).limit(size + 1))).all()
+
+
+async def export_as_list(scan_id: int):
+    """Previous implementation: build every row in memory, then serialize."""
+    async with AsyncSessionLocal() as db:
+        query = select(Subdomain).where(Subdomain.scan_id == scan_id).options(
+            selectinload(Subdomain.port_entries),
+            selectinload(Subdomain.technology_entries)
+        )
+        rows = [
+            {"subdomain": r.subdomain, "ports": r.port_list, "technologies": r.technology_list}
+            for r in await db.scalars(query)
+        ]
+        return len(rows)
+
+
+async def export_as_stream(scan_id: int):
+    first_byte = None
+    start = time.perf_counter()
+    async for _ in ndjson_lines(iter_export_rows(scan_id)):
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+    return first_byte
+
+
+def max_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def measure(fn, *args):
+    """Run fn, returning its result, wall time and how far it raised peak RSS."""
+    before = max_rss()
+    start = time.perf_counter()
+    result = await fn(*args)
+    return result, time.perf_counter() - start, max_rss() - before
+
+
+async def run(scan_id: int, subdomains: int, size: int):
+    deep_page = subdomains // size - 1
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        await page_by_offset(db, scan_id, 0, size)
+        offset_first = time.perf_counter() - start
+        start = time.perf_counter()
+        await page_by_offset(db, scan_id, deep_page, size)
+        offset_deep = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = await page_by_cursor(db, scan_id, None, size)
+        cursor_first = time.perf_counter() - start
+        start = time.perf_counter()
+        await page_by_cursor(db, scan_id, rows[-1].id - (deep_page - 1) * size, size)
+        cursor_deep = time.perf_counter() - start
+
+    print(f"OFFSET page 1 / page {deep_page + 1}: {offset_first * 1000:8.1f} / {offset_deep * 1000:8.1f} ms")
+    print(f"keyset page 1 / page {deep_page + 1}: {cursor_first * 1000:8.1f} / {cursor_deep * 1000:8.1f} ms")
+
+    # Peak RSS only grows, so the streaming export has to be measured first
+    first_byte, stream_time, stream_peak = await measure(export_as_stream, scan_id)
+    _, list_time, list_peak = await measure(export_as_list, scan_id)
+    print(f"export as stream: {stream_time:6.1f} s total, first byte after {first_byte:6.2f} s, peak RSS +{stream_peak / 2**20:7.1f} MiB")
+    print(f"export as list:   {list_time:6.1f} s total, first byte after {list_time:6.2f} s, peak RSS +{list_peak / 2**20:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subdomains", type=int, default=500000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    init_db()
+    start = time.perf_counter()
+    scan_id = populate(args.subdomains)
+    print(f"populated {args.subdomains:,} subdomains in {time.perf_counter() - start:.1f}s")
+    asyncio.run(run(scan_id, args.subdomains, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
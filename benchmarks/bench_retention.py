@@ -0,0 +1,126 @@
+"""Scan retention: delete, archive and restore times, archive size, and space reclaimed by maintenance.
+
+Creates three identical scans of --hosts results. One is deleted the old way
+(ORM cascade, loading every row first), one with the set-based delete, and
+one is archived and restored. Each URL store gets --urls-per-host URLs per host.
+
+Usage: python -m benchmarks.bench_retention [--hosts 100000] [--urls-per-host 5] [--skip-orm]
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+os.environ["URL_STORE_PATH"] = f"{_tmpdir}/urls.db"
+os.environ["ARCHIVE_DIR"] = f"{_tmpdir}/archive"
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from backend.database import SessionLocal, Scan, Subdomain, init_db  # noqa: E402
+from backend.recon.persist import persist_subdomains  # noqa: E402
+from backend.recon.urlstore import url_store  # noqa: E402
+from backend import retention  # noqa: E402
+
+PORTS = [80, 443, 8080, 8443]
+
+
+def populate(db, hosts: int, urls_per_host: int) -> int:
+    scan = Scan(domain="bench.example.com", status="completed")
+    db.add(scan)
+    db.commit()
+    persist_subdomains(db, (
+        {
+            'scan_id': scan.id,
+            'subdomain': f"host{i}.bench.example.com",
+            'ip_address': f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+            'status_code': 200,
+            'title': f"Host {i}",
+            'is_alive': True,
+            'ports': PORTS[:i % 4 + 1],
+            'technologies': ["nginx", "PHP"],
+            'urls': [f"https://host{i}.bench.example.com/p{n}" for n in range(min(urls_per_host, 3))],
+        }
+        for i in range(hosts)
+    ))
+    batch = []
+    for i in range(hosts):
+        batch.extend(f"https://host{i}.bench.example.com/page/{n}?id={i}" for n in range(urls_per_host))
+        if len(batch) >= 5000:
+            url_store.add(scan.id, batch)
+            batch = []
+    url_store.add(scan.id, batch)
+    return scan.id
+
+
+def delete_with_orm(db, scan_id: int):
+    """The previous path: the ORM cascade loads every row and child row, then deletes them one by one."""
+    scan = db.get(Scan, scan_id)
+    rows = db.scalars(
+        select(Subdomain).where(Subdomain.scan_id == scan_id).options(
+            selectinload(Subdomain.port_entries),
+            selectinload(Subdomain.technology_entries),
+            selectinload(Subdomain.url_entries))
+    ).all()
+    for row in rows:
+        for child in row.port_entries + row.technology_entries + row.url_entries:
+            db.delete(child)
+        db.delete(row)
+    db.delete(scan)
+    db.commit()
+
+
+def db_bytes() -> int:
+    return sum(os.path.getsize(os.path.join(_tmpdir, name)) for name in os.listdir(_tmpdir)
+               if name.startswith("bench.db"))
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(label: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:34} {time.perf_counter() - start:8.2f} s   peak RSS {peak_rss_mb():7.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=100000)
+    parser.add_argument("--urls-per-host", type=int, default=5)
+    parser.add_argument("--skip-orm", action="store_true", help="skip the slow ORM cascade delete")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    start = time.perf_counter()
+    archived_id, deleted_id, orm_id = (populate(db, args.hosts, args.urls_per_host) for _ in range(3))
+    print(f"populated 3 scans of {args.hosts:,} hosts in {time.perf_counter() - start:.1f} s; "
+          f"database {db_bytes() / 2**20:.1f} MiB, peak RSS {peak_rss_mb():.1f} MiB")
+
+    timed("set-based delete", retention.delete_scan, db, deleted_id)
+    url_store.delete_scan(deleted_id)
+    if not args.skip_orm:
+        timed("ORM cascade delete (previous)", delete_with_orm, db, orm_id)
+    else:
+        retention.delete_scan(db, orm_id)
+    url_store.delete_scan(orm_id)
+
+    before = db_bytes()
+    archived = timed("archive", retention.archive_scan, db, archived_id)
+    print(f"  archive {archived['bytes'] / 2**20:.1f} MiB for {archived['results']:,} results and "
+          f"{archived['urls']:,} URLs ({archived['bytes'] / max(archived['results'], 1):.0f} bytes/host)")
+    maintenance = timed("maintenance (ANALYZE + VACUUM)", retention.maintain)
+    print(f"  database {before / 2**20:.1f} MiB -> {db_bytes() / 2**20:.1f} MiB "
+          f"(vacuumed: {maintenance['vacuumed']})")
+    restored = timed("restore", retention.restore_scan, db, archived_id)
+    print(f"  restored {restored['results']:,} results and {restored['urls']:,} URLs")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
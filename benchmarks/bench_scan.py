@@ -0,0 +1,201 @@
+"""End-to-end scan benchmark against fake recon tools, with stored results for regression checks.
+
+Runs the app in-process with the stubs from benchmarks.fake_tools, starts one
+scan, and polls dashboard endpoints from --clients concurrent clients until it
+finishes. Reports scan time, per-stage wall time, peak memory, database write
+throughput and API latency. Each run is appended to --results; a run is
+compared with the previous one that used the same parameters, and metrics more
+than --threshold percent worse are flagged.
+
+Usage: python -m benchmarks.bench_scan [--subdomains 20000] [--urls 200000] [--rate 0]
+                                       [--clients 4] [--check]
+Example, slow drip vs burst:
+       python -m benchmarks.bench_scan --subdomains 100000 --urls 5000000
+       python -m benchmarks.bench_scan --rate 2000 --burst 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks import fake_tools
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+
+ENDPOINTS = ("/results/stats", "/scans/", "/scans/queue", "/results/?limit=50")
+
+# Metric -> True if higher is better
+COMPARED = {
+    "scan_seconds": False,
+    "peak_rss_mb": False,
+    "db_rows_per_second": True,
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def poll(client, latencies, done: asyncio.Event):
+    while not done.is_set():
+        for path in ENDPOINTS:
+            t0 = time.perf_counter()
+            await client.get(path)
+            latencies[path].append(time.perf_counter() - t0)
+        await asyncio.sleep(0.05)
+
+
+async def run(clients: int) -> dict:
+    import httpx
+    from backend.main import app
+    from backend.database import SessionLocal, Scan
+
+    latencies = {path: [] for path in ENDPOINTS}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            scan_id = (await client.post("/scans/", json={"domain": "bench.example.com", "bypass_cache": True})).json()["id"]
+            done = asyncio.Event()
+            pollers = [asyncio.create_task(poll(client, latencies, done)) for _ in range(clients)]
+            while True:
+                scans = (await client.get("/scans/")).json()["scans"]
+                status = next(s["status"] for s in scans if s["id"] == scan_id)
+                if status in ("completed", "failed", "cancelled"):
+                    break
+                await asyncio.sleep(0.1)
+            elapsed = time.perf_counter() - start
+            done.set()
+            await asyncio.gather(*pollers)
+
+    db = SessionLocal()
+    try:
+        scan = db.get(Scan, scan_id)
+        stages = json.loads(scan.metrics) if scan.metrics else {}
+    finally:
+        db.close()
+
+    db_seconds = sum(stage["db_seconds"] for stage in stages.values())
+    persist = stages.get("persist", {})
+    tool_rss = [stage.get("peak_rss_kb") or 0 for stage in stages.values()]
+    return {
+        "status": status,
+        "scan_seconds": round(elapsed, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "tool_peak_rss_mb": round(max(tool_rss, default=0) / 1024, 1),
+        "db_seconds": round(db_seconds, 2),
+        "db_rows_per_second": round(persist["output"] / persist["db_seconds"]) if persist.get("db_seconds") else None,
+        "stages": {name: stage["wall_seconds"] for name, stage in stages.items()},
+        "api": {
+            path: {
+                "n": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1)
+            }
+            for path, values in latencies.items() if values
+        }
+    }
+
+
+def load_previous(path: str, params: dict):
+    previous = None
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["params"] == params:
+                    previous = record
+    return previous
+
+
+def compare(previous: dict, current: dict, threshold: float) -> list:
+    """Print changes against the previous run; returns the metrics that regressed past threshold."""
+    values = {name: (previous["result"].get(name), current.get(name), higher) for name, higher in COMPARED.items()}
+    for path, stats in current["api"].items():
+        before = previous["result"]["api"].get(path, {}).get("p99_ms")
+        values[f"api {path} p99_ms"] = (before, stats["p99_ms"], False)
+
+    print(f"\nAgainst {previous['commit']} ({previous['timestamp']}):")
+    regressions = []
+    for name, (before, after, higher) in values.items():
+        if not before or after is None:
+            continue
+        change = (after - before) / before * 100
+        worse = -change if higher else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        print(f"  {name:32} {before:>10} -> {after:>10}  ({change:+.1f}%){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subdomains", type=int, default=20000)
+    parser.add_argument("--urls", type=int, default=200000)
+    parser.add_argument("--ports", type=int, default=2, help="open ports per host")
+    parser.add_argument("--alive", type=float, default=0.6, help="fraction of hosts httpx finds alive")
+    parser.add_argument("--rate", type=float, default=0, help="lines/s per tool process (0 = burst)")
+    parser.add_argument("--burst", type=int, default=1000, help="lines per burst when --rate is set")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent API pollers")
+    parser.add_argument("--results", default="benchmarks/results/bench_scan.jsonl")
+    parser.add_argument("--threshold", type=float, default=20, help="percent change flagged as a regression")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if a regression is flagged")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+    os.environ["TOOL_CACHE_PATH"] = f"{_tmpdir}/tool_cache.db"
+    os.environ["URL_STORE_PATH"] = f"{_tmpdir}/urls.db"
+    fake_tools.install(_tmpdir, args.subdomains, args.urls, args.ports, args.alive, args.rate, args.burst)
+
+    params = {
+        "subdomains": args.subdomains, "urls": args.urls, "ports": args.ports, "alive": args.alive,
+        "rate": args.rate, "burst": args.burst, "clients": args.clients
+    }
+    result = asyncio.run(run(args.clients))
+
+    print(f"Scan {result['status']} in {result['scan_seconds']}s "
+          f"({args.subdomains} subdomains, {args.urls} URLs, rate {args.rate or 'burst'})")
+    for name, seconds in result["stages"].items():
+        print(f"  {name:10} {seconds:8.2f} s")
+    print(f"Peak RSS: {result['peak_rss_mb']} MiB (API + engine), {result['tool_peak_rss_mb']} MiB (largest tool)")
+    print(f"Database: {result['db_seconds']} s writing, {result['db_rows_per_second']} rows/s persisted")
+    for path, stats in result["api"].items():
+        print(f"  {path:22} n={stats['n']:5}  p50={stats['p50_ms']:8.1f} ms  p99={stats['p99_ms']:8.1f} ms")
+
+    previous = load_previous(args.results, params)
+    regressions = compare(previous, result, args.threshold) if previous else []
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "params": params,
+        "result": result
+    }
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nStored in {args.results}")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
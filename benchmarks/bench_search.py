@@ -0,0 +1,99 @@
+"""Time /results/search queries (FTS5 match, facet filters, facet counts) over a large result set.
+
+Usage: python -m benchmarks.bench_search [--subdomains 1000000] [--scans 20] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from backend.database import SessionLocal, Scan, Subdomain, init_db  # noqa: E402
+from backend.recon.persist import persist_subdomains  # noqa: E402
+from backend import search  # noqa: E402
+
+PORTS = [21, 22, 80, 443, 3306, 5432, 6379, 8080, 8443, 9200]
+TECHS = ["nginx", "Apache", "IIS", "PHP", "React", "jQuery", "Cloudflare", "WordPress", "Java", "Node.js"]
+TITLES = ["Jenkins", "Grafana", "Kibana", "Login", "Welcome to nginx!", "Dashboard", "Not Found",
+          "Index of /", "GitLab", "phpMyAdmin", "Swagger UI", "Admin Panel"]
+WORDS = ["api", "dev", "staging", "admin", "mail", "vpn", "cdn", "static", "app", "internal", "jenkins", "git"]
+
+QUERIES = {
+    "text only (title:jenkins)": dict(q="title:jenkins"),
+    "text + tech + port": dict(q="title:jenkins", techs=["nginx"], ports=[8080]),
+    "prefix (stag*) + alive": dict(q="stag*", alive=True),
+    "filters only (tech + port)": dict(techs=["nginx"], ports=[8080]),
+    "one domain + status 200": dict(domain="bench3.example.com", status_codes=[200]),
+    "everything (no filters)": dict(),
+}
+
+
+def populate(db, subdomains: int, scans: int):
+    rng = random.Random(0)
+    per_scan = subdomains // scans
+    for n in range(scans):
+        scan = Scan(domain=f"bench{n}.example.com", status="completed")
+        db.add(scan)
+        db.commit()
+        persist_subdomains(db, (
+            {
+                'scan_id': scan.id,
+                'subdomain': f"{rng.choice(WORDS)}-{i}.{rng.choice(WORDS)}.bench{n}.example.com",
+                'title': rng.choice(TITLES),
+                'status_code': rng.choice((200, 301, 403, 404)),
+                'is_alive': rng.random() < 0.4,
+                'ports': rng.sample(PORTS, rng.randint(0, 3)),
+                'technologies': rng.sample(TECHS, rng.randint(0, 2)),
+            }
+            for i in range(per_scan)
+        ))
+
+
+def run_page(db, params: dict, page_size: int = 100):
+    stmt, order = search.matching([Subdomain], **params)
+    return db.scalars(stmt.order_by(order.desc()).limit(page_size + 1)).all()
+
+
+def run_query(db, params: dict):
+    return run_page(db, params), search.facet_counts(db, **params)
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subdomains", type=int, default=1000000)
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    start = time.perf_counter()
+    populate(db, args.subdomains, args.scans)
+    print(f"populated and indexed {args.subdomains:,} subdomains in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'query':32} {'matches':>10} {'page':>10} {'page+facets':>12}")
+    for name, params in QUERIES.items():
+        _, counts = run_query(db, params)
+        total = f"{counts['total']}{'' if counts['total_exact'] else '+'}"
+        page = timed(lambda: run_page(db, params), args.repeat)
+        full = timed(lambda: run_query(db, params), args.repeat)
+        print(f"{name:32} {total:>10} {page * 1000:8.1f}ms {full * 1000:10.1f}ms")
+
+    start = time.perf_counter()
+    search.rebuild(db)
+    print(f"full index rebuild: {time.perf_counter() - start:.1f} s")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
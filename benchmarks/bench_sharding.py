@@ -0,0 +1,83 @@
+"""Time httpx over a large host list: one process vs shards run in parallel, and a hanging shard.
+
+The stub httpx probes one host at a time with a fixed per-host delay, so the
+single-process run is bound by that delay the way a CPU-saturated httpx is.
+
+Usage: python -m benchmarks.bench_sharding [--hosts 20000] [--delay-ms 0.5] [--parallel 8]
+"""
+import argparse
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+
+STUB = '''#!{python}
+import json, sys, time
+hosts = open(sys.argv[sys.argv.index("-l") + 1]).read().split()
+if "hang.example.com" in hosts:
+    time.sleep(3600)
+for host in hosts:
+    time.sleep({delay})
+    print(json.dumps({{"input": host, "url": "https://" + host, "status_code": 200}}), flush=True)
+'''
+
+
+def install_stub(delay: float):
+    path = os.path.join(_tmpdir, "httpx")
+    with open(path, "w") as f:
+        f.write(STUB.format(python=sys.executable, delay=delay))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["HTTPX_PATH"] = path
+
+
+async def probe(hosts, shard_size, timeout):
+    from backend.recon import tools
+
+    def build_cmd(hosts_file):
+        return [tools.HTTPX_PATH, "-l", hosts_file, "-silent", "-json"]
+
+    failed = []
+    start = time.perf_counter()
+    found = 0
+    async for _ in tools.iter_sharded("httpx", hosts, build_cmd, timeout=timeout, failed=failed,
+                                      shard_size=shard_size, retries=0):
+        found += 1
+    return time.perf_counter() - start, found, len(failed)
+
+
+async def run(hosts, shard_size: int, parallel: int):
+    elapsed, found, _ = await probe(hosts, len(hosts), timeout=3600)
+    print(f"1 process:                 {elapsed:6.1f} s, {found} records")
+    elapsed, found, _ = await probe(hosts, shard_size, timeout=3600)
+    print(f"{parallel} parallel shards of {shard_size}: {elapsed:6.1f} s, {found} records")
+
+    # One host makes its process hang; only its shard should be lost
+    hung = hosts[:-1] + ["hang.example.com"]
+    timeout = 10
+    elapsed, found, failed = await probe(hung, len(hung), timeout=timeout)
+    print(f"1 process, one hang:       {elapsed:6.1f} s, {found} records, {failed} hosts lost")
+    elapsed, found, failed = await probe(hung, shard_size, timeout=timeout)
+    print(f"sharded, one hang:         {elapsed:6.1f} s, {found} records, {failed} hosts lost")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hosts", type=int, default=20000)
+    parser.add_argument("--delay-ms", type=float, default=0.5)
+    parser.add_argument("--parallel", type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ["HTTPX_CONCURRENCY"] = str(args.parallel)
+    install_stub(args.delay_ms / 1000)
+    hosts = [f"h{i}.example.com" for i in range(args.hosts)]
+    shard_size = -(-args.hosts // (args.parallel * 4))
+
+    asyncio.run(run(hosts, shard_size, args.parallel))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Time /results/stats backends: GROUP BY over the result tables vs materialized counters.
+
+Usage: python -m benchmarks.bench_stats [--subdomains 1000000] [--scans 20] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+from sqlalchemy import func  # noqa: E402
+from backend.database import SessionLocal, Scan, Subdomain, SubdomainPort, SubdomainTechnology, init_db  # noqa: E402
+from backend.recon.persist import persist_subdomains  # noqa: E402
+from backend import stats  # noqa: E402
+
+PORTS = [21, 22, 80, 443, 3306, 5432, 6379, 8080, 8443, 9200]
+TECHS = ["nginx", "Apache", "IIS", "PHP", "React", "jQuery", "Cloudflare", "WordPress", "Java", "Node.js"]
+
+
+def populate(db, subdomains: int, scans: int):
+    rng = random.Random(0)
+    per_scan = subdomains // scans
+    for n in range(scans):
+        scan = Scan(domain=f"bench{n}.example.com", status="completed")
+        db.add(scan)
+        db.commit()
+        persist_subdomains(db, (
+            {
+                'scan_id': scan.id,
+                'subdomain': f"host{i}.bench{n}.example.com",
+                'is_alive': rng.random() < 0.4,
+                'ports': rng.sample(PORTS, rng.randint(0, 3)),
+                'technologies': rng.sample(TECHS, rng.randint(0, 2)),
+            }
+            for i in range(per_scan)
+        ))
+
+
+def stats_by_aggregation(db):
+    """Previous implementation: count and GROUP BY over the full result tables."""
+    db.query(Scan).count()
+    db.query(Subdomain).count()
+    db.query(Subdomain).filter(Subdomain.is_alive == True).count()
+    db.query(func.count(func.distinct(SubdomainPort.subdomain_id))).scalar()
+    tech_count = func.count(SubdomainTechnology.id)
+    db.query(SubdomainTechnology.tech, tech_count).group_by(SubdomainTechnology.tech).order_by(tech_count.desc()).limit(10).all()
+    port_count = func.count(SubdomainPort.id)
+    db.query(SubdomainPort.port, port_count).group_by(SubdomainPort.port).order_by(port_count.desc()).limit(10).all()
+
+
+def stats_by_counters(db):
+    stats.scan_status_counts(db)
+    stats.read_scope(db)
+
+
+def timed(fn, db, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(db)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subdomains", type=int, default=1000000)
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    start = time.perf_counter()
+    populate(db, args.subdomains, args.scans)
+    print(f"populated {args.subdomains:,} subdomains in {time.perf_counter() - start:.1f}s")
+
+    aggregated = timed(stats_by_aggregation, db, max(1, args.repeat // 10))
+    counters = timed(stats_by_counters, db, args.repeat)
+    start = time.perf_counter()
+    stats.rebuild(db)
+    rebuild = time.perf_counter() - start
+
+    print(f"GROUP BY aggregation: {aggregated * 1000:10.1f} ms/request")
+    print(f"materialized counters:{counters * 1000:10.2f} ms/request")
+    print(f"full rebuild:         {rebuild:10.1f} s")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""URL store: ingest rate, bytes on disk per URL, memory, and query latency.
+
+Stores --urls synthetic gau-style URLs for one scan, then the same corpus again
+for a second scan (deduplicated against the first), and times page, host and
+path-prefix queries and a full export.
+
+Usage: python -m benchmarks.bench_urlstore [--urls 1000000] [--hosts 10000] [--batch 5000]
+"""
+import argparse
+import os
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="recon-bench-")
+os.environ["URL_STORE_PATH"] = f"{_tmpdir}/urls.db"
+
+from backend.recon.urlstore import url_store  # noqa: E402
+
+PATHS = ["/", "/index.php", "/api/v1/users/{n}", "/wp-content/uploads/2023/{n}.jpg",
+         "/static/js/main.{n}.min.js", "/search?q=item{n}&page=2", "/product/{n}?utm_source=news"]
+
+
+def corpus(count: int, hosts: int, domain: str = "bench.example.com"):
+    rng = random.Random(0)
+    for i in range(count):
+        path = rng.choice(PATHS).format(n=rng.randrange(count))
+        yield f"https://h{i % hosts}.{domain}{path}"
+
+
+def ingest(scan_id: int, count: int, hosts: int, batch_size: int):
+    start, added, raw, batch = time.perf_counter(), 0, 0, []
+    for url in corpus(count, hosts):
+        raw += len(url) + 1
+        batch.append(url)
+        if len(batch) >= batch_size:
+            added += url_store.add(scan_id, batch)
+            batch = []
+    added += url_store.add(scan_id, batch)
+    return time.perf_counter() - start, added, raw
+
+
+def disk_stats() -> dict:
+    """Store stats with the WAL folded into the database file, so bytes is the settled size."""
+    with sqlite3.connect(os.environ["URL_STORE_PATH"]) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return url_store.stats()
+
+
+def timed(fn, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--hosts", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=5000, help="URLs per store write (URL_STORE_BATCH)")
+    args = parser.parse_args()
+
+    seconds, added, raw = ingest(1, args.urls, args.hosts, args.batch)
+    stats = disk_stats()
+    print(f"Scan 1: {added} URLs stored in {seconds:.1f} s ({added / seconds:,.0f} URLs/s)")
+    print(f"  disk {stats['bytes'] / 2**20:.1f} MiB = {stats['bytes'] / max(stats['urls'], 1):.1f} bytes/URL "
+          f"(raw text {raw / max(args.urls, 1):.1f} bytes/URL)")
+
+    seconds, added, _ = ingest(2, args.urls, args.hosts, args.batch)
+    grown = disk_stats()["bytes"] - stats["bytes"]
+    print(f"Scan 2 (same URLs): {added} recorded in {seconds:.1f} s, disk +{grown / 2**20:.1f} MiB")
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+    host = f"h{args.hosts // 2}.bench.example.com"
+    _, cursor = url_store.page(1, limit=100)
+    print("Query latency (ms):")
+    print(f"  first page           {timed(lambda: url_store.page(1, limit=100)):8.2f}")
+    print(f"  next page            {timed(lambda: url_store.page(1, cursor=cursor, limit=100)):8.2f}")
+    print(f"  one host             {timed(lambda: url_store.page(1, host=host, limit=100)):8.2f}")
+    print(f"  host + path prefix   {timed(lambda: url_store.page(1, host=host, path_prefix='/api/')):8.2f}")
+    print(f"  hosts page           {timed(lambda: url_store.hosts(1, limit=100)):8.2f}")
+
+    start = time.perf_counter()
+    exported = sum(1 for _ in url_store.iter_urls(1, batch_size=5000))
+    seconds = time.perf_counter() - start
+    print(f"Export: {exported} URLs in {seconds:.1f} s ({exported / seconds:,.0f} URLs/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Stub subfinder/naabu/httpx/gau that emit synthetic output at a configurable volume and rate.
+
+install() writes one executable per tool into a directory, points
+SUBFINDER_PATH/NAABU_PATH/HTTPX_PATH/GAU_PATH at them and turns off DNS
+resolution; call it before importing backend. The stubs run this file as a
+script and read their settings from the environment:
+
+    FAKE_SUBDOMAINS  subdomains subfinder prints (hosts are h<i>.<domain>)
+    FAKE_URLS        URLs gau prints, spread over the subdomains
+    FAKE_PORTS       open ports naabu reports per host
+    FAKE_ALIVE       fraction of hosts httpx reports as alive
+    FAKE_RATE        lines per second per process; 0 prints as fast as possible
+    FAKE_BURST       with FAKE_RATE, lines printed back to back between pauses
+"""
+import json
+import os
+import stat
+import sys
+import time
+import zlib
+
+TOOLS = ("subfinder", "naabu", "httpx", "gau")
+
+_PORTS = (80, 443, 8080, 8443, 22, 21, 3306, 5432, 6379, 9200)
+_TECH = (["nginx"], ["Apache", "PHP"], ["cloudflare", "React"], ["IIS", "ASP.NET"])
+
+WRAPPER = '''#!/bin/sh
+exec "{python}" "{script}" {tool} "$@"
+'''
+
+
+def install(directory: str, subdomains: int = 10000, urls: int = 100000, ports: int = 2,
+            alive: float = 0.6, rate: float = 0, burst: int = 1000):
+    """Write the stub executables into directory and configure them through the environment."""
+    for tool in TOOLS:
+        path = os.path.join(directory, tool)
+        with open(path, "w") as f:
+            f.write(WRAPPER.format(python=sys.executable, script=os.path.abspath(__file__), tool=tool))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        os.environ[f"{tool.upper()}_PATH"] = path
+    os.environ.update({
+        "FAKE_SUBDOMAINS": str(subdomains),
+        "FAKE_URLS": str(urls),
+        "FAKE_PORTS": str(ports),
+        "FAKE_ALIVE": str(alive),
+        "FAKE_RATE": str(rate),
+        "FAKE_BURST": str(burst)
+    })
+    # The synthetic names don't exist; resolving them would filter them all out
+    os.environ.setdefault("DNS_RESOLVE", "false")
+
+
+class Emitter:
+    """Print lines at FAKE_RATE per second, in bursts of FAKE_BURST."""
+
+    def __init__(self):
+        self.rate = float(os.getenv("FAKE_RATE", "0"))
+        self.burst = max(int(os.getenv("FAKE_BURST", "1000")), 1)
+        self.start = time.monotonic()
+        self.count = 0
+        self.out = sys.stdout
+
+    def emit(self, line: str):
+        self.out.write(line + "\n")
+        self.count += 1
+        if self.rate and self.count % self.burst == 0:
+            self.out.flush()
+            delay = self.start + self.count / self.rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        self.out.flush()
+
+
+def _arg(args, *flags):
+    for flag in flags:
+        if flag in args:
+            return args[args.index(flag) + 1]
+    return args[-1]
+
+
+def _hosts(args, *flags):
+    with open(_arg(args, *flags)) as f:
+        return f.read().split()
+
+
+def _alive(host: str, fraction: float) -> bool:
+    return zlib.crc32(host.encode()) % 1000 < fraction * 1000
+
+
+def main(tool: str, args):
+    out = Emitter()
+    if tool == "subfinder":
+        domain = _arg(args, "-d")
+        for i in range(int(os.getenv("FAKE_SUBDOMAINS", "10000"))):
+            out.emit(f"h{i}.{domain}")
+    elif tool == "gau":
+        domain = args[-1]
+        hosts = max(int(os.getenv("FAKE_SUBDOMAINS", "10000")), 1)
+        for i in range(int(os.getenv("FAKE_URLS", "100000"))):
+            out.emit(f"https://h{i % hosts}.{domain}/p/{i // hosts}/item?id={i}")
+    elif tool == "naabu":
+        ports = _PORTS[:int(os.getenv("FAKE_PORTS", "2"))]
+        for host in _hosts(args, "-list"):
+            for port in ports:
+                out.emit(json.dumps({"host": host, "ip": "10.0.0.1", "port": port}))
+    elif tool == "httpx":
+        alive = float(os.getenv("FAKE_ALIVE", "0.6"))
+        for host in _hosts(args, "-l"):
+            if not _alive(host, alive):
+                continue
+            crc = zlib.crc32(host.encode())
+            out.emit(json.dumps({
+                "input": host,
+                "url": f"https://{host}",
+                "status_code": (200, 301, 403, 404)[crc % 4],
+                "content_length": crc % 50000,
+                "title": f"Page {host}",
+                "tech": _TECH[crc % len(_TECH)],
+                "host": f"10.{crc % 256}.{(crc >> 8) % 256}.{(crc >> 16) % 256}"
+            }))
+    else:
+        sys.exit(f"unknown tool {tool}")
+    out.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2:])
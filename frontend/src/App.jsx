@@ -14,38 +14,50 @@ function App() {
     const [stats, setStats] = useState(null)
     const [selectedScan, setSelectedScan] = useState(null)
     const [loading, setLoading] = useState(false)
-
-    const fetchScans = async () => {
-        try {
-            const res = await fetch(`${API_URL}/scans/`)
-            const data = await res.json()
-            setScans(data.scans || [])
-        } catch (err) {
-            console.error('Failed to fetch scans:', err)
-        }
-    }
-
-    const fetchStats = async () => {
-        try {
-            const res = await fetch(`${API_URL}/results/stats`)
-            const data = await res.json()
-            setStats(data)
-        } catch (err) {
-            console.error('Failed to fetch stats:', err)
-        }
-    }
+    // Latest per-stage progress of running scans, keyed by scan id
+    const [progress, setProgress] = useState({})
 
     useEffect(() => {
-        fetchScans()
-        fetchStats()
-
-        // Poll for updates every 10 seconds
-        const interval = setInterval(() => {
-            fetchScans()
-            fetchStats()
-        }, 10000)
-
-        return () => clearInterval(interval)
+        // One server-sent event stream replaces polling: a snapshot on connect,
+        // then scan, progress and stats events. EventSource reconnects by itself
+        // and every (re)connect starts with a fresh snapshot.
+        const source = new EventSource(`${API_URL}/events/`)
+        const on = (event, handler) =>
+            source.addEventListener(event, e => handler(JSON.parse(e.data)))
+
+        on('snapshot', data => {
+            setScans(data.scans || [])
+            setStats(data.stats)
+            setProgress(data.progress || {})
+        })
+        on('scan', scan => {
+            setScans(prev => prev.some(s => s.id === scan.id)
+                ? prev.map(s => (s.id === scan.id ? { ...s, ...scan } : s))
+                : [scan, ...prev])
+            if (['completed', 'failed', 'cancelled'].includes(scan.status)) {
+                setProgress(prev => {
+                    const { [scan.id]: _, ...rest } = prev
+                    return rest
+                })
+            }
+        })
+        on('scan_deleted', ({ id }) => {
+            setScans(prev => prev.filter(s => s.id !== id))
+            setProgress(prev => {
+                const { [id]: _, ...rest } = prev
+                return rest
+            })
+        })
+        on('progress', update => {
+            setProgress(prev => ({
+                ...prev,
+                [update.scan_id]: { ...prev[update.scan_id], [update.stage]: update }
+            }))
+        })
+        on('stats', setStats)
+        source.onerror = () => console.error('Event stream disconnected, reconnecting...')
+
+        return () => source.close()
     }, [])
 
     const startScan = async (domain) => {
@@ -57,7 +69,7 @@ function App() {
                 body: JSON.stringify({ domain })
             })
             const data = await res.json()
-            setScans(prev => [data, ...prev])
+            setScans(prev => prev.some(s => s.id === data.id) ? prev : [data, ...prev])
             setActiveTab('scans')
         } catch (err) {
             console.error('Failed to start scan:', err)
@@ -116,7 +128,7 @@ function App() {
             </div>
 
             {activeTab === 'dashboard' && (
-                <Dashboard stats={stats} scans={scans} onStartScan={startScan} loading={loading} />
+                <Dashboard stats={stats} scans={scans} progress={progress} onStartScan={startScan} loading={loading} />
             )}
 
             {activeTab === 'scans' && (
@@ -2,7 +2,22 @@ import { useState } from 'react'
 import ScanForm from './ScanForm'
 import StatsCards from './StatsCards'
 
-function Dashboard({ stats, scans, onStartScan, loading }) {
+const STAGES = ['subfinder', 'dns', 'naabu', 'httpx', 'gau', 'persist']
+
+// e.g. "subfinder 1200 · naabu 500/1200 · httpx 500/1200"
+function formatProgress(stages) {
+    if (!stages) return 'Starting...'
+    return STAGES.filter(stage => stages[stage])
+        .map(stage => {
+            const { done, total, found } = stages[stage]
+            if (stage === 'gau') return `gau ${found} urls`
+            if (stage === 'subfinder' || total == null) return `${stage} ${done}`
+            return `${stage} ${done}/${total}`
+        })
+        .join(' · ')
+}
+
+function Dashboard({ stats, scans, progress, onStartScan, loading }) {
     return (
         <div className="fade-in">
             <ScanForm onSubmit={onStartScan} loading={loading} />
@@ -24,6 +39,7 @@ function Dashboard({ stats, scans, onStartScan, loading }) {
                                     <tr>
                                         <th>Domain</th>
                                         <th>Started</th>
+                                        <th>Progress</th>
                                     </tr>
                                 </thead>
                                 <tbody>
@@ -31,6 +47,7 @@ function Dashboard({ stats, scans, onStartScan, loading }) {
                                         <tr key={scan.id}>
                                             <td className="mono">{scan.domain}</td>
                                             <td>{new Date(scan.created_at).toLocaleString()}</td>
+                                            <td className="mono">{formatProgress(progress?.[scan.id])}</td>
                                         </tr>
                                     ))}
                                 </tbody>
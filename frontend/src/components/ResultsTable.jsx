@@ -6,22 +6,25 @@ function ResultsTable({ scanId, onClearFilter, apiUrl }) {
     const [loading, setLoading] = useState(false)
     const [aliveOnly, setAliveOnly] = useState(false)
     const [page, setPage] = useState(0)
+    // cursors[n] is the keyset cursor that loads page n; page 0 has none
+    const [cursors, setCursors] = useState([null])
     const pageSize = 50
 
     const fetchResults = async () => {
         setLoading(true)
         try {
             const params = new URLSearchParams({
-                skip: (page * pageSize).toString(),
                 limit: pageSize.toString(),
                 alive_only: aliveOnly.toString()
             })
             if (scanId) params.append('scan_id', scanId.toString())
+            if (cursors[page] !== null) params.append('cursor', cursors[page].toString())
 
             const res = await fetch(`${apiUrl}/results/?${params}`)
             const data = await res.json()
             setResults(data.results || [])
             setTotal(data.total || 0)
+            setCursors(prev => [...prev.slice(0, page + 1), data.next_cursor])
         } catch (err) {
             console.error('Failed to fetch results:', err)
         } finally {
@@ -29,30 +32,26 @@ function ResultsTable({ scanId, onClearFilter, apiUrl }) {
         }
     }
 
+    useEffect(() => {
+        setPage(0)
+        setCursors([null])
+    }, [scanId])
+
     useEffect(() => {
         fetchResults()
     }, [scanId, aliveOnly, page])
 
-    const exportResults = async () => {
+    const exportResults = (format) => {
         if (!scanId) {
             alert('Please select a specific scan to export')
             return
         }
 
-        try {
-            const res = await fetch(`${apiUrl}/results/export/${scanId}`)
-            const data = await res.json()
-
-            const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' })
-            const url = URL.createObjectURL(blob)
-            const a = document.createElement('a')
-            a.href = url
-            a.download = `recon_results_${scanId}.json`
-            a.click()
-            URL.revokeObjectURL(url)
-        } catch (err) {
-            console.error('Export failed:', err)
-        }
+        // The export is streamed, so let the browser download it directly
+        const a = document.createElement('a')
+        a.href = `${apiUrl}/results/export/${scanId}?format=${format}`
+        a.download = `recon_results_${scanId}.${format}`
+        a.click()
     }
 
     return (
@@ -79,14 +78,18 @@ function ResultsTable({ scanId, onClearFilter, apiUrl }) {
                                 onChange={(e) => {
                                     setAliveOnly(e.target.checked)
                                     setPage(0)
+                                    setCursors([null])
                                 }}
                             />
                             <span style={{ fontSize: '0.875rem', color: 'var(--text-secondary)' }}>
                                 Alive only
                             </span>
                         </label>
-                        <button className="btn btn-secondary btn-sm" onClick={exportResults}>
-                            📥 Export JSON
+                        <button className="btn btn-secondary btn-sm" onClick={() => exportResults('ndjson')}>
+                            📥 Export NDJSON
+                        </button>
+                        <button className="btn btn-secondary btn-sm" onClick={() => exportResults('csv')}>
+                            📥 Export CSV
                         </button>
                         <span className="badge">{total} total</span>
                     </div>
@@ -171,7 +174,7 @@ function ResultsTable({ scanId, onClearFilter, apiUrl }) {
                         </div>
 
                         {/* Pagination */}
-                        {total > pageSize && (
+                        {(page > 0 || cursors[page + 1] != null) && (
                             <div style={{
                                 display: 'flex',
                                 justifyContent: 'center',
@@ -198,7 +201,7 @@ function ResultsTable({ scanId, onClearFilter, apiUrl }) {
                                 <button
                                     className="btn btn-secondary btn-sm"
                                     onClick={() => setPage(p => p + 1)}
-                                    disabled={(page + 1) * pageSize >= total}
+                                    disabled={cursors[page + 1] == null}
                                 >
                                     Next
                                 </button>
@@ -0,0 +1,47 @@
+import os
+import stat
+import sys
+import tempfile
+
+import pytest
+
+# Point the backend at a scratch database and the stub tools before it is imported
+_tmpdir = tempfile.mkdtemp(prefix="recon-test-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_tmpdir}/test.db",
+    "URL_STORE_PATH": f"{_tmpdir}/urls.db",
+    "ARCHIVE_DIR": f"{_tmpdir}/archive",
+    "TOOL_CACHE_PATH": f"{_tmpdir}/tool_cache.db",
+    "DNS_RESOLVE": "false",
+    # One host per shard, so a failing host loses only its own results
+    "NAABU_SHARD_SIZE": "1",
+    "HTTPX_SHARD_SIZE": "1",
+    "TOOL_SHARD_RETRIES": "0",
+})
+for _tool in ("subfinder", "naabu", "httpx", "gau"):
+    _path = os.path.join(_tmpdir, _tool)
+    with open(_path, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.dirname(__file__)}/stub_tool.py" {_tool} "$@"\n')
+    os.chmod(_path, os.stat(_path).st_mode | stat.S_IEXEC)
+    os.environ[f"{_tool.upper()}_PATH"] = _path
+
+
+@pytest.fixture
+def clean_db():
+    """An empty scratch database: no scans, results, jobs or asset history."""
+    from sqlalchemy import delete, select
+    from backend import retention
+    from backend.database import SessionLocal, Asset, AssetEvent, Scan, init_db
+
+    init_db()
+    with SessionLocal() as db:
+        for scan_id in db.scalars(select(Scan.id)).all():
+            retention.delete_scan(db, scan_id)
+        db.execute(delete(AssetEvent))
+        db.execute(delete(Asset))
+        db.commit()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    import shutil
+    shutil.rmtree(_tmpdir, ignore_errors=True)
@@ -0,0 +1,50 @@
+"""subfinder/naabu/httpx/gau stand-in for the tests, steered by the environment.
+
+    STUB_HOSTS        comma-separated names subfinder prints
+    STUB_FAIL         comma-separated tool names that exit 1 after their output
+    STUB_NAABU_FAIL   hosts that make a naabu run exit 1 without output
+    STUB_HTTPX_FAIL   hosts that make an httpx run exit 1 without output
+    STUB_PORTS        comma-separated ports naabu reports for every host
+    STUB_TITLE        title httpx reports for every host
+    STUB_SLEEP        seconds httpx waits before its output
+"""
+import json
+import os
+import sys
+import time
+
+
+def _list(name: str):
+    return [item for item in os.getenv(name, "").split(",") if item]
+
+
+def _hosts(args, flag: str):
+    with open(args[args.index(flag) + 1]) as f:
+        return f.read().split()
+
+
+def main(tool: str, args):
+    if tool == "subfinder":
+        for host in _list("STUB_HOSTS"):
+            print(host)
+    elif tool == "naabu":
+        hosts = _hosts(args, "-list")
+        if set(hosts) & set(_list("STUB_NAABU_FAIL")):
+            sys.exit(1)
+        for host in hosts:
+            for port in _list("STUB_PORTS"):
+                print(json.dumps({"host": host, "ip": "10.0.0.1", "port": int(port)}))
+    elif tool == "httpx":
+        hosts = _hosts(args, "-l")
+        time.sleep(float(os.getenv("STUB_SLEEP", "0")))
+        if set(hosts) & set(_list("STUB_HTTPX_FAIL")):
+            sys.exit(1)
+        for host in hosts:
+            print(json.dumps({"input": host, "status_code": 200, "title": os.getenv("STUB_TITLE", ""),
+                              "tech": ["nginx"], "host": "10.0.0.1"}))
+    if tool in _list("STUB_FAIL"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2:])
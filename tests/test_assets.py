@@ -0,0 +1,120 @@
+"""Asset history when a scan's tools fail: lost probe shards and a failed subfinder run."""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from backend.database import AsyncSessionLocal, SessionLocal, Asset, AssetEvent, Scan, async_engine
+from backend import assets
+from backend.recon import tools
+from backend.recon.engine import ReconEngine
+
+DOMAIN = "example.com"
+HOSTS = "a.example.com,b.example.com"
+
+
+@pytest.fixture(autouse=True)
+def stub_output(clean_db, monkeypatch):
+    monkeypatch.setenv("STUB_HOSTS", HOSTS)
+    monkeypatch.setenv("STUB_PORTS", "80,443")
+    monkeypatch.setenv("STUB_TITLE", "Home")
+
+
+def scan(monkeypatch, **stub) -> int:
+    """Run one scan of DOMAIN against the stub tools, with STUB_* settings for this run only."""
+    with monkeypatch.context() as patch:
+        for name, value in stub.items():
+            patch.setenv(f"STUB_{name.upper()}", value)
+        with SessionLocal() as db:
+            row = Scan(domain=DOMAIN, bypass_cache=True)
+            db.add(row)
+            db.commit()
+            scan_id = row.id
+
+        async def run():
+            tools._tool_slots.clear()  # Its semaphores belong to the previous scan's event loop
+            try:
+                async with AsyncSessionLocal() as db:
+                    assert await ReconEngine(db).run_full_scan(scan_id)
+            finally:
+                await async_engine.dispose()
+
+        asyncio.run(run())
+    return scan_id
+
+
+def events(scan_id: int):
+    with SessionLocal() as db:
+        return sorted(db.execute(
+            select(Asset.host, AssetEvent.kind, AssetEvent.old_value, AssetEvent.new_value)
+            .join(Asset, Asset.id == AssetEvent.asset_id)
+            .where(AssetEvent.scan_id == scan_id)
+        ).all())
+
+
+def asset(host: str) -> Asset:
+    with SessionLocal() as db:
+        return db.scalar(select(Asset).where(Asset.host == host))
+
+
+def test_lost_naabu_shard_keeps_host_state(monkeypatch):
+    scan(monkeypatch)
+    second = scan(monkeypatch, naabu_fail="a.example.com", ports="80")
+    # b's port change is still logged; a's missing ports are not a change
+    assert events(second) == [("b.example.com", "port_closed", "443", None)]
+    a = asset("a.example.com")
+    assert a.ports == "[80,443]" and a.present and a.last_scan_id == second
+
+
+def test_lost_httpx_shard_keeps_host_state(monkeypatch):
+    scan(monkeypatch)
+    second = scan(monkeypatch, httpx_fail="a.example.com", title="New")
+    assert events(second) == [("b.example.com", "title_changed", "Home", "New")]
+    a = asset("a.example.com")
+    assert a.is_alive and a.status_code == 200 and a.title == "Home" and a.technologies == '["nginx"]'
+    assert a.last_scan_id == second
+
+
+def test_host_first_found_with_lost_probes_is_not_diffed(monkeypatch):
+    first = scan(monkeypatch, naabu_fail="a.example.com", httpx_fail="a.example.com")
+    assert ("a.example.com", "discovered", None, None) in events(first)
+    assert not asset("a.example.com").probed
+    second = scan(monkeypatch)
+    assert events(second) == []
+    a = asset("a.example.com")
+    assert a.probed and a.is_alive and a.ports == "[80,443]"
+
+
+def test_failed_subfinder_marks_nothing_disappeared(monkeypatch):
+    scan(monkeypatch)
+    # subfinder crashes without output, so the scan falls back to the root domain
+    failed = scan(monkeypatch, hosts="", fail="subfinder")
+    assert events(failed) == [(DOMAIN, "discovered", None, None)]
+    assert asset("a.example.com").present and asset("b.example.com").present
+    assert events(scan(monkeypatch)) == [(DOMAIN, "disappeared", None, None)]
+
+
+def test_partial_subfinder_marks_nothing_disappeared(monkeypatch):
+    scan(monkeypatch)
+    failed = scan(monkeypatch, hosts="a.example.com", fail="subfinder")
+    assert events(failed) == []
+    assert asset("b.example.com").present
+    assert events(scan(monkeypatch)) == []
+
+
+def test_complete_scan_marks_missing_hosts_disappeared(monkeypatch):
+    scan(monkeypatch)
+    second = scan(monkeypatch, hosts="a.example.com")
+    assert events(second) == [("b.example.com", "disappeared", None, None)]
+    assert events(scan(monkeypatch)) == [("b.example.com", "reappeared", None, None)]
+
+
+def test_rebuild_replays_failed_runs_the_same_way(monkeypatch):
+    scan(monkeypatch)
+    failed = scan(monkeypatch, hosts="", fail="subfinder")
+    lost = scan(monkeypatch, naabu_fail="a.example.com")
+    with SessionLocal() as db:
+        assets.rebuild(db)
+    assert events(failed) == [(DOMAIN, "discovered", None, None)]
+    assert events(lost) == [(DOMAIN, "disappeared", None, None)]
+    assert asset("a.example.com").ports == "[80,443]"
@@ -0,0 +1,119 @@
+"""Scan queues: waiting for cancelled scans to stop, and deleting running scans."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from backend.database import AsyncSessionLocal, SessionLocal, Scan, ScanJob, Subdomain, async_engine
+from backend.recon import jobs, tools
+from backend.routers import scans
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+
+def add_scan() -> int:
+    with SessionLocal() as db:
+        scan = Scan(domain="example.com", bypass_cache=True)
+        db.add(scan)
+        db.commit()
+        return scan.id
+
+
+def run(coro):
+    async def main():
+        tools._tool_slots.clear()  # Its semaphores belong to the previous test's event loop
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def started(queue, scan_id: int):
+    queue.start()
+    await queue.submit(scan_id)
+    while queue.status(scan_id) is None or queue.status(scan_id)["state"] != "running":
+        await asyncio.sleep(0.01)
+
+
+def test_local_queue_waits_for_a_cancelled_scan(monkeypatch):
+    monkeypatch.setenv("STUB_HOSTS", "a.example.com")
+    monkeypatch.setenv("STUB_SLEEP", "2")
+    scan_id = add_scan()
+
+    async def main():
+        queue = jobs.ScanQueue(1)
+        await started(queue, scan_id)
+        try:
+            assert not await queue.wait(scan_id, 0.1)
+            await queue.cancel(scan_id)
+            assert await queue.wait(scan_id, 5)
+        finally:
+            await queue.stop()
+
+    run(main())
+
+
+def test_delete_running_scan_waits_for_it_to_stop(monkeypatch):
+    monkeypatch.setenv("STUB_HOSTS", "a.example.com")
+    monkeypatch.setenv("STUB_SLEEP", "2")
+    scan_id = add_scan()
+    queue = jobs.ScanQueue(1)
+    monkeypatch.setattr(scans, "scan_queue", queue)
+
+    async def main():
+        await started(queue, scan_id)
+        try:
+            async with AsyncSessionLocal() as db:
+                await scans.delete_scan(scan_id, db)
+            assert not queue.is_active(scan_id)
+        finally:
+            await queue.stop()
+
+    run(main())
+    with SessionLocal() as db:
+        assert db.get(Scan, scan_id) is None
+        assert db.scalar(select(func.count()).where(Subdomain.scan_id == scan_id)) == 0
+
+
+def test_delete_refuses_a_scan_that_does_not_stop(monkeypatch):
+    monkeypatch.setattr(scans, "SCAN_STOP_TIMEOUT", 0.1)
+    scan_id = add_scan()
+    with SessionLocal() as db:
+        now = datetime.utcnow()
+        db.add(ScanJob(scan_id=scan_id, state="leased", worker_id="w1", started_at=now, heartbeat_at=now,
+                       lease_expires_at=now + timedelta(seconds=60)))
+        db.commit()
+    monkeypatch.setattr(scans, "scan_queue", jobs.DatabaseScanQueue())
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await scans.delete_scan(scan_id, db)
+
+    with pytest.raises(HTTPException) as raised:
+        run(main())
+    assert raised.value.status_code == 409
+    with SessionLocal() as db:
+        assert db.get(Scan, scan_id) is not None
+
+
+def test_database_queue_wait_ends_with_the_job_or_its_lease():
+    queue = jobs.DatabaseScanQueue()
+    scan_id = add_scan()
+    with SessionLocal() as db:
+        now = datetime.utcnow()
+        job = ScanJob(scan_id=scan_id, state="cancelling", worker_id="w1", started_at=now, heartbeat_at=now,
+                      lease_expires_at=now + timedelta(seconds=60))
+        db.add(job)
+        db.commit()
+        assert not run(queue.wait(scan_id, 0.1))
+        # The worker died: its lease lapses and nobody is writing any more
+        job.lease_expires_at = now - timedelta(seconds=1)
+        db.commit()
+        assert run(queue.wait(scan_id, 0.1))
+        db.delete(job)
+        db.commit()
+    assert run(queue.wait(scan_id, 0.1))
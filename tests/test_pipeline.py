@@ -0,0 +1,42 @@
+"""_batch_consumer: batching and failure propagation."""
+import asyncio
+
+import pytest
+
+from backend.recon.engine import _DONE, _batch_consumer
+
+
+def consume(items, handler, delay: float = 0, **kwargs):
+    """Feed items to _batch_consumer, delay seconds apart."""
+    async def produce(queue):
+        for item in items:
+            await queue.put(item)
+            await asyncio.sleep(delay)
+        await queue.put(_DONE)
+
+    async def run():
+        queue = asyncio.Queue()
+        await asyncio.gather(produce(queue), _batch_consumer(queue, handler, **kwargs))
+
+    asyncio.run(run())
+
+
+def test_batches_every_item():
+    batches = []
+
+    async def handler(batch):
+        batches.append(batch)
+
+    consume(range(7), handler, batch_size=3, workers=2)
+    assert sorted(item for batch in batches for item in batch) == list(range(7))
+    assert sorted(map(len, batches)) == [1, 3, 3]
+
+
+def test_failed_batch_raises_its_error():
+    async def handler(batch):
+        if 0 in batch:
+            raise RuntimeError("tool exploded")
+
+    # The failed batch has finished long before the last one is flushed
+    with pytest.raises(RuntimeError, match="tool exploded"):
+        consume(range(6), handler, delay=0.01, batch_size=2, workers=3)
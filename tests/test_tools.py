@@ -0,0 +1,36 @@
+"""stream_command: output lines over STREAM_LINE_LIMIT."""
+import asyncio
+import sys
+
+from backend.recon import tools
+
+
+def stream(script: str, report: tools.ToolReport):
+    async def main():
+        cmd = [sys.executable, "-c", script]
+        return [line async for line in tools.stream_command(cmd, timeout=30, report=report, tool="stub")]
+
+    return asyncio.run(main())
+
+
+def test_overlong_lines_are_discarded_whole(monkeypatch):
+    monkeypatch.setattr(tools, "STREAM_LINE_LIMIT", 1024)
+    report = tools.ToolReport()
+    # Each long line ends in something that parses as a line of its own if only its head is dropped
+    script = (
+        "import sys\n"
+        "w = sys.stdout.write\n"
+        "w('first\\n'); w('x' * 5000 + 'https://tail.example.com/\\n'); w('second\\n')\n"
+        "w('y' * 1500 + '\\n'); w('third\\n'); w('z' * 3000 + 'eof')\n"
+    )
+    assert stream(script, report) == ["first", "second", "third"]
+    counts = report.tools["stub"]
+    assert counts["ok"] == 1 and counts["lines"] == 3 and counts["lines_dropped"] == 3
+
+
+def test_lines_within_the_limit_are_kept(monkeypatch):
+    monkeypatch.setattr(tools, "STREAM_LINE_LIMIT", 1024)
+    report = tools.ToolReport()
+    script = "print('a' * 1000); print('b', end='')"
+    assert stream(script, report) == ["a" * 1000, "b"]
+    assert report.tools["stub"]["lines_dropped"] == 0
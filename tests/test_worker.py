@@ -0,0 +1,106 @@
+"""Several worker processes (python -m backend.worker) sharing one SQLite database."""
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+from sqlalchemy import select
+
+from backend.database import SessionLocal, Scan, ScanJob
+
+pytestmark = pytest.mark.usefixtures("clean_db")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Short intervals so a killed worker's lease lapses within the test
+WORKER_ENV = {
+    "PYTHONUNBUFFERED": "1",
+    "WORKER_POLL_SECONDS": "0.2",
+    "WORKER_HEARTBEAT_SECONDS": "0.5",
+    "WORKER_LEASE_SECONDS": "3",
+    "STUB_HOSTS": "a.example.com,b.example.com",
+    "STUB_PORTS": "80",
+}
+
+
+def queue_scans(count: int):
+    with SessionLocal() as db:
+        scans = [Scan(domain=f"site{i}.example.com", bypass_cache=True) for i in range(count)]
+        db.add_all(scans)
+        db.commit()
+        db.add_all(ScanJob(scan_id=scan.id) for scan in scans)
+        db.commit()
+        return [scan.id for scan in scans]
+
+
+def start_worker(name: str, **env) -> subprocess.Popen:
+    # Its own process group, so killing it also kills the tool processes it started
+    return subprocess.Popen(
+        [sys.executable, "-m", "backend.worker", "--id", name, "--concurrency", "2"],
+        cwd=ROOT, env={**os.environ, **WORKER_ENV, **env}, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, start_new_session=True
+    )
+
+
+def stop_worker(worker: subprocess.Popen, sig=signal.SIGTERM) -> str:
+    """Signal a worker's process group and return its output."""
+    if worker.poll() is None:
+        os.killpg(worker.pid, sig)
+    return worker.communicate(timeout=30)[0]
+
+
+def wait_for(condition, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.2)
+
+
+def statuses(scan_ids):
+    with SessionLocal() as db:
+        return dict(db.execute(select(Scan.id, Scan.status).where(Scan.id.in_(scan_ids))).all())
+
+
+def jobs_left() -> int:
+    with SessionLocal() as db:
+        return len(db.scalars(select(ScanJob.id)).all())
+
+
+def claims(output: str):
+    """(scan_id, attempt) for every "Claimed scan N (attempt K)" line of a worker's output."""
+    return [tuple(map(int, found)) for found in re.findall(r"Claimed scan (\d+) \(attempt (\d+)\)", output)]
+
+
+def test_each_job_is_claimed_exactly_once():
+    scan_ids = queue_scans(8)
+    workers = [start_worker(f"w{i}") for i in range(3)]
+    try:
+        wait_for(lambda: jobs_left() == 0)
+    finally:
+        outputs = [stop_worker(worker) for worker in workers]
+    claimed = [claim for output in outputs for claim in claims(output)]
+    assert sorted(claimed) == [(scan_id, 1) for scan_id in scan_ids]
+    assert set(statuses(scan_ids).values()) == {"completed"}, "\n".join(outputs)
+
+
+def test_killed_workers_job_is_reclaimed_by_another():
+    [scan_id] = queue_scans(1)
+    # httpx hangs, so the scan is still running when its worker is killed
+    first = start_worker("w-killed", STUB_SLEEP="60")
+    try:
+        wait_for(lambda: statuses([scan_id])[scan_id] == "running")
+        time.sleep(1)
+    finally:
+        first_output = stop_worker(first, signal.SIGKILL)
+    assert claims(first_output) == [(scan_id, 1)]
+
+    second = start_worker("w-second")
+    try:
+        wait_for(lambda: jobs_left() == 0)
+    finally:
+        second_output = stop_worker(second)
+    assert claims(second_output) == [(scan_id, 2)]
+    assert statuses([scan_id])[scan_id] == "completed"